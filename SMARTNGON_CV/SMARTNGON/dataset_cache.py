@@ -0,0 +1,256 @@
+# dataset_cache.py
+# One-time preprocessing of SmartNgon-2 into memory-mapped arrays, so training epochs stop re-decoding JPEGs
+#
+# Usage (from SMARTNGON_CV/SMARTNGON):
+#   python dataset_cache.py --imgsz 640            # build train/valid/test caches (skipped when up to date)
+#   python dataset_cache.py --imgsz 640 --bench    # images/s: JPEG decode + resize vs memmap, raw and with augmentation
+#
+# In a training script:
+#   from dataset_cache import use_dataset_cache
+#   use_dataset_cache("SmartNgon-2/data.yaml", imgsz=640)   # before model.train() / model.val()
+#
+# Each split becomes SmartNgon-2/.cache/<split>-<imgsz>-<key>.npy, a (N, imgsz, imgsz, 3) uint8 array holding
+# every image resized exactly as ultralytics would (long side = imgsz) in the top-left of a padded slot,
+# plus a .json index with original shapes and labels. The key hashes data.yaml and every image/label
+# file's size and mtime, so a new dataset version or an edited label builds a fresh cache.
+
+import os
+import json
+import math
+import time
+import hashlib
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_DATA = SCRIPT_DIR / "SmartNgon-2" / "data.yaml"
+SPLITS = ("train", "valid", "test")
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp")
+CACHE_FORMAT = 1  # bump when the layout changes
+
+# Letterbox fill ultralytics pads with
+PAD_VALUE = 114
+
+
+def split_files(dataset_dir, split):
+    images = sorted(p for p in (dataset_dir / split / "images").iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    return [(image, dataset_dir / split / "labels" / f"{image.stem}.txt") for image in images]
+
+
+def cache_key(data_yaml, files, imgsz):
+    """Changes whenever data.yaml, any image or any label file changes"""
+    digest = hashlib.sha1(f"{CACHE_FORMAT}:{imgsz}".encode())
+    digest.update(Path(data_yaml).read_bytes())
+    for image, label in files:
+        for path in (image, label):
+            stat = path.stat() if path.exists() else None
+            digest.update(f"{path.name}:{stat.st_size if stat else -1}:{stat.st_mtime_ns if stat else -1}".encode())
+    return digest.hexdigest()[:12]
+
+
+def read_labels(path):
+    """YOLO label rows as [class, x, y, w, h] (normalized); polygon rows become their bounding box"""
+    if not path.exists():
+        return []
+
+    labels = []
+    for line in path.read_text().splitlines():
+        values = [float(v) for v in line.split()]
+        if len(values) == 5:
+            labels.append([int(values[0])] + values[1:])
+        elif len(values) > 5:
+            xs, ys = values[1::2], values[2::2]
+            labels.append([int(values[0]), (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2, max(xs) - min(xs), max(ys) - min(ys)])
+    return labels
+
+
+def resize_like_ultralytics(image, imgsz):
+    """BaseDataset.load_image(rect_mode=True): scale the long side to imgsz, keeping the aspect ratio"""
+    import cv2
+
+    h0, w0 = image.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz)
+        image = cv2.resize(image, (w, h), interpolation=cv2.INTER_LINEAR)
+    return image
+
+
+def cache_paths(dataset_dir, split, imgsz, key):
+    base = dataset_dir / ".cache" / f"{split}-{imgsz}-{key}"
+    return base.with_suffix(".npy"), base.with_suffix(".json")
+
+
+def build_split(data_yaml, split, imgsz):
+    """Build one split's cache unless an up-to-date one exists; returns the index path"""
+    import cv2
+
+    dataset_dir = Path(data_yaml).resolve().parent
+    files = split_files(dataset_dir, split)
+    key = cache_key(data_yaml, files, imgsz)
+    array_path, index_path = cache_paths(dataset_dir, split, imgsz, key)
+    if index_path.exists():
+        return index_path
+
+    array_path.parent.mkdir(exist_ok=True)
+    started = time.perf_counter()
+    tmp_path = array_path.with_suffix(".tmp.npy")
+    images = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(len(files), imgsz, imgsz, 3))
+
+    entries = []
+    for row, (image_path, label_path) in enumerate(files):
+        image = cv2.imread(str(image_path))
+        h0, w0 = image.shape[:2]
+        resized = resize_like_ultralytics(image, imgsz)
+        h, w = resized.shape[:2]
+        images[row] = PAD_VALUE
+        images[row, :h, :w] = resized
+        entries.append({
+            "file": str(image_path.resolve()),
+            "shape": [h0, w0],
+            "resized": [h, w],
+            "labels": read_labels(label_path),
+        })
+
+    images.flush()
+    del images
+    os.replace(tmp_path, array_path)
+
+    # The index is written last: its presence marks the cache as complete
+    index = {"format": CACHE_FORMAT, "split": split, "imgsz": imgsz, "key": key, "array": array_path.name, "images": entries}
+    index_path.write_text(json.dumps(index))
+
+    # Caches from older dataset versions are dead weight
+    for stale in array_path.parent.glob(f"{split}-{imgsz}-*"):
+        if key not in stale.name:
+            stale.unlink()
+
+    print(f"📦 {split}: {len(files)} images cached at {imgsz} in {time.perf_counter() - started:.1f}s -> {array_path}")
+    return index_path
+
+
+class DatasetCache:
+    """Read side of a split cache; the array is opened lazily so forked dataloader workers each map it themselves"""
+
+    def __init__(self, index_path):
+        self.index_path = Path(index_path)
+        self.index = json.loads(self.index_path.read_text())
+        self.imgsz = self.index["imgsz"]
+        self.rows = {entry["file"]: row for row, entry in enumerate(self.index["images"])}
+        self._images = None
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = np.load(self.index_path.parent / self.index["array"], mmap_mode="r")
+        return self._images
+
+    def load(self, row):
+        """(image copy, original (h, w), resized (h, w)) - a copy, since augmentations modify images in place"""
+        entry = self.index["images"][row]
+        h, w = entry["resized"]
+        return np.array(self.images[row, :h, :w]), tuple(entry["shape"]), (h, w)
+
+    def labels(self, row):
+        return self.index["images"][row]["labels"]
+
+
+def use_dataset_cache(data_yaml=DEFAULT_DATA, imgsz=640, splits=SPLITS):
+    """
+    Build (if needed) the caches for `splits` and make every ultralytics dataset in this process read
+    images from them. Files not in a cache, other sizes and non-rect loads fall through to the JPEG path.
+    """
+    from ultralytics.data.base import BaseDataset
+
+    dataset_dir = Path(data_yaml).resolve().parent
+    caches = [DatasetCache(build_split(data_yaml, split, imgsz)) for split in splits if (dataset_dir / split / "images").exists()]
+    lookup = {file: (cache, row) for cache in caches for file, row in cache.rows.items()}
+
+    original_load = getattr(BaseDataset.load_image, "__wrapped__", BaseDataset.load_image)
+
+    def load_image(self, i, rect_mode=True):
+        hit = lookup.get(str(Path(self.im_files[i]).resolve()))
+        if hit is None or not rect_mode or hit[0].imgsz != self.imgsz:
+            return original_load(self, i, rect_mode)
+
+        im, shape, resized = hit[0].load(hit[1])
+        if self.augment:
+            # Mosaic draws its extra tiles from this buffer
+            self.buffer.append(i)
+            if len(self.buffer) >= self.max_buffer_length:
+                self.buffer.pop(0)
+        return im, shape, resized
+
+    load_image.__wrapped__ = original_load
+    BaseDataset.load_image = load_image
+    print(f"🗂️  Dataset cache active: {len(lookup)} images at imgsz {imgsz}")
+    return caches
+
+
+def bench(data_yaml, imgsz, passes):
+    """Images/s for the raw load path and for full augmented samples, JPEG vs memmap"""
+    import cv2
+
+    index_path = build_split(data_yaml, "train", imgsz)
+    cache = DatasetCache(index_path)
+    files = [Path(entry["file"]) for entry in cache.index["images"]]
+
+    def rate(fn):
+        started = time.perf_counter()
+        for _ in range(passes):
+            for row, path in enumerate(files):
+                fn(row, path)
+        return passes * len(files) / (time.perf_counter() - started)
+
+    jpeg = rate(lambda row, path: resize_like_ultralytics(cv2.imread(str(path)), imgsz))
+    mapped = rate(lambda row, path: cache.load(row))
+    print(f"Raw load      JPEG {jpeg:8.1f} img/s | memmap {mapped:8.1f} img/s | {mapped / jpeg:.1f}x")
+
+    # Full training samples: load + mosaic/affine/HSV/flip + label formatting, as the dataloader sees them
+    from ultralytics.cfg import get_cfg
+    from ultralytics.data import YOLODataset
+    from ultralytics.data.utils import check_det_dataset
+
+    data = check_det_dataset(str(data_yaml))
+    hyp = get_cfg()
+
+    def augmented_rate():
+        dataset = YOLODataset(img_path=data["train"], imgsz=imgsz, augment=True, hyp=hyp, data=data, batch_size=1)
+        started = time.perf_counter()
+        for _ in range(passes):
+            for i in range(len(dataset)):
+                dataset[i]
+        return passes * len(dataset) / (time.perf_counter() - started)
+
+    before = augmented_rate()
+    use_dataset_cache(data_yaml, imgsz, splits=("train",))
+    after = augmented_rate()
+    print(f"Augmented     JPEG {before:8.1f} img/s | memmap {after:8.1f} img/s | {after / before:.1f}x")
+
+    result = {"imgsz": imgsz, "images": len(files), "passes": passes,
+              "raw_img_s": {"jpeg": round(jpeg, 1), "memmap": round(mapped, 1)},
+              "augmented_img_s": {"jpeg": round(before, 1), "memmap": round(after, 1)}}
+    (index_path.parent / f"bench-{imgsz}.json").write_text(json.dumps(result, indent=2))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build memory-mapped caches of the goat dataset")
+    parser.add_argument("--data", default=str(DEFAULT_DATA))
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[640])
+    parser.add_argument("--splits", nargs="+", default=list(SPLITS))
+    parser.add_argument("--bench", action="store_true", help="measure load throughput before/after")
+    parser.add_argument("--passes", type=int, default=3, help="passes over the train split when benchmarking")
+    args = parser.parse_args()
+
+    for imgsz in args.imgsz:
+        for split in args.splits:
+            print(f"{split}-{imgsz}: {build_split(args.data, split, imgsz)}")
+        if args.bench:
+            bench(args.data, imgsz, args.passes)
+
+
+if __name__ == "__main__":
+    main()
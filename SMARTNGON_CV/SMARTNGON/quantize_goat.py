@@ -0,0 +1,251 @@
+# quantize_goat.py
+# Post-training INT8 quantization of the goat detector, with an accuracy/latency/size report against FP32
+#
+# Usage (from SMARTNGON_CV/SMARTNGON):
+#   python quantize_goat.py                                    # runs/detect/train2/weights/best.pt
+#   python quantize_goat.py --weights runs/sweep/sweep/yolov8n-416-default/weights/best.pt --imgsz 416
+#   python quantize_goat.py --calibration-images 200 --split test
+#
+# Pipeline: best.pt -> FP32 ONNX (dynamic input size) -> static INT8 ONNX (QDQ, per-channel weights),
+# calibrated on a random subset of the train split preprocessed exactly like inference. best.pt, the FP32
+# ONNX and the INT8 ONNX are then validated on --split and timed image by image on the same CPU threads.
+# The report lands next to the models as quantize_report.md / .json.
+#
+# Serve the INT8 model with CV_MODEL_PATH=<output>/best_int8.onnx (backend-python/.env).
+# Requires: pip install onnx onnxruntime
+
+import os
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_DATA = SCRIPT_DIR / "SmartNgon-2" / "data.yaml"
+DEFAULT_WEIGHTS = SCRIPT_DIR / "runs" / "detect" / "train2" / "weights" / "best.pt"
+
+# Letterbox fill ultralytics pads with
+PAD_VALUE = 114
+
+
+def letterbox(image, imgsz):
+    """Resize keeping aspect ratio and pad to imgsz x imgsz, as ultralytics' predictor does"""
+    import cv2
+
+    h0, w0 = image.shape[:2]
+    r = min(imgsz / h0, imgsz / w0)
+    w, h = round(w0 * r), round(h0 * r)
+    resized = cv2.resize(image, (w, h), interpolation=cv2.INTER_LINEAR)
+    top, left = (imgsz - h) // 2, (imgsz - w) // 2
+    canvas = np.full((imgsz, imgsz, 3), PAD_VALUE, dtype=np.uint8)
+    canvas[top:top + h, left:left + w] = resized
+    return canvas
+
+
+def preprocess(path, imgsz):
+    """BGR JPEG -> (1, 3, imgsz, imgsz) float32 RGB in [0, 1]"""
+    import cv2
+
+    image = letterbox(cv2.imread(str(path)), imgsz)
+    return np.ascontiguousarray(image[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def split_images(data_yaml, split):
+    folder = Path(data_yaml).resolve().parent / split / "images"
+    return sorted(p for p in folder.iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+
+
+class CalibrationReader:
+    """Feeds preprocessed train images to onnxruntime's calibrator one at a time"""
+
+    def __init__(self, images, input_name, imgsz):
+        self.images = iter(images)
+        self.input_name = input_name
+        self.imgsz = imgsz
+
+    def get_next(self):
+        path = next(self.images, None)
+        return None if path is None else {self.input_name: preprocess(path, self.imgsz)}
+
+    def rewind(self):
+        pass
+
+
+def export_fp32(weights, imgsz, output_dir):
+    from ultralytics import YOLO
+
+    exported = YOLO(str(weights)).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True, opset=17)
+    target = output_dir / "best_fp32.onnx"
+    os.replace(exported, target)
+    return target
+
+
+def head_nodes(model_path):
+    """Nodes of the Detect head (last module): box decoding and DFL lose the most accuracy when quantized"""
+    import onnx
+
+    graph = onnx.load(str(model_path)).graph
+    modules = [int(node.name.split("/")[1].split(".")[1]) for node in graph.node if node.name.startswith("/model.")]
+    head = f"/model.{max(modules)}/"
+    return [node.name for node in graph.node if node.name.startswith(head)]
+
+
+def quantize(fp32_path, calibration, imgsz, output_dir, quantize_head):
+    import onnx
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType, CalibrationMethod
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    prepared = output_dir / "best_fp32_prep.onnx"
+    quant_pre_process(str(fp32_path), str(prepared))
+
+    model = onnx.load(str(prepared))
+    input_name = model.graph.input[0].name
+
+    int8_path = output_dir / "best_int8.onnx"
+    quantize_static(
+        str(prepared), str(int8_path),
+        CalibrationReader(calibration, input_name, imgsz),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=[] if quantize_head else head_nodes(prepared),
+    )
+    prepared.unlink()
+
+    # ultralytics reads class names, stride and imgsz from the metadata; quantization drops it
+    quantized = onnx.load(str(int8_path))
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(onnx.load(str(fp32_path)).metadata_props)
+    onnx.save(quantized, str(int8_path))
+    return int8_path
+
+
+def evaluate(label, model_path, args, images):
+    """mAP on the chosen split plus median single-image latency, same threads for every model"""
+    from ultralytics import YOLO
+
+    metrics = YOLO(str(model_path), task="detect").val(
+        data=args.data, split=args.split, imgsz=args.imgsz, batch=1, device="cpu", plots=False, verbose=False
+    )
+
+    model = YOLO(str(model_path), task="detect")
+    for path in images[:3]:
+        model.predict(str(path), imgsz=args.imgsz, device="cpu", verbose=False)
+
+    timings = []
+    for _ in range(args.repeats):
+        for path in images:
+            started = time.perf_counter()
+            model.predict(str(path), imgsz=args.imgsz, device="cpu", verbose=False)
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    return {
+        "model": label,
+        "path": str(model_path),
+        "mAP50": round(float(metrics.box.map50), 4),
+        "mAP50-95": round(float(metrics.box.map), 4),
+        "latency_p50_ms": round(timings[len(timings) // 2], 1),
+        "latency_p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 1),
+        "size_mb": round(Path(model_path).stat().st_size / 1e6, 2),
+    }
+
+
+def write_report(rows, args, output_dir, calibration):
+    fp32, int8 = rows[0], rows[-1]
+    report = {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "weights": str(Path(args.weights).resolve()),
+        "split": args.split,
+        "imgsz": args.imgsz,
+        "threads": args.threads,
+        "calibration_images": len(calibration),
+        "quantized_head": args.quantize_head,
+        "models": rows,
+        "int8_vs_fp32": {
+            "mAP50_delta": round(int8["mAP50"] - fp32["mAP50"], 4),
+            "mAP50-95_delta": round(int8["mAP50-95"] - fp32["mAP50-95"], 4),
+            "speedup": round(fp32["latency_p50_ms"] / int8["latency_p50_ms"], 2),
+            "size_ratio": round(int8["size_mb"] / fp32["size_mb"], 2),
+        },
+    }
+    (output_dir / "quantize_report.json").write_text(json.dumps(report, indent=2))
+
+    columns = ["model", "mAP50", "mAP50-95", "latency_p50_ms", "latency_p95_ms", "size_mb"]
+    delta = report["int8_vs_fp32"]
+    lines = [
+        f"# INT8 quantization report ({report['timestamp']})",
+        "",
+        f"`{report['weights']}` at imgsz {args.imgsz}, evaluated on `{args.split}`, {args.threads} CPU thread(s); "
+        f"calibrated on {len(calibration)} train images.",
+        "",
+        "| " + " | ".join(columns) + " |",
+        "|" + "---|" * len(columns),
+    ]
+    lines += ["| " + " | ".join(str(row[c]) for c in columns) + " |" for row in rows]
+    lines += [
+        "",
+        f"INT8 vs FP32 (best.pt): mAP50 {delta['mAP50_delta']:+.4f}, mAP50-95 {delta['mAP50-95_delta']:+.4f}, "
+        f"{delta['speedup']}x faster, {delta['size_ratio']}x size.",
+    ]
+    (output_dir / "quantize_report.md").write_text("\n".join(lines) + "\n")
+    print("\n".join(lines[4:]))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8 post-training quantization of the goat detector")
+    parser.add_argument("--weights", default=str(DEFAULT_WEIGHTS))
+    parser.add_argument("--data", default=str(DEFAULT_DATA))
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--calibration-images", type=int, default=100, help="random train images used to calibrate")
+    parser.add_argument("--split", default="valid", choices=["valid", "test"], help="split to evaluate on")
+    parser.add_argument("--threads", type=int, default=2, help="CPU threads for every model during timing")
+    parser.add_argument("--repeats", type=int, default=3, help="passes over the split when timing")
+    parser.add_argument("--quantize-head", action="store_true", help="also quantize the Detect head (faster, less accurate)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="output directory (default: next to the weights)")
+    args = parser.parse_args()
+
+    # ultralytics calls the validation split "val"
+    args.split = "val" if args.split == "valid" else args.split
+    folder = "valid" if args.split == "val" else args.split
+
+    # Pin to the same cores for every model: onnxruntime sizes its pool from the affinity mask, torch from set_num_threads
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, sorted(os.sched_getaffinity(0))[:args.threads])
+    os.environ["OMP_NUM_THREADS"] = str(args.threads)
+    import torch
+    torch.set_num_threads(args.threads)
+
+    weights = Path(args.weights).resolve()
+    output_dir = Path(args.output).resolve() if args.output else weights.parent / "quantized"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    train = split_images(args.data, "train")
+    calibration = random.Random(args.seed).sample(train, min(args.calibration_images, len(train)))
+
+    print(f"1/3 Exporting {weights} to ONNX")
+    fp32_onnx = export_fp32(weights, args.imgsz, output_dir)
+    print(f"2/3 Quantizing to INT8 on {len(calibration)} calibration images")
+    int8_onnx = quantize(fp32_onnx, calibration, args.imgsz, output_dir, args.quantize_head)
+
+    print(f"3/3 Evaluating on {folder}")
+    images = split_images(args.data, folder)
+    rows = [
+        evaluate("fp32 (best.pt)", weights, args, images),
+        evaluate("fp32 onnx", fp32_onnx, args, images),
+        evaluate("int8 onnx", int8_onnx, args, images),
+    ]
+    write_report(rows, args, output_dir, calibration)
+    print(f"\nReport: {output_dir / 'quantize_report.md'}")
+    print(f"Serve it with CV_MODEL_PATH={int8_onnx}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# sweep_goat.py
+# Train several YOLO configurations side by side on CPU and compare them
+#
+# Usage (from SMARTNGON_CV/SMARTNGON):
+#   python sweep_goat.py --models yolov8n.pt yolov8s.pt --imgsz 416 640 --aug default light
+#   python sweep_goat.py --parallel 3 --epochs 100 --patience 15
+#   python sweep_goat.py                      # re-run: finished runs are skipped, interrupted ones resume
+#
+# Every combination of --models x --imgsz x --aug is one run. Runs execute as separate processes,
+# each pinned to its own slice of CPU cores, and stop early after --patience epochs without improvement.
+# Images are read from the memmap caches built by dataset_cache.py (--no-dataset-cache to skip).
+# When all runs are done, each best.pt is timed on the test images and a comparison table is written
+# to runs/sweep/<name>/summary.md and summary.csv.
+
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import argparse
+import itertools
+import subprocess
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_DATA = SCRIPT_DIR / "SmartNgon-2" / "data.yaml"
+
+# Augmentation presets passed straight to model.train(); "default" keeps ultralytics' defaults
+AUGMENTATIONS = {
+    "default": {},
+    # Small dataset, fixed pen cameras: less geometric distortion
+    "light": {"mosaic": 0.5, "scale": 0.3, "translate": 0.05, "fliplr": 0.5, "hsv_v": 0.3},
+    # Harder lighting and crowding: stronger colour jitter plus mixup
+    "heavy": {"mosaic": 1.0, "mixup": 0.15, "scale": 0.6, "degrees": 5.0, "hsv_s": 0.8, "hsv_v": 0.5},
+}
+
+SUMMARY_COLUMNS = ["run", "model", "imgsz", "aug", "epochs", "best_epoch", "mAP50", "mAP50-95",
+                   "precision", "recall", "latency_ms", "train_min", "status"]
+
+
+def partition_cores(parallel):
+    """Split the usable cores into `parallel` disjoint slices"""
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    parallel = max(1, min(parallel, len(cores)))
+    size = len(cores) // parallel
+    return [cores[i * size:(i + 1) * size] for i in range(parallel)]
+
+
+def plan_runs(args, sweep_dir):
+    runs = []
+    for model, imgsz, aug in itertools.product(args.models, args.imgsz, args.aug):
+        runs.append({
+            "name": f"{Path(model).stem}-{imgsz}-{aug}",
+            "model": model,
+            "imgsz": imgsz,
+            "aug": aug,
+            "data": str(Path(args.data).resolve()),
+            "epochs": args.epochs,
+            "patience": args.patience,
+            "batch": args.batch,
+            "workers": args.workers,
+            "dataset_cache": args.dataset_cache,
+            "project": str(sweep_dir),
+        })
+    return runs
+
+
+def read_state(run_dir):
+    path = run_dir / "state.json"
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def write_state(run_dir, **updates):
+    run_dir.mkdir(parents=True, exist_ok=True)
+    state = {**read_state(run_dir), **updates}
+    (run_dir / "state.json").write_text(json.dumps(state, indent=2))
+    return state
+
+
+def train_run(run, cores):
+    """Child process: train (or resume) one configuration, then validate its best weights"""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    import torch
+    torch.set_num_threads(len(cores))
+    from ultralytics import YOLO
+
+    if run["dataset_cache"]:
+        from dataset_cache import use_dataset_cache
+        use_dataset_cache(run["data"], run["imgsz"])
+
+    run_dir = Path(run["project"]) / run["name"]
+    state = read_state(run_dir)
+    last = run_dir / "weights" / "last.pt"
+    started = time.time()
+
+    if not state.get("trained"):
+        if last.exists():
+            print(f"Resuming {run['name']} from {last}", flush=True)
+            try:
+                YOLO(str(last)).train(resume=True, workers=run["workers"])
+            except AssertionError as e:
+                # ultralytics refuses to resume a run that had already finished training
+                print(f"Not resumed: {e}", flush=True)
+        else:
+            YOLO(run["model"]).train(
+                data=run["data"],
+                epochs=run["epochs"],
+                patience=run["patience"],  # early stopping: epochs without a better fitness
+                imgsz=run["imgsz"],
+                batch=run["batch"],
+                device="cpu",
+                workers=run["workers"],
+                project=run["project"],
+                name=run["name"],
+                exist_ok=True,
+                plots=False,
+                **AUGMENTATIONS[run["aug"]]
+            )
+        state = write_state(run_dir, trained=True, train_s=state.get("train_s", 0) + time.time() - started)
+
+    metrics = YOLO(str(run_dir / "weights" / "best.pt")).val(
+        data=run["data"], imgsz=run["imgsz"], batch=run["batch"], device="cpu",
+        split="val", plots=False, project=str(run_dir), name="val", exist_ok=True
+    )
+
+    with open(run_dir / "results.csv") as f:
+        rows = [{key.strip(): value for key, value in row.items()} for row in csv.DictReader(f)]
+    best = max(rows, key=lambda row: float(row["metrics/mAP50-95(B)"])) if rows else {}
+
+    write_state(
+        run_dir,
+        validated=True,
+        epochs=len(rows),
+        best_epoch=int(best["epoch"]) if best else None,
+        mAP50=round(float(metrics.box.map50), 4),
+        mAP50_95=round(float(metrics.box.map), 4),
+        precision=round(float(metrics.box.mp), 4),
+        recall=round(float(metrics.box.mr), 4),
+    )
+
+
+def launch(run, cores, log_path):
+    env = {**os.environ, "OMP_NUM_THREADS": str(len(cores)), "MKL_NUM_THREADS": str(len(cores))}
+    log = open(log_path, "a")
+    process = subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve()), "--child", json.dumps({"run": run, "cores": cores})],
+        cwd=SCRIPT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    return process, log
+
+
+def run_sweep(runs, partitions, sweep_dir):
+    """Keep every core slice busy until all pending runs have finished"""
+    pending = list(runs)
+    active = {}  # partition index -> (run, process, log)
+    failed = []
+
+    while pending or active:
+        for slot, cores in enumerate(partitions):
+            if slot in active or not pending:
+                continue
+            run = pending.pop(0)
+            process, log = launch(run, cores, sweep_dir / f"{run['name']}.log")
+            active[slot] = (run, process, log)
+            print(f"▶️  {run['name']} on cores {cores[0]}-{cores[-1]} (pid {process.pid})")
+
+        time.sleep(2)
+        for slot, (run, process, log) in list(active.items()):
+            if process.poll() is None:
+                continue
+            log.close()
+            del active[slot]
+            if process.returncode == 0:
+                print(f"✅ {run['name']} finished")
+            else:
+                failed.append(run["name"])
+                print(f"❌ {run['name']} exited with {process.returncode} - see {sweep_dir / (run['name'] + '.log')}")
+
+    return failed
+
+
+def measure_latency(weights, imgsz, images, threads, repeats):
+    """Median single-image predict() latency in ms with a fixed thread count"""
+    import torch
+    from ultralytics import YOLO
+
+    torch.set_num_threads(threads)
+    model = YOLO(str(weights))
+    for image in images[:3]:
+        model.predict(image, imgsz=imgsz, device="cpu", verbose=False)
+
+    timings = []
+    for _ in range(repeats):
+        for image in images:
+            started = time.perf_counter()
+            model.predict(image, imgsz=imgsz, device="cpu", verbose=False)
+            timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def summarize(runs, sweep_dir, args):
+    images = sorted(str(p) for p in (Path(args.data).resolve().parent / "test" / "images").glob("*.jpg"))
+    rows = []
+    for run in runs:
+        run_dir = sweep_dir / run["name"]
+        state = read_state(run_dir)
+        row = {
+            "run": run["name"], "model": run["model"], "imgsz": run["imgsz"], "aug": run["aug"],
+            "epochs": state.get("epochs"), "best_epoch": state.get("best_epoch"),
+            "mAP50": state.get("mAP50"), "mAP50-95": state.get("mAP50_95"),
+            "precision": state.get("precision"), "recall": state.get("recall"),
+            "latency_ms": state.get("latency_ms"),
+            "train_min": round(state["train_s"] / 60, 1) if state.get("train_s") else None,
+            "status": "done" if state.get("validated") else "incomplete",
+        }
+
+        # Timed after training, one model at a time, so runs don't compete for cores
+        if state.get("validated") and images and (row["latency_ms"] is None or state.get("latency_threads") != args.latency_threads):
+            latency = measure_latency(run_dir / "weights" / "best.pt", run["imgsz"], images, args.latency_threads, args.latency_repeats)
+            write_state(run_dir, latency_ms=round(latency, 1), latency_threads=args.latency_threads)
+            row["latency_ms"] = round(latency, 1)
+        rows.append(row)
+
+    rows.sort(key=lambda row: -(row["mAP50-95"] or -1))
+
+    with open(sweep_dir / "summary.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    lines = [
+        f"# Sweep {sweep_dir.name}",
+        "",
+        f"Latency: median predict() over {len(images)} test images, {args.latency_threads} torch thread(s).",
+        "",
+        "| " + " | ".join(SUMMARY_COLUMNS) + " |",
+        "|" + "---|" * len(SUMMARY_COLUMNS),
+    ]
+    lines += ["| " + " | ".join("" if row[c] is None else str(row[c]) for c in SUMMARY_COLUMNS) + " |" for row in rows]
+    (sweep_dir / "summary.md").write_text("\n".join(lines) + "\n")
+
+    print("\n".join(lines[4:]))
+
+    candidates = [row for row in rows if row["status"] == "done"]
+    if args.latency_budget_ms:
+        candidates = [row for row in candidates if row["latency_ms"] is not None and row["latency_ms"] <= args.latency_budget_ms]
+    if candidates:
+        pick = candidates[0]
+        print(f"\n🏆 Best mAP50-95{' within ' + str(args.latency_budget_ms) + ' ms' if args.latency_budget_ms else ''}: "
+              f"{pick['run']} (mAP50-95 {pick['mAP50-95']}, {pick['latency_ms']} ms) -> {sweep_dir / pick['run'] / 'weights' / 'best.pt'}")
+    print(f"Summary written to {sweep_dir / 'summary.md'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for the goat detector")
+    parser.add_argument("--models", nargs="+", default=["yolov8n.pt", "yolov8s.pt"])
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[416, 640])
+    parser.add_argument("--aug", nargs="+", default=["default", "light"], choices=sorted(AUGMENTATIONS))
+    parser.add_argument("--data", default=str(DEFAULT_DATA))
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--patience", type=int, default=15, help="stop a run after N epochs without improvement")
+    parser.add_argument("--batch", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=1, help="dataloader workers per run")
+    parser.add_argument("--no-dataset-cache", dest="dataset_cache", action="store_false",
+                        help="decode JPEGs every epoch instead of reading the memmap cache")
+    parser.add_argument("--parallel", type=int, default=None, help="concurrent runs (default: cores // 4)")
+    parser.add_argument("--name", default="sweep", help="sweep directory under runs/sweep; reuse it to resume")
+    parser.add_argument("--force", action="store_true", help="retrain runs that already finished")
+    parser.add_argument("--latency-threads", type=int, default=2, help="torch threads when timing inference")
+    parser.add_argument("--latency-repeats", type=int, default=3)
+    parser.add_argument("--latency-budget-ms", type=float, default=None, help="pick the best run under this latency")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child = json.loads(args.child)
+        train_run(child["run"], child["cores"])
+        return
+
+    sweep_dir = SCRIPT_DIR / "runs" / "sweep" / args.name
+    sweep_dir.mkdir(parents=True, exist_ok=True)
+
+    partitions = partition_cores(args.parallel or max(1, (os.cpu_count() or 1) // 4))
+    runs = plan_runs(args, sweep_dir)
+    (sweep_dir / "sweep.json").write_text(json.dumps({"args": vars(args), "runs": runs}, indent=2))
+
+    if args.force:
+        for run in runs:
+            shutil.rmtree(sweep_dir / run["name"], ignore_errors=True)
+    pending = [run for run in runs if not read_state(sweep_dir / run["name"]).get("validated")]
+
+    # Build the memmap caches once here, so parallel runs with the same imgsz don't race to create them
+    if args.dataset_cache and pending:
+        from dataset_cache import build_split, SPLITS
+        for imgsz in sorted({run["imgsz"] for run in pending}):
+            for split in SPLITS:
+                build_split(args.data, split, imgsz)
+
+    print(f"🧪 {len(runs)} runs ({len(runs) - len(pending)} already done), "
+          f"{len(partitions)} in parallel x {len(partitions[0])} cores each")
+
+    started = time.time()
+    failed = run_sweep(pending, partitions, sweep_dir)
+    print(f"Training finished in {(time.time() - started) / 60:.1f} min" + (f", failed: {', '.join(failed)}" if failed else ""))
+
+    summarize(runs, sweep_dir, args)
+
+
+if __name__ == "__main__":
+    main()
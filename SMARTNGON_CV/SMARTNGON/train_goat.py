@@ -1,4 +1,9 @@
 from ultralytics import YOLO
+from dataset_cache import use_dataset_cache
+
+# 0) Cache dataset ke memmap: JPEG cukup didecode sekali, bukan tiap epoch
+# (dibangun ulang otomatis kalau versi dataset / label berubah)
+use_dataset_cache("SmartNgon-2/data.yaml", imgsz=640)
 
 # 1) Pilih base model
 # Bisa ganti:
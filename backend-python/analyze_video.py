@@ -0,0 +1,331 @@
+"""
+Offline video analysis
+Decodes recorded pen footage in a reader process, runs YOLO across a worker pool and
+replays the detections through the multi-goat tracker in frame order
+
+Usage:
+  python analyze_video.py footage/kandang1_2024-06-01.mp4 footage/kandang2_*.mp4
+  python analyze_video.py day.mp4 --workers 6 --stride 2 --output day.ndjson.gz
+"""
+import os
+import sys
+import json
+import gzip
+import glob
+import time
+import heapq
+import queue
+import logging
+import argparse
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Add current directory to path so we can import services
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger("analyze_video")
+
+# Frame slots per worker in the shared-memory ring: one being inferred, one queued
+SLOTS_PER_WORKER = 2
+# How often a wait on the pool wakes up to check that the reader and workers are still alive
+LIVENESS_POLL_S = 1.0
+
+
+class VideoFailed(RuntimeError):
+    """A video could not be analyzed because a reader or worker process died or stalled"""
+
+
+def read_frames(path, shm_name, shape, stride, free_slots, tasks, results):
+    """Reader process: decode frames into free shared-memory slots and queue them for inference"""
+    import cv2
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    capture = cv2.VideoCapture(path)
+    height, width = shape[1:3]
+
+    index = queued = 0
+    try:
+        while True:
+            # grab() skips the decode for frames dropped by --stride
+            if not capture.grab():
+                break
+            if index % stride == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                if frame.shape[:2] != (height, width):
+                    frame = cv2.resize(frame, (width, height))
+
+                slot = free_slots.get()
+                ring[slot] = frame
+                tasks.put((shm_name, shape, index, slot))
+                queued += 1
+            index += 1
+    finally:
+        capture.release()
+        shm.close()
+        # Tell the main process how many results to wait for
+        results.put(("end", queued))
+
+
+def infer_worker(torch_threads, free_slots, tasks, results):
+    """Pool process: load the model once, then run detect() on every frame slot it is handed"""
+    import torch
+    torch.set_num_threads(torch_threads)
+
+    from services.yolo_service import detect
+    logging.getLogger().setLevel(logging.WARNING)
+
+    attached = {}
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        shm_name, shape, index, slot = task
+        if shm_name not in attached:
+            # Each video gets a fresh ring; drop the previous one
+            for shm, _ in attached.values():
+                shm.close()
+            shm = shared_memory.SharedMemory(name=shm_name)
+            attached = {shm_name: (shm, np.ndarray(shape, dtype=np.uint8, buffer=shm.buf))}
+
+        ring = attached[shm_name][1]
+        try:
+            boxes = detect(ring[slot])
+        except Exception as e:
+            logger.error(f"Inference failed on frame {index}: {e}")
+            boxes = []
+        finally:
+            free_slots.put(slot)
+
+        results.put((index, boxes))
+
+    for shm, _ in attached.values():
+        shm.close()
+
+
+def next_result(results, pool, reader, reader_done, timeout):
+    """Next item from the pool, raising VideoFailed when a process died or nothing arrived for `timeout` seconds"""
+    waited = 0.0
+    while True:
+        # Checked on every call: a worker killed while idle would otherwise go unnoticed until the next video
+        dead = [f"pid {worker.pid} (exit code {worker.exitcode})" for worker in pool if not worker.is_alive()]
+        if dead:
+            raise VideoFailed(f"inference worker died: {', '.join(dead)}")
+
+        try:
+            return results.get(timeout=LIVENESS_POLL_S)
+        except queue.Empty:
+            waited += LIVENESS_POLL_S
+
+        if not reader_done and not reader.is_alive():
+            # A reader that finished normally has already queued its "end" marker
+            try:
+                return results.get(timeout=LIVENESS_POLL_S)
+            except queue.Empty:
+                raise VideoFailed(f"frame reader died (exit code {reader.exitcode})")
+        if waited >= timeout:
+            raise VideoFailed(f"no inference result for {timeout:g}s")
+
+
+def analyze_video(path, args, pool, free_slots, tasks, results, out):
+    """Process one video through the pool and write its records to `out`; returns a summary"""
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        logger.error(f"Cannot open {path}")
+        return None
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+    if width <= 0 or height <= 0:
+        # Some containers/codecs report no size; the shared-memory ring cannot be sized from it
+        logger.error(f"Cannot analyze {path}: stream reports a {width}x{height} frame size")
+        return None
+
+    slots = len(pool) * SLOTS_PER_WORKER
+    shape = (slots, height, width, 3)
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+    for slot in range(slots):
+        free_slots.put(slot)
+
+    out.write(json.dumps({"video": path, "fps": fps, "width": width, "height": height, "frames": total, "stride": args.stride}) + "\n")
+
+    reader = mp.get_context("spawn").Process(target=read_frames, args=(path, shm.name, shape, args.stride, free_slots, tasks, results), daemon=True)
+    started = time.perf_counter()
+    reader.start()
+    try:
+        return replay_results(path, args, pool, free_slots, results, out, reader, fps, width, height, slots, started)
+    finally:
+        if reader.is_alive():
+            reader.terminate()
+        shm.close()
+        shm.unlink()
+
+
+def replay_results(path, args, pool, free_slots, results, out, reader, fps, width, height, slots, started):
+    """Collect a video's detections from the pool and replay them through the tracker in frame order"""
+    from services.yolo_service import MovementTracker, postprocess_boxes
+    from services.goat_tracker import MultiGoatTracker
+
+    # Fresh tracker per video: footage from different pens must not share state
+    tracker = MultiGoatTracker(MovementTracker)
+    waiting = []  # min-heap of (frame index, boxes) that arrived ahead of their turn
+    next_index = 0
+    expected = None  # frames queued by the reader, known once it reaches the end
+    received = frames = detections = reported = 0
+    triggers = []
+
+    while expected is None or received < expected:
+        item = next_result(results, pool, reader, expected is not None, args.result_timeout)
+        if item[0] == "end":
+            expected = item[1]
+            continue
+        received += 1
+        heapq.heappush(waiting, item)
+
+        # Replay strictly in frame order; the tracker counts movement between consecutive frames
+        while waiting and waiting[0][0] == next_index:
+            index, boxes = heapq.heappop(waiting)
+            next_index += args.stride
+            frames += 1
+
+            found, zone_info, _ = postprocess_boxes(boxes, width, height, tracker, args.stream)
+            detections += len(found)
+            if not found and not zone_info:
+                continue
+
+            # d: [x1, y1, x2, y2, confidence, track_id]
+            record = {"f": index, "t": round(index / fps, 2), "d": [d["bbox"] + [d["confidence"], d["track_id"]] for d in found]}
+            if zone_info:
+                record["k"] = zone_info["track_id"]
+                record["z"] = zone_info["zone"]
+                record["m"] = zone_info["movement_count"]
+                if zone_info["should_feed"]:
+                    record["feed"] = True
+                    triggers.append(record["t"])
+            out.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+        if args.progress and frames - reported >= args.progress:
+            reported = frames
+            elapsed = time.perf_counter() - started
+            print(f"   {path}: {frames} frames, {frames / elapsed:.1f} fps ({frames * args.stride / fps / elapsed:.1f}x real time)")
+
+    # Frames still waiting after the last result mean a gap in the sequence
+    for index, boxes in sorted(waiting):
+        logger.warning(f"Frame {index} replayed out of order (expected {next_index})")
+        found, _, _ = postprocess_boxes(boxes, width, height, tracker, args.stream)
+        frames += 1
+        detections += len(found)
+
+    reader.join()
+    elapsed = time.perf_counter() - started
+
+    # Every slot has been released by now; take them back so the next video starts with its own set
+    try:
+        for _ in range(slots):
+            free_slots.get(timeout=args.result_timeout)
+    except queue.Empty:
+        raise VideoFailed("frame slots were not released by the workers")
+
+    summary = {
+        "video": path,
+        "frames_analyzed": frames,
+        "detections": detections,
+        "feeding_triggers": triggers,
+        "elapsed_s": round(elapsed, 2),
+        "fps": round(frames / elapsed, 1) if elapsed else None,
+        "speedup_vs_realtime": round(frames * args.stride / fps / elapsed, 1) if elapsed else None
+    }
+    out.write(json.dumps({"summary": summary}) + "\n")
+    return summary
+
+
+def start_pool(workers, torch_threads):
+    """Spawn the inference workers with fresh queues"""
+    ctx = mp.get_context("spawn")
+    free_slots, tasks, results = ctx.Queue(), ctx.Queue(), ctx.Queue()
+    pool = [
+        ctx.Process(target=infer_worker, args=(torch_threads, free_slots, tasks, results), daemon=True)
+        for _ in range(workers)
+    ]
+    for worker in pool:
+        worker.start()
+    return pool, free_slots, tasks, results
+
+
+def stop_pool(pool, tasks, terminate=False):
+    if terminate:
+        for worker in pool:
+            worker.terminate()
+    else:
+        for _ in pool:
+            tasks.put(None)
+    for worker in pool:
+        worker.join(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze recorded pen footage offline")
+    parser.add_argument("videos", nargs="+", help="video files or glob patterns")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="inference processes")
+    parser.add_argument("--torch-threads", type=int, default=None, help="torch threads per worker (default: cpus / workers)")
+    parser.add_argument("--stride", type=int, default=1, help="analyze every Nth frame")
+    parser.add_argument("--output", default="video_analysis.ndjson.gz", help="NDJSON output (gzipped if it ends in .gz)")
+    parser.add_argument("--stream", default=None, help="camera stream id whose zone map applies (default: legacy zones)")
+    parser.add_argument("--progress", type=int, default=500, help="print progress every N frames (0 = off)")
+    parser.add_argument("--result-timeout", type=float, default=300, help="fail a video after this many seconds without a result (covers model loading)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    videos = [path for pattern in args.videos for path in sorted(glob.glob(pattern)) or [pattern]]
+    torch_threads = args.torch_threads or max(1, (os.cpu_count() or 1) // args.workers)
+
+    pool, free_slots, tasks, results = start_pool(args.workers, torch_threads)
+
+    print(f"🎞️ {len(videos)} video(s), {args.workers} workers x {torch_threads} torch threads, stride {args.stride}")
+
+    opener = gzip.open if args.output.endswith(".gz") else open
+    summaries = []
+    failed = []
+    try:
+        with opener(args.output, "wt") as out:
+            for path in videos:
+                try:
+                    summary = analyze_video(path, args, pool, free_slots, tasks, results, out)
+                except VideoFailed as e:
+                    print(f"❌ {path}: {e}")
+                    out.write(json.dumps({"video": path, "error": str(e)}) + "\n")
+                    failed.append(path)
+                    # The queues may still hold this video's frames, or be locked by a killed process: start over
+                    stop_pool(pool, tasks, terminate=True)
+                    pool, free_slots, tasks, results = start_pool(args.workers, torch_threads)
+                    continue
+
+                if summary:
+                    summaries.append(summary)
+                    print(
+                        f"✅ {path}: {summary['frames_analyzed']} frames, {summary['detections']} detections, "
+                        f"{len(summary['feeding_triggers'])} feeding triggers in {summary['elapsed_s']}s "
+                        f"({summary['speedup_vs_realtime']}x real time)"
+                    )
+    finally:
+        stop_pool(pool, tasks)
+
+    print(f"Results written to {args.output}")
+    if failed:
+        print(f"{len(failed)} video(s) failed: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
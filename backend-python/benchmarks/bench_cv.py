@@ -0,0 +1,208 @@
+# bench_cv.py
+# Repeatable benchmark of yolo_service.analyze_image over the SmartNgon-2 test/valid images
+#
+# Usage:
+#   python benchmarks/bench_cv.py                          # run and compare against the baseline
+#   python benchmarks/bench_cv.py --threads 4 --iterations 5
+#   python benchmarks/bench_cv.py --save-baseline          # store this run as the new baseline
+#
+# Exits with status 1 when throughput or p95 latency regress beyond --tolerance.
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import platform
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Run from backend-python/ or benchmarks/ - services must be importable
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND_DIR))
+
+DATASET_DIR = BACKEND_DIR.parent / 'SMARTNGON_CV' / 'SMARTNGON' / 'SmartNgon-2'
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+DEFAULT_BASELINE = RESULTS_DIR / 'cv_baseline.json'
+
+
+def load_images(splits):
+    images = []
+    for split in splits:
+        for path in sorted((DATASET_DIR / split / 'images').glob('*.jpg')):
+            images.append((path.name, path.read_bytes()))
+    return images
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS reports bytes
+        return round(peak / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+    except ImportError:
+        pass
+
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+def summarize(latencies_ms):
+    return {
+        "count": len(latencies_ms),
+        "mean_ms": round(sum(latencies_ms) / len(latencies_ms), 2) if latencies_ms else None,
+        "p50_ms": round(percentile(latencies_ms, 50), 2) if latencies_ms else None,
+        "p95_ms": round(percentile(latencies_ms, 95), 2) if latencies_ms else None,
+        "p99_ms": round(percentile(latencies_ms, 99), 2) if latencies_ms else None,
+    }
+
+
+def run(args):
+    # Keep the per-frame logging quiet while measuring
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.torch_threads:
+        import torch
+        torch.set_num_threads(args.torch_threads)
+
+    load_started = time.perf_counter()
+    from services.yolo_service import analyze_image, loaded_path
+    model_load_s = time.perf_counter() - load_started
+
+    images = load_images(args.splits)
+    if not images:
+        print(f"No images found under {DATASET_DIR} for splits {args.splits}")
+        sys.exit(2)
+
+    print(f"Model: {loaded_path}")
+    print(f"Images: {len(images)} ({', '.join(args.splits)}), iterations: {args.iterations}, threads: {args.threads}")
+
+    def analyze(item):
+        timings = {}
+        started = time.perf_counter()
+        result = analyze_image(item[1], timings)
+        return (time.perf_counter() - started) * 1000, timings, result.get("count", 0)
+
+    # Warm-up: first calls pay for lazy allocations and kernel selection
+    for item in images[:args.warmup]:
+        analyze(item)
+
+    workload = images * args.iterations
+    latencies, stages, detections = [], {}, 0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        for latency_ms, timings, count in pool.map(analyze, workload):
+            latencies.append(latency_ms)
+            detections += count
+            for stage, ms in timings.items():
+                stages.setdefault(stage, []).append(ms)
+    wall_s = time.perf_counter() - started
+
+    return {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "config": {
+            "model": str(loaded_path),
+            "splits": args.splits,
+            "images": len(images),
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "threads": args.threads,
+            "torch_threads": args.torch_threads,
+        },
+        "model_load_s": round(model_load_s, 2),
+        "frames": len(workload),
+        "detections": detections,
+        "wall_s": round(wall_s, 3),
+        "throughput_fps": round(len(workload) / wall_s, 2),
+        "latency": summarize(latencies),
+        "stages": {stage: summarize(values) for stage, values in stages.items()},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Return a list of regression messages (empty when within tolerance)"""
+    regressions = []
+
+    base_fps = baseline.get("throughput_fps")
+    if base_fps and report["throughput_fps"] < base_fps * (1 - tolerance):
+        regressions.append(f"throughput {report['throughput_fps']} fps < baseline {base_fps} fps")
+
+    for key in ("p95_ms", "p99_ms"):
+        base = baseline.get("latency", {}).get(key)
+        current = report["latency"].get(key)
+        if base and current and current > base * (1 + tolerance):
+            regressions.append(f"{key} {current} > baseline {base}")
+
+    base_rss = baseline.get("peak_rss_mb")
+    if base_rss and report["peak_rss_mb"] and report["peak_rss_mb"] > base_rss * (1 + tolerance):
+        regressions.append(f"peak RSS {report['peak_rss_mb']} MB > baseline {base_rss} MB")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analyze_image over the SmartNgon-2 dataset")
+    parser.add_argument("--splits", nargs="+", default=["test", "valid"])
+    parser.add_argument("--iterations", type=int, default=3, help="passes over the image set")
+    parser.add_argument("--warmup", type=int, default=5, help="images analyzed before timing starts")
+    parser.add_argument("--threads", type=int, default=1, help="concurrent analyze_image callers")
+    parser.add_argument("--torch-threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--output", default=str(RESULTS_DIR / "cv_latest.json"))
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    report = run(args)
+
+    print("=" * 60)
+    print(f"Throughput: {report['throughput_fps']} frames/s over {report['frames']} frames")
+    print(f"Latency:    p50 {report['latency']['p50_ms']} ms | p95 {report['latency']['p95_ms']} ms | p99 {report['latency']['p99_ms']} ms")
+    for stage, summary in report["stages"].items():
+        print(f"  {stage:<12} p50 {summary['p50_ms']} ms | p95 {summary['p95_ms']} ms")
+    print(f"Peak RSS:   {report['peak_rss_mb']} MB")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Report written to {output}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path} - run with --save-baseline to create one")
+        return
+
+    regressions = compare(report, json.loads(baseline_path.read_text()), args.tolerance)
+    if regressions:
+        print("❌ REGRESSION against baseline:")
+        for message in regressions:
+            print(f"   - {message}")
+        sys.exit(1)
+
+    print(f"✅ Within {args.tolerance:.0%} of baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+# bench_http.py
+# Open-loop HTTP load harness for the /iot and /cv endpoints of one local uvicorn process
+#
+# Usage:
+#   python benchmarks/bench_http.py                                   # steady 200 req/s for 30s
+#   python benchmarks/bench_http.py --scenario ramp --rate 50 --peak 2000 --duration 60
+#   python benchmarks/bench_http.py --scenario spike --rate 200 --peak 1500 --spike-length 5
+#   python benchmarks/bench_http.py --mix temperature=5,location=5,cv=1 --supabase-latency-ms 40
+#
+# The server runs in a child process with the in-memory Supabase backend and a stub MQTT client,
+# so only the app itself (routing, validation, background tasks, CV) is measured.
+# Requests are sent on a fixed arrival schedule regardless of how fast responses come back;
+# latency is measured from the scheduled send time so queueing delay is not hidden.
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import logging
+import multiprocessing
+from pathlib import Path
+from types import SimpleNamespace
+
+# Run from backend-python/ or benchmarks/ - services must be importable
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND_DIR))
+
+DATASET_DIR = BACKEND_DIR.parent / 'SMARTNGON_CV' / 'SMARTNGON' / 'SmartNgon-2'
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+ENDPOINTS = {
+    "temperature": "/iot/sensor/temperature",
+    "location": "/iot/location",
+    "cv": "/cv/analyze",
+}
+
+
+# ------------------------------------------------------------
+# Server side: the app with Supabase and MQTT stubbed
+# ------------------------------------------------------------
+
+class StubMQTTClient:
+    """Accepts every publish immediately, as if the broker acked it"""
+
+    def __init__(self):
+        self.on_connect = None
+        self.published = 0
+
+    def connect(self, *args, **kwargs):
+        pass
+
+    def loop_start(self):
+        if self.on_connect:
+            self.on_connect(self, None, {}, 0)
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def subscribe(self, *args, **kwargs):
+        pass
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published += 1
+        return SimpleNamespace(rc=0, mid=self.published, is_published=lambda: True, wait_for_publish=lambda timeout=None: None)
+
+
+def install_stubs(supabase):
+    os.environ["SUPABASE_BACKEND"] = "memory"
+    os.environ["SUPABASE_MEMORY_LATENCY_MS"] = str(supabase["latency_ms"])
+    os.environ["SUPABASE_MEMORY_JITTER_MS"] = str(supabase["jitter_ms"])
+    os.environ["SUPABASE_MEMORY_FAILURE_RATE"] = str(supabase["failure_rate"])
+    os.environ.setdefault("SPOOL_PATH", str(RESULTS_DIR / "bench_http_spool.db"))
+
+    from services.mqtt_service import mqtt_service
+    stub = StubMQTTClient()
+    stub.on_connect = mqtt_service._on_connect
+    mqtt_service.client = stub
+
+
+def serve(port, supabase):
+    os.chdir(BACKEND_DIR)
+    install_stubs(supabase)
+
+    import uvicorn
+    from main import app
+
+    # Per-request logging would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def wait_until_up(base_url, timeout):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    return False
+
+
+# ------------------------------------------------------------
+# Client side: open-loop arrivals
+# ------------------------------------------------------------
+
+def rate_at(args, elapsed):
+    """Offered requests/sec at a point in the run"""
+    if args.scenario == "ramp":
+        return args.rate + (args.peak - args.rate) * min(1.0, elapsed / args.duration)
+    if args.scenario == "spike":
+        start = (args.duration - args.spike_length) / 2
+        return args.peak if start <= elapsed < start + args.spike_length else args.rate
+    return args.rate
+
+
+def arrival_times(args):
+    """Poisson arrival schedule (seconds from start) following the scenario's rate curve"""
+    times, elapsed = [], 0.0
+    while True:
+        elapsed += random.expovariate(max(rate_at(args, elapsed), 1e-6))
+        if elapsed >= args.duration:
+            return times
+        times.append(elapsed)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint '{name}' in --mix (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def load_images():
+    return [path.read_bytes() for path in sorted((DATASET_DIR / 'test' / 'images').glob('*.jpg'))]
+
+
+def build_request(name, images):
+    goat_id = f"bench-goat-{random.randint(0, 999):03d}"
+    if name == "temperature":
+        return {"json": {"goat_id": goat_id, "temperature": round(random.gauss(38.8, 0.8), 2), "humidity": random.randint(50, 90)}}
+    if name == "location":
+        return {"json": {"goat_id": goat_id, "latitude": -6.9 + random.random() / 100, "longitude": 107.6 + random.random() / 100}}
+    return {"files": {"file": ("frame.jpg", random.choice(images), "image/jpeg")}}
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples, window_s):
+    latencies = [ms for ms, ok in samples if ok]
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        "requests": len(samples),
+        "throughput_rps": round(len(latencies) / window_s, 1) if window_s else None,
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+        "max_ms": round(max(latencies), 2) if latencies else None,
+    }
+
+
+async def drive(args, base_url, mix, images):
+    import httpx
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    schedule = arrival_times(args)
+    # (endpoint, scheduled offset, latency_ms, ok, error)
+    samples = []
+    inflight = 0
+
+    limits = httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+
+        async def fire(name, offset, scheduled):
+            nonlocal inflight
+            inflight += 1
+            error = None
+            try:
+                response = await client.post(ENDPOINTS[name], **build_request(name, images))
+                ok = response.status_code < 400
+                if not ok:
+                    error = f"HTTP {response.status_code}"
+            except Exception as e:
+                ok, error = False, type(e).__name__
+            finally:
+                inflight -= 1
+            samples.append((name, offset, (time.perf_counter() - scheduled) * 1000, ok, error))
+
+        tasks = []
+        started = time.perf_counter()
+        for offset in schedule:
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            name = random.choices(names, weights)[0]
+            if inflight >= args.max_inflight:
+                # Client-side saturation: count as an error rather than silently slowing arrivals
+                samples.append((name, offset, 0.0, False, "client_saturated"))
+                continue
+            tasks.append(asyncio.create_task(fire(name, offset, started + offset)))
+
+        await asyncio.gather(*tasks)
+        wall_s = time.perf_counter() - started
+
+    return samples, len(schedule), wall_s
+
+
+def report(args, samples, offered, wall_s):
+    endpoints = {
+        name: summarize([(ms, ok) for n, _, ms, ok, _ in samples if n == name], args.duration)
+        for name in sorted({s[0] for s in samples})
+    }
+
+    # Per-window view shows where the process stops keeping up with the offered load
+    windows = []
+    for start in range(0, int(args.duration), args.window):
+        in_window = [(ms, ok) for _, offset, ms, ok, _ in samples if start <= offset < start + args.window]
+        summary = summarize(in_window, args.window)
+        summary["start_s"] = start
+        summary["offered_rps"] = round(rate_at(args, start + args.window / 2), 1)
+        windows.append(summary)
+
+    saturation = next(
+        (
+            w for w in windows
+            if w["error_rate"] > args.max_error_rate or (w["p95_ms"] or 0) > args.slo_p95_ms
+        ),
+        None
+    )
+
+    errors = {}
+    for _, _, _, ok, error in samples:
+        if not ok:
+            errors[error] = errors.get(error, 0) + 1
+
+    return {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "config": {
+            "scenario": args.scenario,
+            "rate": args.rate,
+            "peak": args.peak,
+            "duration_s": args.duration,
+            "mix": args.mix,
+            "supabase_latency_ms": args.supabase_latency_ms,
+            "supabase_jitter_ms": args.supabase_jitter_ms,
+            "supabase_failure_rate": args.supabase_failure_rate,
+            "max_inflight": args.max_inflight,
+            "slo_p95_ms": args.slo_p95_ms,
+        },
+        "offered": offered,
+        "wall_s": round(wall_s, 2),
+        "overall": summarize([(ms, ok) for _, _, ms, ok, _ in samples], args.duration),
+        "endpoints": endpoints,
+        "errors": errors,
+        "windows": windows,
+        "saturated_at_rps": saturation["offered_rps"] if saturation else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop HTTP load test against a local backend process")
+    parser.add_argument("--scenario", choices=["steady", "ramp", "spike"], default="steady")
+    parser.add_argument("--rate", type=float, default=200, help="base arrival rate (req/s)")
+    parser.add_argument("--peak", type=float, default=1000, help="final rate for ramp, burst rate for spike")
+    parser.add_argument("--spike-length", type=float, default=5, help="spike duration in seconds")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--mix", default="temperature=5,location=5", help="endpoint weights, e.g. temperature=5,location=5,cv=1")
+    parser.add_argument("--supabase-latency-ms", type=float, default=20, help="simulated latency of each Supabase call")
+    parser.add_argument("--supabase-jitter-ms", type=float, default=5, help="uniform +/- jitter on that latency")
+    parser.add_argument("--supabase-failure-rate", type=float, default=0.0, help="fraction of Supabase calls that fail")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="client connection cap; arrivals beyond it count as errors")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--window", type=int, default=5, help="seconds per window in the report")
+    parser.add_argument("--slo-p95-ms", type=float, default=250, help="p95 above this marks the saturation point")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=str(RESULTS_DIR / "http_latest.json"))
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    mix = parse_mix(args.mix)
+
+    images = load_images() if "cv" in mix else []
+    if "cv" in mix and not images:
+        print(f"No images under {DATASET_DIR / 'test' / 'images'} - dropping cv from the mix")
+        mix.pop("cv")
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    base_url = f"http://127.0.0.1:{args.port}"
+    supabase = {"latency_ms": args.supabase_latency_ms, "jitter_ms": args.supabase_jitter_ms, "failure_rate": args.supabase_failure_rate}
+    server = multiprocessing.Process(target=serve, args=(args.port, supabase), daemon=True)
+    server.start()
+
+    # Model loading makes startup slow when cv is in the app
+    if not wait_until_up(base_url, 120):
+        server.terminate()
+        print("Server did not start within 120s")
+        sys.exit(2)
+
+    print(f"Scenario: {args.scenario} | rate {args.rate} req/s" + (f" -> peak {args.peak}" if args.scenario != "steady" else "") + f" | {args.duration}s | mix {mix}")
+
+    try:
+        samples, offered, wall_s = asyncio.run(drive(args, base_url, mix, images))
+    finally:
+        server.terminate()
+        server.join()
+
+    result = report(args, samples, offered, wall_s)
+
+    print("=" * 72)
+    print(f"{'endpoint':<12} {'reqs':>7} {'rps':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for name, s in list(result["endpoints"].items()) + [("overall", result["overall"])]:
+        print(
+            f"{name:<12} {s['requests']:>7} {s['throughput_rps']:>8} {s['error_rate'] * 100:>5.1f}% "
+            f"{s['p50_ms'] or '-':>8} {s['p95_ms'] or '-':>8} {s['p99_ms'] or '-':>8} {s['max_ms'] or '-':>8}"
+        )
+
+    print("-" * 72)
+    for w in result["windows"]:
+        print(f"  t={w['start_s']:>4}s offered {w['offered_rps']:>8} rps | done {w['throughput_rps']:>8} rps | p95 {w['p95_ms'] or '-':>8} ms | err {w['error_rate'] * 100:.1f}%")
+    if result["errors"]:
+        print(f"Errors: {result['errors']}")
+    if result["saturated_at_rps"]:
+        print(f"⚠️ Saturated at ~{result['saturated_at_rps']} req/s offered (p95 > {args.slo_p95_ms} ms or errors > {args.max_error_rate:.0%})")
+    else:
+        print("✅ No saturation within the offered load")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# bench_metrics.py
+# Measures the per-call overhead of the in-process metrics on the hot path, then the per-request cost of the
+# record_request_metrics HTTP middleware by A/B timing the real app with and without it
+# Usage: python benchmarks/bench_metrics.py [iterations] [--requests 2000] [--rounds 5] [--no-http]
+#
+# The A/B run drives main.app in-process over httpx's ASGI transport (no sockets), with the in-memory Supabase
+# backend at zero latency, so the difference between the two variants is the middleware alone.
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+
+# Run from backend-python/ or benchmarks/ - services must be importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.metrics_service import Metrics
+
+
+def measure(label, fn, iterations):
+    # Warm up so series are created before timing
+    for _ in range(1000):
+        fn()
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - started
+
+    per_call_ns = elapsed / iterations * 1e9
+    print(f"{label:<40} {per_call_ns:8.0f} ns/call")
+    return per_call_ns
+
+
+def set_request_metrics(app, middleware, enabled):
+    """Add or remove the metrics middleware; Starlette rebuilds the stack on the next request"""
+    app.user_middleware = [entry for entry in app.user_middleware if entry is not middleware]
+    if enabled:
+        # Outermost, where @app.middleware("http") registered it
+        app.user_middleware.insert(0, middleware)
+    app.middleware_stack = None
+
+
+async def time_requests(app, count):
+    """Mean microseconds per request over `count` sequential requests, alternating two routes"""
+    import httpx
+
+    body = {"goat_id": "bench-goat", "temperature": 38.6, "humidity": 70}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        # Warm up so the middleware stack is built before timing
+        for _ in range(50):
+            await client.get("/health")
+
+        started = time.perf_counter()
+        for i in range(count):
+            if i % 2:
+                response = await client.post("/iot/sensor/temperature", json=body)
+            else:
+                response = await client.get("/health")
+            response.raise_for_status()
+        return (time.perf_counter() - started) / count * 1e6
+
+
+def bench_middleware(requests, rounds):
+    os.environ.setdefault("SUPABASE_BACKEND", "memory")
+    os.environ["SUPABASE_MEMORY_LATENCY_MS"] = "0"
+    os.environ["SUPABASE_MEMORY_JITTER_MS"] = "0"
+
+    import main as app_module
+
+    # Per-request logging would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+    app = app_module.app
+    middleware = next(entry for entry in app.user_middleware if entry.kwargs.get("dispatch") is app_module.record_request_metrics)
+
+    print(f"\nHTTP middleware A/B ({rounds} rounds x {requests} requests, GET /health + POST /iot/sensor/temperature)")
+    print("=" * 52)
+    timings = {True: [], False: []}
+    for round_index in range(rounds):
+        # Alternate the order so drift (CPU frequency, GC) does not favour one variant
+        for enabled in ((True, False) if round_index % 2 == 0 else (False, True)):
+            set_request_metrics(app, middleware, enabled)
+            timings[enabled].append(asyncio.run(time_requests(app, requests)))
+    set_request_metrics(app, middleware, True)
+
+    with_mw, without_mw = statistics.median(timings[True]), statistics.median(timings[False])
+    print(f"{'without middleware':<40} {without_mw:8.1f} us/request")
+    print(f"{'with record_request_metrics':<40} {with_mw:8.1f} us/request")
+    print(f"{'middleware overhead':<40} {with_mw - without_mw:8.1f} us/request ({(with_mw / without_mw - 1) * 100:.1f} %)")
+    return with_mw - without_mw
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metrics instrumentation overhead")
+    parser.add_argument("iterations", type=int, nargs="?", default=200_000, help="iterations per micro-benchmark")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per variant per A/B round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--no-http", dest="http", action="store_false", help="skip the middleware A/B run")
+    args = parser.parse_args()
+
+    iterations = args.iterations
+    m = Metrics()
+
+    def timed_block():
+        with m.timer("cv_stage_duration_seconds", stage="inference"):
+            pass
+
+    print(f"Metrics overhead ({iterations} iterations)")
+    print("=" * 52)
+    baseline = measure("empty call", lambda: None, iterations)
+    inc = measure("counter inc (1 label)", lambda: m.inc("mqtt_messages_total", pattern="smartngangon/goat/+/temperature"), iterations)
+    obs = measure("histogram observe (2 labels)", lambda: m.observe("http_request_duration_seconds", 0.012, method="POST", route="/cv/analyze"), iterations)
+    tmr = measure("timer context manager (1 label)", timed_block, iterations)
+
+    # One /cv/analyze request records 3 stage observations, 1 request observation and 1 counter
+    per_request_us = (4 * obs + inc - 5 * baseline) / 1000
+    print("=" * 52)
+    print(f"Estimated overhead per /cv/analyze request: {per_request_us:.1f} us")
+    print(f"Share of a 50 ms CPU inference:             {per_request_us / 50_000 * 100:.4f} %")
+
+    started = time.perf_counter()
+    text = m.render()
+    print(f"render(): {(time.perf_counter() - started) * 1000:.2f} ms for {len(text.splitlines())} lines")
+
+    if args.http:
+        bench_middleware(args.requests, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# bench_postprocess.py
+# Microbenchmark of YOLO post-processing: per-box Python loop vs whole-array extraction and filtering
+#
+# Usage:
+#   python benchmarks/bench_postprocess.py                     # 10, 50, 100 and 300 raw boxes per frame
+#   python benchmarks/bench_postprocess.py --boxes 300 --frames 2000
+#
+# Frames are synthetic ultralytics Boxes (same tensors the model returns), so no images or inference are needed.
+
+import os
+import sys
+import time
+import argparse
+import logging
+
+import numpy as np
+
+# Run from backend-python/ or benchmarks/ - services must be importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_frames(count, boxes_per_frame, class_ids, width=640, height=480, seed=0):
+    """Random ultralytics Boxes with a mix of goat and non-goat classes"""
+    import torch
+    from ultralytics.engine.results import Boxes
+
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        x1 = rng.uniform(0, width * 0.9, boxes_per_frame)
+        y1 = rng.uniform(0, height * 0.9, boxes_per_frame)
+        x2 = np.minimum(width, x1 + rng.uniform(8, width / 2, boxes_per_frame))
+        y2 = np.minimum(height, y1 + rng.uniform(8, height / 2, boxes_per_frame))
+        conf = rng.uniform(0.35, 1.0, boxes_per_frame)
+        cls = rng.choice(class_ids, boxes_per_frame)
+        # ultralytics layout: x1, y1, x2, y2, conf, cls
+        data = torch.tensor(np.column_stack((x1, y1, x2, y2, conf, cls)), dtype=torch.float32)
+        frames.append(Boxes(data, (height, width)))
+    return frames
+
+
+def legacy_postprocess(result_boxes, names, allowed_ids, allowed_names):
+    """The per-box loop yolo_service used before vectorization, kept here as the reference"""
+    detections = []
+    for box in result_boxes:
+        x1, y1, x2, y2 = box.xyxy[0].tolist()
+        cls, conf = int(box.cls[0]), float(box.conf[0])
+
+        class_name = names[cls]
+        if not (cls in allowed_ids or class_name.lower() in allowed_names):
+            continue
+
+        aspect_ratio = (x2 - x1) / (y2 - y1)
+        behavior = "Standing"
+        if aspect_ratio > 2.0:
+            behavior = "Lying Down"
+        elif aspect_ratio < 0.6:
+            behavior = "Sitting"
+
+        detections.append({
+            "class": "Kambing",
+            "confidence": round(conf, 2),
+            "bbox": [round(x1), round(y1), round(x2), round(y2)],
+            "behavior": behavior,
+            "zone": "UNKNOWN"
+        })
+    return detections
+
+
+def measure(label, fn, frames, repeats):
+    # Warm up allocator and any lazy torch paths
+    for frame in frames[:50]:
+        fn(frame)
+
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for frame in frames:
+            fn(frame)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    per_frame_us = best / len(frames) * 1e6
+    print(f"  {label:<12} {per_frame_us:10.1f} us/frame")
+    return per_frame_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YOLO post-processing on frames with many raw boxes")
+    parser.add_argument("--boxes", type=int, nargs="+", default=[10, 50, 100, 300], help="raw boxes per frame (300 = YOLO max_det)")
+    parser.add_argument("--frames", type=int, default=1000, help="synthetic frames per size")
+    parser.add_argument("--repeats", type=int, default=3, help="timed passes; the fastest is reported")
+    args = parser.parse_args()
+
+    # Keep the per-frame logging quiet while measuring
+    logging.getLogger().setLevel(logging.WARNING)
+    from services.yolo_service import model, ALLOWED_COCO_IDS, ALLOWED_NAMES, boxes_to_array, build_detections
+
+    # Half the boxes are goat classes, the rest are other objects the filter must drop
+    goat_ids = [cls for cls, name in model.names.items() if cls in ALLOWED_COCO_IDS or name.lower() in ALLOWED_NAMES]
+    other_ids = [cls for cls in model.names if cls not in goat_ids] or goat_ids
+    class_ids = goat_ids * max(1, len(other_ids) // max(1, len(goat_ids))) + other_ids
+
+    def legacy(result_boxes):
+        return legacy_postprocess(result_boxes, model.names, ALLOWED_COCO_IDS, ALLOWED_NAMES)
+
+    def vectorized(result_boxes):
+        return build_detections(boxes_to_array(result_boxes))[0]
+
+    print(f"Post-processing ({args.frames} frames per size, best of {args.repeats})")
+    print("=" * 52)
+    for boxes_per_frame in args.boxes:
+        frames = make_frames(args.frames, boxes_per_frame, class_ids)
+
+        # Same output as the loop it replaces, or the numbers are meaningless
+        for frame in frames[:100]:
+            expected, actual = legacy(frame), vectorized(frame)
+            if expected != actual:
+                print(f"❌ Output mismatch at {boxes_per_frame} boxes:\n   legacy     {expected[:2]}\n   vectorized {actual[:2]}")
+                sys.exit(1)
+
+        print(f"{boxes_per_frame} raw boxes/frame")
+        legacy_us = measure("per-box loop", legacy, frames, args.repeats)
+        vector_us = measure("vectorized", vectorized, frames, args.repeats)
+        print(f"  {'speedup':<12} {legacy_us / vector_us:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# bench_supabase_http.py
+# Per-call overhead of Supabase table calls with and without connection reuse, against a local PostgREST stand-in
+#
+# Usage:
+#   python benchmarks/bench_supabase_http.py                        # 300 calls per client over TLS
+#   python benchmarks/bench_supabase_http.py --no-tls --calls 1000
+#   python benchmarks/bench_supabase_http.py --server-latency-ms 20 --gap-ms 50
+#   python benchmarks/bench_supabase_http.py --calls 10 --gap-ms 6000  # calls spaced past the default 5s keep-alive
+#
+# Each client sends the same alternating insert (sensor_logs) / select sequence through supabase-py:
+#   fresh    - keep-alive disabled: every call opens a connection (and does a TLS handshake). The library's
+#              default session degrades to this when calls are further apart than its 5s keep-alive expiry.
+#   default  - create_client() with no options: the library's own httpx session
+#   shared   - the tuned shared pool from services/http_pool.py (SUPABASE_HTTP_* settings)
+# The stand-in speaks HTTP/1.1 only, so HTTP/2 is not exercised here. Requires supabase and openssl (for --tls).
+
+import os
+import sys
+import ssl
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Run from backend-python/ or benchmarks/ - services must be importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.http_pool import HttpPool
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers PostgREST table calls: inserts echo the rows back, selects return an empty list"""
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, delayed ACKs add ~40ms to every reused connection
+    disable_nagle_algorithm = True
+
+    def _reply(self, status, body):
+        if self.server.latency_s:
+            time.sleep(self.server.latency_s)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def do_GET(self):
+        self._reply(200, [])
+
+    def do_POST(self):
+        rows = self._body()
+        self._reply(201, rows if isinstance(rows, list) else [rows])
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency_ms, tls_context):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.latency_s = latency_ms / 1000
+        self.tls_context = tls_context
+        self.connections = 0
+
+    def get_request(self):
+        sock, address = super().get_request()
+        self.connections += 1
+        if self.tls_context:
+            sock = self.tls_context.wrap_socket(sock, server_side=True)
+        return sock, address
+
+
+def self_signed_cert(folder):
+    cert, key = folder / "cert.pem", folder / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1", "-keyout", str(key), "-out", str(cert)],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(label, client, server, args):
+    table = client.table("sensor_logs")
+    row = {"goat_id": "bench-goat", "sensor_type": "temperature", "value": 38.6, "unit": "C"}
+
+    # One warm-up call so client construction is not timed
+    table.select("*").limit(1).execute()
+    connections_before = server.connections
+
+    timings = []
+    for i in range(args.calls):
+        started = time.perf_counter()
+        if i % 2:
+            client.table("sensor_logs").select("*").eq("goat_id", "bench-goat").limit(10).execute()
+        else:
+            client.table("sensor_logs").insert(row).execute()
+        timings.append((time.perf_counter() - started) * 1000)
+        if args.gap_ms:
+            time.sleep(args.gap_ms / 1000)
+
+    result = {
+        "client": label,
+        "calls": args.calls,
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "connections_opened": server.connections - connections_before,
+    }
+    print(f"{label:<8} mean {result['mean_ms']:7.2f} ms | p50 {result['p50_ms']:7.2f} ms | "
+          f"p95 {result['p95_ms']:7.2f} ms | {result['connections_opened']:5d} connections opened")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Supabase per-call overhead with and without connection reuse")
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--no-tls", dest="tls", action="store_false", help="plain HTTP (TCP setup only)")
+    parser.add_argument("--server-latency-ms", type=float, default=0.0, help="simulated PostgREST processing time")
+    parser.add_argument("--gap-ms", type=float, default=0.0, help="pause between calls")
+    args = parser.parse_args()
+
+    from supabase import create_client, ClientOptions
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server_tls = client_tls = None
+        if args.tls:
+            cert, key = self_signed_cert(Path(tmp))
+            server_tls = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            server_tls.load_cert_chain(cert, key)
+            client_tls = ssl.create_default_context(cafile=str(cert))
+
+        server = StandInServer(args.server_latency_ms, server_tls)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"{'https' if args.tls else 'http'}://127.0.0.1:{server.server_address[1]}"
+        key = "bench-anon-key"
+
+        print(f"Supabase table calls against {url} ({args.calls} calls, server latency {args.server_latency_ms:g} ms, gap {args.gap_ms:g} ms)")
+        print("=" * 96)
+
+        fresh_pool = HttpPool(max_keepalive=0, http2=False, verify=client_tls or True)
+        shared_pool = HttpPool(verify=client_tls or True)
+
+        default_client = create_client(url, key)
+        if client_tls:
+            # The library's own session, re-created with the same settings plus trust for the stand-in's certificate
+            session = default_client.postgrest.session
+            default_client.postgrest.session = type(session)(
+                headers=session.headers, timeout=session.timeout, follow_redirects=True, http2=True, verify=client_tls
+            )
+
+        results = [
+            run("fresh", create_client(url, key, options=ClientOptions(httpx_client=fresh_pool.client)), server, args),
+            run("default", default_client, server, args),
+            run("shared", create_client(url, key, options=ClientOptions(httpx_client=shared_pool.client)), server, args),
+        ]
+        shared_stats = shared_pool.get_stats()
+        print(f"\nShared pool: {json.dumps(shared_stats)}")
+        saved = results[0]["mean_ms"] - results[-1]["mean_ms"]
+        print(f"Connection reuse saves {saved:.2f} ms per call ({results[0]['mean_ms'] / results[-1]['mean_ms']:.1f}x)")
+
+        server.shutdown()
+        for pool in (fresh_pool, shared_pool):
+            pool.close()
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    report = {"tls": args.tls, "server_latency_ms": args.server_latency_ms, "gap_ms": args.gap_ms,
+              "results": results, "shared_pool": shared_stats}
+    (RESULTS_DIR / "supabase_http_latest.json").write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
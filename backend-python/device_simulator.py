@@ -187,5 +187,305 @@ def main():
     except Exception as e:
         print(f"\n❌ Error: {e}")
 
+# ============================================================
+# Swarm mode: thousands of virtual collars, feeders and RFID readers
+# ============================================================
+
+import heapq
+import argparse
+import threading
+
+def swarm_rate_factor(pattern, elapsed, duration, burst_every, burst_length, burst_factor):
+    """Multiplier applied to the base publish rate at a point in the run"""
+    if pattern == "burst":
+        return burst_factor if (elapsed % burst_every) < burst_length else 1.0
+    if pattern == "ramp":
+        return max(0.05, min(1.0, elapsed / duration)) * burst_factor
+    if pattern == "spike":
+        middle = duration / 2
+        return burst_factor if middle <= elapsed < middle + burst_length else 1.0
+    return 1.0
+
+class SwarmStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.published = {}
+        self.feed_commands = 0
+        self.feed_replies = 0
+
+    def add(self, kind, count=1):
+        with self.lock:
+            self.published[kind] = self.published.get(kind, 0) + count
+
+class FeederResponder:
+    """Answers feed commands like the ESP32 firmware: 'feeding' now, 'completed' after duration"""
+
+    def __init__(self, client, goat_ids, stats):
+        self.client = client
+        self.goat_ids = set(goat_ids)
+        self.stats = stats
+        self.pending = []  # heap of (due, topic, payload)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.client.subscribe("smartngangon/goat/+/command/feed", qos=1)
+        self.thread.start()
+
+    def on_message(self, client, userdata, msg):
+        goat_id = msg.topic.split('/')[2]
+        if goat_id not in self.goat_ids:
+            return
+
+        try:
+            data = json.loads(msg.payload.decode())
+        except json.JSONDecodeError:
+            return
+
+        if data.get("action") != "feed":
+            return
+
+        duration = int(data.get("duration_ms", data.get("duration", 3000)))
+        topic = f"smartngangon/goat/{goat_id}/feed/status"
+        base = {"duration": duration, "device_id": goat_id, "goat_id": goat_id, "command_id": data.get("command_id", "")}
+
+        with self.stats.lock:
+            self.stats.feed_commands += 1
+
+        client.publish(topic, json.dumps({**base, "status": "feeding", "sent_at": time.time()}))
+        with self.lock:
+            heapq.heappush(self.pending, (time.time() + duration / 1000, topic, base))
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            now = time.time()
+            with self.lock:
+                due = []
+                while self.pending and self.pending[0][0] <= now:
+                    due.append(heapq.heappop(self.pending))
+            for _, topic, base in due:
+                self.client.publish(topic, json.dumps({**base, "status": "completed", "sent_at": time.time()}))
+                with self.stats.lock:
+                    self.stats.feed_replies += 1
+            self.stop_event.wait(0.05)
+
+class SwarmConnection:
+    """One MQTT connection publishing on behalf of a slice of the virtual devices"""
+
+    def __init__(self, index, args, goats, kandangs, stats):
+        self.args = args
+        self.goats = goats
+        self.kandangs = kandangs
+        self.stats = stats
+        self.client = mqtt.Client(client_id=f"swarm-{os.getpid()}-{index}")
+        if USERNAME and PASSWORD:
+            self.client.username_pw_set(USERNAME, PASSWORD)
+        self.client.max_queued_messages_set(0)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.stop_event = threading.Event()
+        self.cursor = {"temperature": 0, "location": 0, "rfid": 0}
+
+    def connect(self):
+        self.client.connect(BROKER, PORT, 60)
+        self.client.loop_start()
+
+    def start(self, started_at):
+        self.started_at = started_at
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.client.loop_stop()
+        self.client.disconnect()
+
+    def _next(self, kind, devices):
+        i = self.cursor[kind]
+        self.cursor[kind] = (i + 1) % len(devices)
+        return devices[i]
+
+    def _publish(self, kind):
+        now = time.time()
+        if kind == "temperature":
+            goat_id = self._next(kind, self.goats)
+            topic = f"smartngangon/goat/{goat_id}/temperature"
+            payload = {"goat_id": goat_id, "temperature": round(random.gauss(38.8, 0.6), 2), "humidity": random.randint(55, 90)}
+        elif kind == "location":
+            goat_id = self._next(kind, self.goats)
+            topic = f"smartngangon/goat/{goat_id}/location"
+            payload = {"goat_id": goat_id, "latitude": -6.9 + random.random() / 100, "longitude": 107.6 + random.random() / 100}
+        else:
+            kandang_id = self._next(kind, self.kandangs)
+            topic = f"smartngangon/kandang/{kandang_id}/rfid"
+            payload = {"kandang_id": kandang_id, "rfid_tag": f"RFID-{random.randint(0, 99999):05d}"}
+
+        payload["sent_at"] = now
+        self.client.publish(topic, json.dumps(payload), qos=self.args.qos)
+
+    def _run(self):
+        args = self.args
+        # Base messages per second for this connection's slice of devices
+        rates = {
+            "temperature": len(self.goats) / args.temp_interval if self.goats and args.temp_interval else 0,
+            "location": len(self.goats) / args.location_interval if self.goats and args.location_interval else 0,
+            "rfid": len(self.kandangs) / args.rfid_interval if self.kandangs and args.rfid_interval else 0,
+        }
+        credit = {kind: 0.0 for kind in rates}
+        last = time.time()
+
+        while not self.stop_event.is_set():
+            now = time.time()
+            elapsed = now - self.started_at
+            factor = swarm_rate_factor(args.pattern, elapsed, args.duration, args.burst_every, args.burst_length, args.burst_factor)
+
+            for kind, rate in rates.items():
+                credit[kind] += rate * factor * (now - last)
+                due = int(credit[kind])
+                credit[kind] -= due
+                for _ in range(due):
+                    self._publish(kind)
+                if due:
+                    self.stats.add(kind, due)
+
+            last = now
+            self.stop_event.wait(0.01)
+
+def scrape_backend_metrics(url):
+    """Read MQTT ingest counters and lag histogram from the backend's /metrics"""
+    import requests
+
+    try:
+        text = requests.get(f"{url}/metrics", timeout=5).text
+    except Exception as e:
+        print(f"   ⚠️ Could not scrape {url}/metrics: {e}")
+        return None
+
+    swarm_patterns = ("temperature", "location", "rfid", "feed/status")
+    processed, lag_sum, lag_count, buckets = 0, 0.0, 0, {}
+    for line in text.splitlines():
+        if line.startswith("#") or not any(p in line for p in swarm_patterns):
+            continue
+        name, value = line.rsplit(" ", 1)
+        if name.startswith("mqtt_messages_total"):
+            processed += float(value)
+        elif name.startswith("mqtt_ingest_lag_seconds_sum"):
+            lag_sum += float(value)
+        elif name.startswith("mqtt_ingest_lag_seconds_count"):
+            lag_count += float(value)
+        elif name.startswith("mqtt_ingest_lag_seconds_bucket"):
+            le = name.split('le="')[1].split('"')[0]
+            buckets[le] = buckets.get(le, 0) + float(value)
+
+    return {"processed": processed, "lag_sum": lag_sum, "lag_count": lag_count, "buckets": buckets}
+
+def lag_percentile(before, after, pct):
+    """Upper bucket bound containing the pct-th percentile of lag observed during the run"""
+    total = after["lag_count"] - before["lag_count"]
+    if total <= 0:
+        return None
+
+    bounds = sorted((float(le) if le != "+Inf" else float("inf"), le) for le in after["buckets"])
+    for bound, le in bounds:
+        observed = after["buckets"][le] - before["buckets"].get(le, 0)
+        if observed >= total * pct / 100:
+            return bound
+    return float("inf")
+
+def run_swarm(args):
+    print("🐐 Smart Ngangon Swarm Load Generator")
+    print("=====================================")
+    print(f"Broker: {BROKER}:{PORT} | collars: {args.collars} | feeders: {args.feeders} | RFID readers: {args.readers}")
+    print(f"Pattern: {args.pattern} | duration: {args.duration}s | connections: {args.connections}")
+
+    goats = [f"sim-goat-{i:05d}" for i in range(args.collars)]
+    kandangs = [f"sim-kandang-{i:04d}" for i in range(args.readers)]
+    stats = SwarmStats()
+
+    connections = [
+        SwarmConnection(i, args, goats[i::args.connections], kandangs[i::args.connections], stats)
+        for i in range(args.connections)
+    ]
+    for connection in connections:
+        connection.connect()
+
+    # First `feeders` goats have a feeder that answers feed commands
+    responder_client = mqtt.Client(client_id=f"swarm-{os.getpid()}-feeders")
+    if USERNAME and PASSWORD:
+        responder_client.username_pw_set(USERNAME, PASSWORD)
+    responder = FeederResponder(responder_client, goats[:args.feeders], stats)
+    responder_client.on_message = responder.on_message
+    responder_client.connect(BROKER, PORT, 60)
+    responder_client.loop_start()
+    responder.start()
+
+    time.sleep(1)  # let connections settle before measuring
+    before = scrape_backend_metrics(args.backend_url) if args.backend_url else None
+
+    started = time.time()
+    for connection in connections:
+        connection.start(started)
+
+    try:
+        while time.time() - started < args.duration:
+            time.sleep(args.report_every)
+            elapsed = time.time() - started
+            sent = sum(stats.published.values())
+            print(f"   ⏱️ {elapsed:6.1f}s  sent {sent:>9}  ({sent / elapsed:,.0f} msg/s)  feed cmds {stats.feed_commands}")
+    except KeyboardInterrupt:
+        print("\nStopping swarm...")
+
+    for connection in connections:
+        connection.stop()
+    elapsed = time.time() - started
+
+    # Give the backend a moment to drain its queue before the final scrape
+    time.sleep(args.drain)
+    after = scrape_backend_metrics(args.backend_url) if args.backend_url else None
+
+    responder.stop_event.set()
+    responder_client.loop_stop()
+    responder_client.disconnect()
+
+    sent = sum(stats.published.values())
+    print("=====================================")
+    print(f"📤 Published {sent} messages in {elapsed:.1f}s ({sent / elapsed:,.0f} msg/s): {stats.published}")
+    print(f"🍽️ Feed commands answered: {stats.feed_commands} (completed: {stats.feed_replies})")
+
+    if before and after:
+        processed = after["processed"] - before["processed"]
+        lag_count = after["lag_count"] - before["lag_count"]
+        mean_lag = (after["lag_sum"] - before["lag_sum"]) / lag_count if lag_count else None
+        print(f"📥 Backend processed {processed:.0f} messages ({processed / (elapsed + args.drain):,.0f} msg/s sustained)")
+        if mean_lag is not None:
+            print(f"⏳ Ingest lag: mean {mean_lag * 1000:.1f} ms | p50 <= {lag_percentile(before, after, 50)}s | p95 <= {lag_percentile(before, after, 95)}s")
+        if processed < sent:
+            print(f"⚠️ Backend is behind by {sent - processed:.0f} messages")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Smart Ngangon device simulator")
+    parser.add_argument("--swarm", action="store_true", help="run the multi-device load generator")
+    parser.add_argument("--collars", type=int, default=1000, help="virtual goat collars (temperature + location)")
+    parser.add_argument("--feeders", type=int, default=100, help="collars whose feeder answers feed commands")
+    parser.add_argument("--readers", type=int, default=50, help="virtual RFID readers (one per kandang)")
+    parser.add_argument("--temp-interval", type=float, default=10.0, help="seconds between temperature readings per collar")
+    parser.add_argument("--location-interval", type=float, default=30.0, help="seconds between GPS fixes per collar")
+    parser.add_argument("--rfid-interval", type=float, default=5.0, help="seconds between scans per reader")
+    parser.add_argument("--pattern", choices=["steady", "burst", "ramp", "spike"], default="steady")
+    parser.add_argument("--burst-every", type=float, default=20.0, help="seconds between bursts (burst pattern)")
+    parser.add_argument("--burst-length", type=float, default=3.0, help="burst/spike length in seconds")
+    parser.add_argument("--burst-factor", type=float, default=5.0, help="rate multiplier during bursts")
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--connections", type=int, default=4, help="MQTT connections shared by the virtual devices")
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=0)
+    parser.add_argument("--backend-url", default="http://localhost:8000", help="backend to scrape /metrics from ('' to skip)")
+    parser.add_argument("--drain", type=float, default=3.0, help="seconds to wait for the backend after publishing")
+    parser.add_argument("--report-every", type=float, default=5.0)
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.swarm:
+        run_swarm(args)
+    else:
+        main()
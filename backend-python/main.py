@@ -1,7 +1,9 @@
 import os
+import time
 import logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 
@@ -18,6 +20,39 @@ load_dotenv()
 # Import services
 from services.mqtt_service import mqtt_service
 from services.supabase_service import supabase_service
+from services.spool_service import write_spool
+from services.snapshot_store import snapshot_store
+from services.http_pool import http_pool
+from services.event_hub import event_hub
+from services.device_farms import device_farms
+from services.feeding_scheduler import feeding_scheduler
+from services.command_tracker import command_tracker
+from services.metrics_service import metrics
+from services.log_service import debug_log
+
+# Background work waiting to be processed, read at scrape time
+metrics.register_gauge(
+    "background_backlog",
+    lambda: {
+        (("queue", "spool_queued"),): write_spool.get_stats()["queued"],
+        (("queue", "spool_pending"),): write_spool.get_stats()["pending"],
+        (("queue", "snapshot_queued"),): snapshot_store.get_stats()["queued"],
+        (("queue", "event_buffers"),): event_hub.get_stats()["buffered"],
+        (("queue", "pending_commands"),): len(command_tracker.pending),
+        (("queue", "scheduled_feeds"),): len(feeding_scheduler.schedules)
+    },
+    "Items waiting in background queues"
+)
+metrics.register_gauge(
+    "supabase_http_pool",
+    lambda: {
+        (("stat", name),): value
+        for name, value in http_pool.get_stats().items()
+        if isinstance(value, (int, float))
+    },
+    "Shared Supabase HTTP pool: open/idle connections and new vs reused connection counts"
+)
+metrics.register_gauge("mqtt_connected", lambda: {(): int(mqtt_service.connected)}, "MQTT broker connection state")
 
 # MQTT Message Handlers
 async def handle_temperature_data(topic: str, data: dict):
@@ -29,10 +64,13 @@ async def handle_temperature_data(topic: str, data: dict):
         
         if goat_id and temperature:
             await supabase_service.insert_sensor_log(goat_id, "temperature", temperature, "°C")
-            logger.info(f"Saved temperature data for goat {goat_id}: {temperature}°C")
+            debug_log.log(logger, "ingest_temperature", "Saved temperature data for goat %s: %s°C", goat_id, temperature)
         
         if goat_id and humidity:
             await supabase_service.insert_sensor_log(goat_id, "humidity", humidity, "%")
+        
+        if goat_id:
+            event_hub.publish("sensor_reading", {"temperature": temperature, "humidity": humidity}, goat_id=goat_id)
     
     except Exception as e:
         logger.error(f"Error handling temperature data: {e}")
@@ -47,7 +85,12 @@ async def handle_location_data(topic: str, data: dict):
         
         if goat_id and latitude and longitude:
             await supabase_service.update_goat_location(goat_id, latitude, longitude, location_name)
-            logger.info(f"Updated location for goat {goat_id}")
+            event_hub.publish(
+                "location",
+                {"latitude": latitude, "longitude": longitude, "location_name": location_name},
+                goat_id=goat_id
+            )
+            debug_log.log(logger, "ingest_location", "Updated location for goat %s", goat_id)
     
     except Exception as e:
         logger.error(f"Error handling location data: {e}")
@@ -65,6 +108,11 @@ async def handle_rfid_data(topic: str, data: dict):
                 1.0,
                 {"kandang_id": kandang_id, "rfid_tag": rfid_tag}
             )
+            event_hub.publish(
+                "rfid_scan",
+                {"kandang_id": kandang_id, "rfid_tag": rfid_tag},
+                farm_id=device_farms.farm_for("kandang", kandang_id)
+            )
             logger.info(f"RFID scan logged: {rfid_tag} at {kandang_id}")
     
     except Exception as e:
@@ -76,6 +124,11 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Smart Ngangon API...")
     
+    # Start local spool so Supabase writes survive outages
+    write_spool.start(supabase_service.write_remote)
+    # Event frames are written to disk by the snapshot store's own thread
+    snapshot_store.start()
+    
     try:
         # Connect to MQTT broker
         mqtt_service.connect()
@@ -85,21 +138,33 @@ async def lifespan(app: FastAPI):
         mqtt_service.register_handler("smartngangon/goat/+/location", handle_location_data)
         mqtt_service.register_handler("smartngangon/kandang/+/rfid", handle_rfid_data)
         mqtt_service.register_handler("smartngangon/device/+/wifi/scan_results", mqtt_service.handle_wifi_scan_results)
+        mqtt_service.register_handler("smartngangon/goat/+/feed/status", mqtt_service.handle_feed_status)
+        mqtt_service.register_handler("smartngangon/device/+/status", mqtt_service.handle_device_status)
         
         logger.info("MQTT service initialized successfully")
     
     except Exception as e:
         logger.error(f"Failed to initialize MQTT service: {e}")
     
+    try:
+        await feeding_scheduler.start()
+    except Exception as e:
+        logger.error(f"Failed to start feeding scheduler: {e}")
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Smart Ngangon API...")
+    await feeding_scheduler.stop()
     try:
         mqtt_service.disconnect()
         logger.info("MQTT service disconnected")
     except Exception as e:
         logger.error(f"Error during shutdown: {e}")
+    
+    write_spool.stop()
+    snapshot_store.stop()
+    # http_pool is not closed: the module-level Supabase client holds its httpx client for the process lifetime
 
 app = FastAPI(
     title="Smart Ngangon API",
@@ -123,11 +188,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record latency and status per route template"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = route.path if route else "unmatched"
+        metrics.observe("http_request_duration_seconds", time.perf_counter() - started, method=request.method, route=path)
+        metrics.inc("http_requests_total", method=request.method, route=path, status=status)
+
 # Import and include routers
-from routers import cv, iot
+from routers import cv, iot, events
 
 app.include_router(cv.router)
 app.include_router(iot.router)
+app.include_router(events.router)
 
 @app.get("/")
 async def root():
@@ -141,9 +222,30 @@ async def root():
 async def health_check():
     return {
         "status": "healthy",
-        "mqtt_connected": mqtt_service.connected
+        "mqtt_connected": mqtt_service.connected,
+        "supabase_backend": supabase_service.backend,
+        "spool": write_spool.get_stats(),
+        "snapshots": snapshot_store.get_stats(),
+        "supabase_http": http_pool.get_stats()
     }
 
+@app.get("/debug/logs")
+async def get_debug_logs(limit: int = 200, event: str = None, level: str = "DEBUG"):
+    """Dump recent detailed hot-path log records from the in-memory ring buffer"""
+    min_level = logging.getLevelName(level.upper())
+    if not isinstance(min_level, int):
+        min_level = logging.NOTSET
+    
+    return {
+        "status": "success",
+        "stats": debug_log.get_stats(),
+        "data": debug_log.dump(limit, event, min_level)
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -1,21 +1,73 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from services.yolo_service import analyze_image
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, BackgroundTasks
+from fastapi.responses import FileResponse
+import os
+# INFERENCE_MODE=remote sends frames to the shared inference server instead of loading the model here
+REMOTE_INFERENCE = os.getenv("INFERENCE_MODE", "local") == "remote"
+if REMOTE_INFERENCE:
+    from services.inference_client import analyze_image, inference_client
+else:
+    from services.yolo_service import analyze_image
+from services.adaptive_resolution import adaptive_resolution
+from services.roi_service import roi_registry
+from services.zone_map import zone_maps
+from services.metrics_service import record_stages
 # Use the SHARED mqtt_service instance (already connected in main.py)
 from services.mqtt_service import mqtt_service
+from services.event_hub import event_hub
+from services.command_tracker import command_tracker
+from services.device_farms import device_farms
+from services.snapshot_store import snapshot_store
+from services.supabase_service import supabase_service
+from pydantic import BaseModel
+from typing import List
 import logging
 import json
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/cv", tags=["Computer Vision"])
 
+class RoiConfig(BaseModel):
+    # [x1, y1, x2, y2] rectangles as fractions of the frame width/height
+    rects: List[List[float]]
+
+class Zone(BaseModel):
+    name: str
+    # [[x, y], ...] polygon vertices as fractions of the frame width/height
+    polygon: List[List[float]]
+
+class ZoneMapConfig(BaseModel):
+    zones: List[Zone]
+    # Zone reported for points outside every polygon
+    default: str = "KANDANG"
+
 @router.post("/analyze")
-async def analyze_frame(file: UploadFile = File(...)):
+async def analyze_frame(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...), trace: bool = False, stream: str = None):
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
+    # Per-stage timing breakdown is returned when ?trace=true or X-Trace: 1 is sent
+    trace = trace or request.headers.get("x-trace", "").lower() in ("1", "true", "yes")
+    # Camera identity (?stream=... or X-Stream-Id) lets the model input size adapt per camera
+    stream_id = stream or request.headers.get("x-stream-id")
+    timings = {}
+    started = time.perf_counter()
+    
     contents = await file.read()
-    results = analyze_image(contents)
+    record_stages({"upload_read": time.perf_counter() - started}, timings)
+    
+    results = analyze_image(contents, timings, stream_id)
+    # Detections carry no goat_id; the camera's farm scopes them to that farm's dashboards
+    farm_id = device_farms.farm_for("stream", stream_id)
+    
+    if results.get("status") == "success":
+        event_hub.publish("detection", {
+            "stream_id": stream_id,
+            "count": results["count"],
+            "detections": results["detections"],
+            "zone_info": results["zone_info"]
+        }, farm_id=farm_id)
     
     # Check if feeding should be triggered
     if results.get("should_trigger_feeding", False):
@@ -28,18 +80,136 @@ async def analyze_frame(file: UploadFile = File(...)):
                 "action": "feed",
                 "duration_ms": 3000,
                 "timestamp": str(datetime.now()),
-                "reason": "head_movement_detected"
+                "reason": "head_movement_detected",
+                "command_id": command_tracker.register("1")
             }
             # Use goat/1/command/feed to match ESP32 wildcard subscription
+            publish_started = time.perf_counter()
             success = mqtt_service.publish("smartngangon/goat/1/command/feed", payload)
+            record_stages({"mqtt_publish": time.perf_counter() - publish_started}, timings)
             if success:
                 logger.info("✅ MQTT feeding command sent successfully to servo")
+                event_hub.publish(
+                    "feed",
+                    {"stream_id": stream_id, "duration_ms": 3000, "triggered_by": "cv", "reason": "head_movement_detected"},
+                    farm_id=farm_id
+                )
             else:
+                command_tracker.cancel(payload["command_id"])
                 logger.error("❌ MQTT publish failed - servo did not receive command")
         else:
             logger.warning(f"❌ MQTT not connected (connected={mqtt_service.connected if mqtt_service else 'None'}) - cannot trigger feeding")
+        
+        # Keep the frame that triggered feeding; it is hashed and written after the response is sent
+        background_tasks.add_task(
+            supabase_service.insert_ai_event,
+            "1",
+            "feeding_trigger",
+            max((d["confidence"] for d in results.get("detections", [])), default=None),
+            {"stream_id": stream_id, "count": results.get("count"), "zone_info": results.get("zone_info")},
+            frame=contents
+        )
     
-    return {
+    response = {
         "filename": file.filename,
         "analysis": results
     }
+    
+    if trace:
+        response["trace"] = {
+            "stages_ms": timings,
+            "total_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+    
+    return response
+
+@router.get("/streams")
+async def get_stream_resolutions():
+    """Adaptive input size, switch counts and inference latency per size for each camera stream"""
+    if REMOTE_INFERENCE:
+        return inference_client.get_stats().get("adaptive_resolution", {})
+    return adaptive_resolution.get_stats()
+
+@router.get("/tracks")
+async def get_tracks():
+    """Active goat tracks (id, hits, misses, last box) for each camera stream"""
+    if REMOTE_INFERENCE:
+        return inference_client.get_stats().get("trackers", {})
+    from services.yolo_service import goat_trackers
+    return goat_trackers.get_stats()
+
+@router.get("/roi")
+async def get_roi_stats():
+    """ROI per stream with pixels processed and inference time saved against full frames"""
+    if REMOTE_INFERENCE:
+        return inference_client.get_stats().get("roi", {})
+    return roi_registry.get_stats()
+
+@router.put("/streams/{stream_id}/roi")
+async def set_stream_roi(stream_id: str, config: RoiConfig):
+    """Set the regions of interest for a camera; applies to the next frame, no restart needed"""
+    if not config.rects:
+        raise HTTPException(status_code=400, detail="At least one rectangle is required (DELETE to clear)")
+    
+    try:
+        rects = roi_registry.set(stream_id, config.rects)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"status": "success", "stream_id": stream_id, "rects": rects}
+
+@router.delete("/streams/{stream_id}/roi")
+async def clear_stream_roi(stream_id: str):
+    """Go back to full-frame inference for a camera"""
+    if not roi_registry.remove(stream_id):
+        raise HTTPException(status_code=404, detail=f"No ROI configured for stream {stream_id}")
+    
+    return {"status": "success", "stream_id": stream_id}
+
+@router.get("/zones")
+async def get_zone_stats():
+    """Zone map per stream and the lookup grids currently built from them"""
+    if REMOTE_INFERENCE:
+        return inference_client.get_stats().get("zones", {})
+    return zone_maps.get_stats()
+
+@router.get("/streams/{stream_id}/zones")
+async def get_stream_zones(stream_id: str):
+    zone_map = zone_maps.get(stream_id)
+    if zone_map is None:
+        raise HTTPException(status_code=404, detail=f"No zone map configured for stream {stream_id} (legacy bands in use)")
+    
+    return {"stream_id": stream_id, **zone_map}
+
+@router.put("/streams/{stream_id}/zones")
+async def set_stream_zones(stream_id: str, config: ZoneMapConfig):
+    """Set polygon zones for a camera; later polygons take precedence where they overlap"""
+    try:
+        zone_map = zone_maps.set(stream_id, config.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"status": "success", "stream_id": stream_id, **zone_map}
+
+@router.delete("/streams/{stream_id}/zones")
+async def clear_stream_zones(stream_id: str):
+    """Go back to the legacy left/middle/right zones for a camera"""
+    if not zone_maps.remove(stream_id):
+        raise HTTPException(status_code=404, detail=f"No zone map configured for stream {stream_id}")
+    
+    return {"status": "success", "stream_id": stream_id}
+
+@router.get("/snapshots")
+async def get_snapshot_stats():
+    """Stored event frames, disk use against the limit, deduplicated and evicted counts"""
+    return snapshot_store.get_stats()
+
+@router.get("/snapshots/{name}")
+async def get_snapshot(name: str):
+    """Frame (or <hash>_thumb.jpg thumbnail) referenced by an AI event's image_url"""
+    path = snapshot_store.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    
+    # Content-addressed: a name always maps to the same bytes
+    return FileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Optional
+import os
+import time
+import asyncio
+import json
+import logging
+
+from services.event_hub import event_hub
+from services.device_farms import device_farms
+from services.supabase_service import supabase_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/events", tags=["Live Updates"])
+
+KEEPALIVE_SECONDS = 15
+# Goats added to or moved between farms show up on open streams after this long
+FARM_REFRESH_SECONDS = float(os.getenv("EVENT_FARM_REFRESH_INTERVAL", "60"))
+
+class DeviceFarm(BaseModel):
+    farm_id: str
+
+async def farm_goat_ids(farm_id: str):
+    goats = await supabase_service.get_farm_goats(farm_id)
+    return {goat["id"] for goat in goats}
+
+@router.get("/stream")
+async def stream_events(request: Request, farm_id: Optional[str] = None, goat_id: Optional[str] = None):
+    """Server-Sent Events stream of readings, detections and feed events"""
+    goat_ids = None
+    if farm_id:
+        # One lookup per subscription (refreshed every FARM_REFRESH_SECONDS) instead of one per poll
+        goat_ids = await farm_goat_ids(farm_id)
+
+    subscriber = event_hub.subscribe(farm_id, goat_id, goat_ids)
+
+    async def event_stream():
+        refreshed = time.monotonic()
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                if farm_id and time.monotonic() - refreshed >= FARM_REFRESH_SECONDS:
+                    refreshed = time.monotonic()
+                    # An empty result is usually a failed lookup; keep the last known goats
+                    subscriber.goat_ids = await farm_goat_ids(farm_id) or subscriber.goat_ids
+                
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            event_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stats")
+async def get_event_stats():
+    """Get live update hub statistics"""
+    return {"status": "success", "data": event_hub.get_stats()}
+
+@router.get("/devices")
+async def get_device_farms():
+    """Farm assigned to each camera stream and kandang"""
+    return {"status": "success", "data": device_farms.get_all()}
+
+@router.put("/devices/{kind}/{device_id}")
+async def set_device_farm(kind: str, device_id: str, body: DeviceFarm):
+    """Assign a camera stream or kandang to a farm; its detections and RFID scans then reach only that farm's subscribers"""
+    try:
+        farm_id = device_farms.set(kind, device_id, body.farm_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"status": "success", "kind": kind, "device_id": device_id, "farm_id": farm_id}
+
+@router.delete("/devices/{kind}/{device_id}")
+async def clear_device_farm(kind: str, device_id: str):
+    try:
+        removed = device_farms.remove(kind, device_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"No farm assigned to {kind} {device_id}")
+    return {"status": "success", "kind": kind, "device_id": device_id}
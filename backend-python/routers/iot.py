@@ -2,10 +2,16 @@ from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
+import asyncio
 import logging
+import time
 
 from services.mqtt_service import mqtt_service
 from services.supabase_service import supabase_service
+from services.event_hub import event_hub
+from services.device_farms import device_farms
+from services.feeding_scheduler import feeding_scheduler
+from services.command_tracker import command_tracker
 
 logger = logging.getLogger(__name__)
 
@@ -85,6 +91,12 @@ async def receive_temperature(data: SensorData, background_tasks: BackgroundTask
                 {"temperature": data.temperature, "threshold": "37.5-40.0"}
             )
         
+        event_hub.publish(
+            "sensor_reading",
+            {"temperature": data.temperature, "humidity": data.humidity},
+            goat_id=data.goat_id
+        )
+        
         return {"status": "success", "message": "Temperature data received"}
     
     except Exception as e:
@@ -103,6 +115,12 @@ async def update_location(data: LocationData, background_tasks: BackgroundTasks)
             data.location_name
         )
         
+        event_hub.publish(
+            "location",
+            {"latitude": data.latitude, "longitude": data.longitude, "location_name": data.location_name},
+            goat_id=data.goat_id
+        )
+        
         return {"status": "success", "message": "Location updated"}
     
     except Exception as e:
@@ -129,6 +147,12 @@ async def handle_rfid_event(data: RFIDEvent, background_tasks: BackgroundTasks):
             }
         )
         
+        event_hub.publish(
+            "rfid_scan",
+            {"kandang_id": data.kandang_id, "rfid_tag": data.rfid_tag, "event_type": data.event_type},
+            farm_id=device_farms.farm_for("kandang", data.kandang_id)
+        )
+        
         return {"status": "success", "message": "RFID event logged", "rfid_tag": data.rfid_tag}
     
     except Exception as e:
@@ -151,6 +175,12 @@ async def trigger_feed(goat_id: str, command: FeedCommand, background_tasks: Bac
             f"Manual feed trigger via API, duration: {command.duration_ms}ms"
         )
         
+        event_hub.publish(
+            "feed",
+            {"duration_ms": command.duration_ms, "amount_kg": command.amount_kg, "triggered_by": "manual"},
+            goat_id=goat_id
+        )
+        
         return {
             "status": "success",
             "message": f"Feed command sent to goat {goat_id}",
@@ -161,6 +191,57 @@ async def trigger_feed(goat_id: str, command: FeedCommand, background_tasks: Bac
         logger.error(f"Error triggering feed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/farm/{farm_id}/feed")
+async def trigger_farm_feed(farm_id: str, command: FeedCommand):
+    """Trigger feeding for every goat in a farm"""
+    try:
+        started = time.perf_counter()
+        
+        goats = await supabase_service.get_farm_goats(farm_id)
+        goat_ids = [goat["id"] for goat in goats]
+        if not goat_ids:
+            raise HTTPException(status_code=404, detail=f"No goats found for farm {farm_id}")
+        
+        # Publishes are pipelined; waiting for broker acks happens off the event loop
+        dispatch = await asyncio.to_thread(mqtt_service.send_feed_commands, goat_ids, command.duration_ms)
+        
+        # One bulk insert for every command that reached the broker
+        await supabase_service.insert_feeding_logs([
+            {
+                "goat_id": goat_id,
+                "amount_kg": command.amount_kg,
+                "triggered_by": "manual",
+                "notes": f"Farm-wide feed via API, duration: {command.duration_ms}ms, dispatch: {status}"
+            }
+            for goat_id, status in dispatch.items()
+            if status in ("acked", "timeout")
+        ])
+        
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        acked = sum(1 for status in dispatch.values() if status == "acked")
+        
+        event_hub.publish(
+            "feed",
+            {"duration_ms": command.duration_ms, "amount_kg": command.amount_kg, "goats": acked, "triggered_by": "manual"},
+            farm_id=farm_id
+        )
+        
+        return {
+            "status": "success",
+            "farm_id": farm_id,
+            "duration_ms": command.duration_ms,
+            "dispatched": acked,
+            "total": len(goat_ids),
+            "devices": dispatch,
+            "elapsed_ms": elapsed_ms
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error triggering farm feed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/sensor/{goat_id}/latest")
 async def get_latest_sensors(goat_id: str, limit: int = 10):
     """Get latest sensor readings for a goat"""
@@ -203,6 +284,8 @@ async def create_schedule(schedule: ScheduleCreate):
             schedule.time,
             schedule.amount_kg
         )
+        for row in result or []:
+            feeding_scheduler.upsert(row)
         return {"status": "success", "data": result}
     
     except Exception as e:
@@ -219,6 +302,8 @@ async def update_schedule(schedule_id: str, schedule: ScheduleUpdate):
             schedule.amount_kg,
             schedule.is_active
         )
+        for row in result or []:
+            feeding_scheduler.upsert(row)
         return {"status": "success", "data": result}
     
     except Exception as e:
@@ -230,12 +315,49 @@ async def delete_schedule(schedule_id: str):
     """Delete a feeding schedule"""
     try:
         result = await supabase_service.delete_feeding_schedule(schedule_id)
+        if result is None:
+            # Keep firing it: the row is still in the database
+            raise HTTPException(status_code=500, detail="Failed to delete schedule")
+        
+        feeding_scheduler.remove(schedule_id)
         return {"status": "success", "message": "Schedule deleted"}
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting schedule: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/scheduler/status")
+async def get_scheduler_status(limit: int = 20):
+    """Get feeding scheduler state and upcoming fire times"""
+    return {
+        "status": "success",
+        "data": {
+            **feeding_scheduler.get_stats(),
+            "upcoming": feeding_scheduler.get_upcoming(limit)
+        }
+    }
+
+@router.get("/commands/unacknowledged")
+async def get_unacknowledged_commands():
+    """List feed commands that timed out without an ESP32 reply"""
+    return {
+        "status": "success",
+        "data": command_tracker.get_unacknowledged(),
+        "pending": command_tracker.get_pending()
+    }
+
+@router.get("/commands/latency")
+async def get_command_latency():
+    """Get per-device command round-trip latency histograms"""
+    return {"status": "success", "data": command_tracker.get_latency_stats()}
+
+@router.get("/devices/status")
+async def get_device_status():
+    """Get the latest status reported by each device"""
+    return {"status": "success", "data": mqtt_service.device_status}
+
 @router.post("/wifi/scan")
 async def scan_wifi(device_id: str = "all"):
     """Trigger WiFi scan on ESP32"""
@@ -0,0 +1,177 @@
+"""
+Model selection harness
+Evaluates every available YOLO candidate on this machine and writes the manifest yolo_service loads from
+
+Usage:
+  python select_model.py                           # test split, 640, INFERENCE_TORCH_THREADS threads
+  python select_model.py --budget-ms 120 --export onnx
+  python select_model.py --extra ../SMARTNGON_CV/SMARTNGON/runs/sweep/sweep/*/weights/best.pt
+"""
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+
+# Add current directory to path so we can import services
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.model_selection import MODEL_CANDIDATES, MANIFEST_PATH, ALLOWED_NAMES, choose, file_signature, host_fingerprint
+
+logger = logging.getLogger("select_model")
+
+DEFAULT_DATA = Path(__file__).resolve().parent.parent / 'SMARTNGON_CV' / 'SMARTNGON' / 'SmartNgon-2' / 'data.yaml'
+
+
+def exported_siblings(weights: Path):
+    """Exports of a .pt that sit next to it: ONNX, quantize_goat.py output and OpenVINO"""
+    return [
+        weights.with_suffix(".onnx"),
+        weights.parent / "quantized" / "best_fp32.onnx",
+        weights.parent / "quantized" / "best_int8.onnx",
+        weights.with_name(f"{weights.stem}_openvino_model"),
+    ]
+
+
+def discover(extra, export_formats):
+    """Existing candidate files plus their exports, de-duplicated, in MODEL_CANDIDATES order"""
+    from ultralytics import YOLO
+
+    found = []
+    for candidate in list(MODEL_CANDIDATES) + [Path(p) for pattern in extra for p in sorted(glob.glob(pattern))]:
+        path = Path(candidate)
+        if isinstance(candidate, str) and not path.exists():
+            # Hub names like yolov8n.pt: ultralytics downloads them into the working directory
+            YOLO(candidate)
+        if not path.exists():
+            continue
+
+        path = path.resolve()
+        if path.suffix == ".pt":
+            for fmt in export_formats:
+                target = path.with_suffix(".onnx") if fmt == "onnx" else path.with_name(f"{path.stem}_{fmt}_model")
+                if not target.exists():
+                    print(f"   exporting {path} -> {fmt}")
+                    YOLO(str(path)).export(format=fmt, dynamic=True)
+            found.append(path)
+            found += [sibling.resolve() for sibling in exported_siblings(path) if sibling.exists()]
+        else:
+            found.append(path)
+
+    return list(dict.fromkeys(found))
+
+
+def evaluate(path: Path, args, images, dataset_names):
+    """mAP on the split and per-image predict latency, the way yolo_service calls the model"""
+    from ultralytics import YOLO
+
+    model = YOLO(str(path), task="detect")
+    names = model.names
+
+    val_args = {}
+    if [names[k].lower() for k in sorted(names)] != [dataset_names[k].lower() for k in sorted(dataset_names)]:
+        # Not trained on SmartNgon (e.g. COCO yolov8n): score only its goat-like classes (sheep, cow), by name.
+        # ALLOWED_COCO_IDS is not used: in COCO's 80-class indexing 20/21 are elephant and bear.
+        goat_ids = [cls for cls, name in names.items() if name.lower() in ALLOWED_NAMES]
+        val_args = {"classes": goat_ids, "single_cls": True}
+
+    metrics = YOLO(str(path), task="detect").val(
+        data=str(args.data), split=args.split, imgsz=args.imgsz, batch=1, device="cpu",
+        conf=0.001, plots=False, verbose=False, **val_args
+    )
+
+    # Same call as detect(): decoded BGR frame, conf 0.35
+    for image in images[:3]:
+        model(image, conf=0.35, imgsz=args.imgsz, verbose=False)
+
+    timings = []
+    for _ in range(args.repeats):
+        for image in images:
+            started = time.perf_counter()
+            model(image, conf=0.35, imgsz=args.imgsz, verbose=False)
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    return {
+        "path": str(path),
+        "format": "openvino" if path.is_dir() else path.suffix.lstrip("."),
+        "signature": file_signature(path),
+        "classes_scored": val_args.get("classes", "all"),
+        "mAP50": round(float(metrics.box.map50), 4),
+        "mAP50-95": round(float(metrics.box.map), 4),
+        "latency_p50_ms": round(timings[len(timings) // 2], 1),
+        "latency_p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 1),
+        "size_mb": round(sum(f.stat().st_size for f in path.rglob("*")) / 1e6 if path.is_dir() else path.stat().st_size / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate YOLO candidates and write the model manifest")
+    parser.add_argument("--data", default=str(DEFAULT_DATA))
+    parser.add_argument("--split", default="test", choices=["test", "val"])
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--threads", type=int, default=int(os.getenv("INFERENCE_TORCH_THREADS", "0")) or None,
+                        help="torch threads, as the service runs (default: INFERENCE_TORCH_THREADS or torch's default)")
+    parser.add_argument("--repeats", type=int, default=3, help="passes over the split when timing")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("CV_LATENCY_BUDGET_MS") or 0),
+                        help="p50 latency budget stored in the manifest (0 = most accurate wins)")
+    parser.add_argument("--export", nargs="*", default=[], choices=["onnx", "openvino"], help="export .pt candidates first")
+    parser.add_argument("--extra", nargs="*", default=[], help="more weights files or glob patterns to evaluate")
+    parser.add_argument("--output", default=MANIFEST_PATH)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    import cv2
+    import torch
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    from ultralytics.data.utils import check_det_dataset
+    dataset = check_det_dataset(args.data)
+    folder = Path(dataset["test" if args.split == "test" else "val"])
+    images = [cv2.imread(str(p)) for p in sorted(folder.glob("*.jpg"))]
+    if not images:
+        print(f"No images in {folder}")
+        sys.exit(2)
+
+    candidates = discover(args.extra, args.export)
+    print(f"🔎 {len(candidates)} candidate(s), {len(images)} {args.split} images, imgsz {args.imgsz}, {torch.get_num_threads()} torch threads")
+
+    models = []
+    for path in candidates:
+        try:
+            entry = evaluate(path, args, images, dataset["names"])
+        except Exception as e:
+            logger.error(f"Evaluating {path} failed: {e}")
+            entry = {"path": str(path), "error": str(e)}
+        models.append(entry)
+        if "error" not in entry:
+            print(f"   {entry['mAP50-95']:.3f} mAP50-95 | {entry['mAP50']:.3f} mAP50 | "
+                  f"p50 {entry['latency_p50_ms']:7.1f} ms | {entry['size_mb']:6.1f} MB | {path}")
+
+    manifest = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "host": host_fingerprint(),
+        "torch_threads": torch.get_num_threads(),
+        "data": str(args.data),
+        "split": args.split,
+        "imgsz": args.imgsz,
+        "budget_ms": args.budget_ms,
+        "models": models,
+    }
+    picked = choose(manifest, args.budget_ms)
+    manifest["selected"] = picked["path"] if picked else None
+
+    Path(args.output).write_text(json.dumps(manifest, indent=2))
+    print(f"Manifest written to {args.output}")
+    if picked:
+        print(f"🏆 yolo_service will load {picked['path']} ({picked['mAP50-95']} mAP50-95, p50 {picked['latency_p50_ms']} ms"
+              f"{', budget ' + format(args.budget_ms, 'g') + ' ms' if args.budget_ms else ''})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Adaptive Resolution
+Picks the YOLO input size (imgsz) per camera stream from how large and confident recent detections are
+"""
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Optional, Dict, Any, List
+
+from services.metrics_service import metrics
+
+
+class AdaptiveResolution:
+    def __init__(self):
+        self.enabled = os.getenv("CV_ADAPTIVE_IMGSZ", "true").lower() in ("1", "true", "yes")
+        self.sizes = sorted(int(size) for size in os.getenv("CV_IMGSZ_LADDER", "320,416,512,640").split(","))
+        # Consecutive good frames required before stepping down one size
+        self.window = int(os.getenv("CV_IMGSZ_WINDOW", "10"))
+        self.high_conf = float(os.getenv("CV_IMGSZ_HIGH_CONF", "0.6"))
+        self.low_conf = float(os.getenv("CV_IMGSZ_LOW_CONF", "0.45"))
+        # Smallest goat side, in model-input pixels, that is still detected reliably
+        self.min_box_px = float(os.getenv("CV_IMGSZ_MIN_BOX_PX", "48"))
+        self.max_streams = int(os.getenv("CV_IMGSZ_MAX_STREAMS", "256"))
+
+        self.streams: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def choose(self, stream_id: str = None) -> Optional[int]:
+        """Input size for the next frame of a stream; None means the model default"""
+        if not self.enabled or not stream_id:
+            return None
+
+        with self._lock:
+            return self._state(stream_id)["imgsz"]
+
+    def update(self, stream_id: str, imgsz: Optional[int], detections: List[Dict[str, Any]],
+               frame_width: int, frame_height: int, inference_seconds: float):
+        """Record a frame's outcome and move the stream up or down the size ladder"""
+        if imgsz is None:
+            return
+
+        metrics.observe("cv_inference_seconds", inference_seconds, imgsz=imgsz)
+
+        with self._lock:
+            state = self._state(stream_id)
+            state["frames"] += 1
+            count, total = state["latency"].get(imgsz, (0, 0.0))
+            state["latency"][imgsz] = (count + 1, total + inference_seconds)
+
+            index = self.sizes.index(imgsz) if imgsz in self.sizes else len(self.sizes) - 1
+            had_detections = state["had_detections"]
+            state["had_detections"] = bool(detections)
+
+            if not detections:
+                # Lost the goat: it may be too small for this size, so look harder
+                state["good"].clear()
+                if had_detections:
+                    self._step(state, index + 1, "lost")
+                return
+
+            scale = imgsz / max(frame_width, frame_height)
+            smallest = min(min(d["bbox"][2] - d["bbox"][0], d["bbox"][3] - d["bbox"][1]) for d in detections) * scale
+            weakest = min(d["confidence"] for d in detections)
+
+            if weakest < self.low_conf or smallest < self.min_box_px / 2:
+                state["good"].clear()
+                self._step(state, index + 1, "low_confidence" if weakest < self.low_conf else "small_box")
+                return
+
+            if state["cooldown"]:
+                state["cooldown"] -= 1
+                return
+
+            # Only step down if the smallest box would still be big enough at the next size
+            next_size = self.sizes[index - 1] if index > 0 else None
+            state["good"].append(
+                next_size is not None
+                and weakest >= self.high_conf
+                and smallest * next_size / imgsz >= self.min_box_px
+            )
+            if len(state["good"]) == self.window and all(state["good"]):
+                state["good"].clear()
+                self._step(state, index - 1, "large_confident")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current size, switch counts and mean inference latency per size for each stream"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sizes": self.sizes,
+                "streams": {
+                    stream_id: {
+                        "imgsz": state["imgsz"],
+                        "frames": state["frames"],
+                        "switches": state["switches"],
+                        "last_reason": state["last_reason"],
+                        "inference_ms": {
+                            size: round(total / count * 1000, 1)
+                            for size, (count, total) in sorted(state["latency"].items())
+                        }
+                    }
+                    for stream_id, state in self.streams.items()
+                }
+            }
+
+    # Internals (called with the lock held)
+    def _state(self, stream_id: str) -> Dict[str, Any]:
+        state = self.streams.get(stream_id)
+        if state is None:
+            # New streams start at full resolution and earn their way down
+            state = self.streams[stream_id] = {
+                "imgsz": self.sizes[-1],
+                "frames": 0,
+                "switches": 0,
+                "cooldown": 0,
+                "had_detections": False,
+                "last_reason": None,
+                "good": deque(maxlen=self.window),
+                "latency": {}
+            }
+            if len(self.streams) > self.max_streams:
+                self.streams.popitem(last=False)
+        else:
+            self.streams.move_to_end(stream_id)
+        return state
+
+    def _step(self, state: Dict[str, Any], index: int, reason: str):
+        index = max(0, min(len(self.sizes) - 1, index))
+        if self.sizes[index] == state["imgsz"]:
+            return
+
+        stepped_up = self.sizes[index] > state["imgsz"]
+        state["imgsz"] = self.sizes[index]
+        state["switches"] += 1
+        state["last_reason"] = reason
+        # After stepping up, hold the size for a window so one bad frame can't cause flapping
+        state["cooldown"] = self.window if stepped_up else 0
+
+
+# Global adaptive resolution instance
+adaptive_resolution = AdaptiveResolution()
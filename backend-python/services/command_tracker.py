@@ -0,0 +1,168 @@
+"""
+Command Tracker
+Correlates feed commands with ESP32 feed-status replies and records round-trip latency
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+
+class LatencyHistogram:
+    def __init__(self, buckets: List[float] = None):
+        self.buckets = buckets or LATENCY_BUCKETS_MS
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float):
+        for i, bound in enumerate(self.buckets):
+            if value_ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+
+        self.count += 1
+        self.total += value_ms
+        self.max = max(self.max, value_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 1) if self.count else None,
+            "max_ms": round(self.max, 1),
+            "buckets": dict(zip(labels, self.counts))
+        }
+
+
+class CommandTracker:
+    def __init__(self):
+        self.timeout = float(os.getenv("COMMAND_ACK_TIMEOUT", "30"))
+        self.pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.unacknowledged = deque(maxlen=int(os.getenv("COMMAND_UNACKED_HISTORY", "500")))
+        self.histograms: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self.stats = {"sent": 0, "feeding": 0, "completed": 0, "timed_out": 0, "unmatched": 0, "publish_failed": 0}
+        self._lock = threading.Lock()
+
+    def register(self, device_id: str, command: str = "feed") -> str:
+        """Record an outgoing command and return its correlation id"""
+        command_id = uuid.uuid4().hex[:12]
+
+        with self._lock:
+            self._expire()
+            self.pending[command_id] = {
+                "command_id": command_id,
+                "device_id": device_id,
+                "command": command,
+                "stage": "sent",
+                "sent_at": datetime.utcnow().isoformat() + "Z",
+                "_sent": time.monotonic()
+            }
+            self.stats["sent"] += 1
+
+        return command_id
+
+    def cancel(self, command_id: str):
+        """Forget a command whose publish failed, so it is not later counted as a timeout"""
+        with self._lock:
+            if self.pending.pop(command_id, None) is not None:
+                self.stats["sent"] -= 1
+                self.stats["publish_failed"] += 1
+
+    def acknowledge(self, device_id: str, status: str, command_id: str = None) -> Optional[Dict[str, Any]]:
+        """Match a feed-status reply to its command and record the latency"""
+        if status not in ("feeding", "completed"):
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            self._expire()
+            entry = self.pending.get(command_id) if command_id else self._oldest_for(device_id)
+
+            if entry is None:
+                self.stats["unmatched"] += 1
+                logger.debug(f"Unmatched feed status '{status}' from {device_id} (command_id={command_id})")
+                return None
+
+            latency_ms = (now - entry["_sent"]) * 1000
+            histograms = self.histograms.setdefault(
+                entry["device_id"],
+                {"feeding": LatencyHistogram(), "completed": LatencyHistogram()}
+            )
+            histograms[status].observe(latency_ms)
+            self.stats[status] += 1
+
+            if status == "completed":
+                del self.pending[entry["command_id"]]
+            else:
+                entry["stage"] = "feeding"
+
+        return {"command_id": entry["command_id"], "status": status, "latency_ms": round(latency_ms, 1)}
+
+    def get_unacknowledged(self) -> List[Dict[str, Any]]:
+        """Commands that timed out without a feeding or completed reply"""
+        with self._lock:
+            self._expire()
+            return list(self.unacknowledged)
+
+    def get_pending(self) -> List[Dict[str, Any]]:
+        """Commands still waiting for a reply"""
+        with self._lock:
+            self._expire()
+            return [self._public(entry) for entry in self.pending.values()]
+
+    def get_latency_stats(self) -> Dict[str, Any]:
+        """Per-device command->feeding and command->completed histograms"""
+        with self._lock:
+            return {
+                "timeout_s": self.timeout,
+                "pending": len(self.pending),
+                **self.stats,
+                "devices": {
+                    device_id: {stage: h.to_dict() for stage, h in histograms.items()}
+                    for device_id, histograms in self.histograms.items()
+                }
+            }
+
+    # Internals (called with the lock held)
+    def _oldest_for(self, device_id: str) -> Optional[Dict[str, Any]]:
+        for entry in self.pending.values():
+            if entry["device_id"] == device_id:
+                return entry
+        return None
+
+    def _expire(self):
+        # pending is in send order, so expired commands are always at the front
+        cutoff = time.monotonic() - self.timeout
+        while self.pending:
+            entry = next(iter(self.pending.values()))
+            if entry["_sent"] > cutoff:
+                break
+
+            del self.pending[entry["command_id"]]
+            self.stats["timed_out"] += 1
+            self.unacknowledged.append({
+                **self._public(entry),
+                "reason": "no_ack" if entry["stage"] == "sent" else "no_completion"
+            })
+            logger.warning(f"Command {entry['command_id']} to {entry['device_id']} not acknowledged ({entry['stage']})")
+
+    @staticmethod
+    def _public(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in entry.items() if not k.startswith("_")}
+
+
+# Global command tracker instance
+command_tracker = CommandTracker()
@@ -0,0 +1,84 @@
+"""
+Config Store
+Small JSON file of per-stream settings shared by all worker processes and reloaded when it changes
+"""
+import os
+import json
+import time
+import logging
+import threading
+from typing import Callable, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class ReloadableConfig:
+    def __init__(self, path: str, validate: Callable[[Any], Any], reload_interval: float = 1.0):
+        self.path = path
+        self.validate = validate
+        self.reload_interval = reload_interval
+
+        self.values: Dict[str, Any] = {}
+        self.version = 0  # bumped whenever values change, so callers can invalidate caches
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._reload()
+
+    def get(self, key: str):
+        """Value for a key, picking up edits made by other processes"""
+        now = time.monotonic()
+        if now - self._checked >= self.reload_interval:
+            self._checked = now
+            self._reload()
+
+        return self.values.get(key)
+
+    def set(self, key: str, value: Any) -> Any:
+        """Validate, store and persist a value; returns the normalised value"""
+        value = self.validate(value)
+        with self._lock:
+            self.values = {**self.values, key: value}
+            self.version += 1
+            self._save()
+        return value
+
+    def remove(self, key: str) -> bool:
+        with self._lock:
+            if key not in self.values:
+                return False
+            self.values = {k: v for k, v in self.values.items() if k != key}
+            self.version += 1
+            self._save()
+        return True
+
+    def _reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+
+        if mtime == self._mtime:
+            return
+
+        try:
+            with open(self.path) as f:
+                values = {key: self.validate(value) for key, value in json.load(f).items()}
+        except (OSError, ValueError, TypeError, AttributeError, KeyError) as e:
+            logger.error(f"Ignoring invalid config {self.path}: {e}")
+            self._mtime = mtime
+            return
+
+        with self._lock:
+            self.values = values
+            self.version += 1
+            self._mtime = mtime
+        logger.info(f"Loaded {len(values)} stream settings from {self.path}")
+
+    def _save(self):
+        # Write-then-rename so other processes never read a half-written file
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.values, f, indent=2)
+        os.replace(tmp, self.path)
+        self._mtime = os.path.getmtime(self.path)
@@ -0,0 +1,56 @@
+"""
+Device Farms
+Farm that owns each camera stream and kandang, so events without a goat_id reach only that farm's dashboards
+"""
+import os
+import logging
+from typing import Optional, Dict
+
+from services.config_store import ReloadableConfig
+
+logger = logging.getLogger(__name__)
+
+DEVICE_KINDS = ("stream", "kandang")
+
+
+class DeviceFarms:
+    def __init__(self):
+        # Keys are "<kind>:<id>" so a camera and a kandang may share an id
+        self.config = ReloadableConfig(
+            os.getenv("DEVICE_FARMS_PATH", "device_farms.json"),
+            self._validate,
+            float(os.getenv("DEVICE_FARMS_RELOAD_INTERVAL", "1.0"))
+        )
+
+    def farm_for(self, kind: str, device_id: Optional[str]) -> Optional[str]:
+        """Owning farm of a device, None when unassigned (the event then reaches only unfiltered subscribers)"""
+        return self.config.get(f"{kind}:{device_id}") if device_id else None
+
+    def set(self, kind: str, device_id: str, farm_id: str) -> str:
+        self._check_kind(kind)
+        farm_id = self.config.set(f"{kind}:{device_id}", farm_id)
+        logger.info(f"{kind} {device_id} assigned to farm {farm_id}")
+        return farm_id
+
+    def remove(self, kind: str, device_id: str) -> bool:
+        self._check_kind(kind)
+        return self.config.remove(f"{kind}:{device_id}")
+
+    def get_all(self) -> Dict[str, str]:
+        return dict(self.config.values)
+
+    # Internals
+    @staticmethod
+    def _check_kind(kind: str):
+        if kind not in DEVICE_KINDS:
+            raise ValueError(f"Device kind must be one of {', '.join(DEVICE_KINDS)}, got {kind!r}")
+
+    @staticmethod
+    def _validate(farm_id: str) -> str:
+        if not isinstance(farm_id, str) or not farm_id:
+            raise ValueError(f"farm_id must be a non-empty string, got {farm_id!r}")
+        return farm_id
+
+
+# Global device farms instance
+device_farms = DeviceFarms()
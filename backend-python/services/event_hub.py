@@ -0,0 +1,118 @@
+"""
+Event Hub for live dashboard updates
+Fans out readings, detections and feed events to subscribed clients
+"""
+import os
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Any, Set
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    def __init__(self, farm_id: str = None, goat_id: str = None, goat_ids: Set[str] = None, buffer_size: int = 100):
+        self.farm_id = farm_id
+        self.goat_id = goat_id
+        # Goats belonging to farm_id, so goat-level events can be matched to the farm
+        self.goat_ids = goat_ids or set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = 0
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        """Check if an event passes this subscriber's farm/goat filter"""
+        # Events with neither id (devices not assigned to a farm) only reach unfiltered subscribers
+        if self.goat_id and event.get("goat_id") != self.goat_id:
+            return False
+
+        if self.farm_id:
+            return event.get("farm_id") == self.farm_id or event.get("goat_id") in self.goat_ids
+
+        return True
+
+    def offer(self, event: Dict[str, Any]):
+        """Buffer an event without blocking; drops the oldest event when the buffer is full"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class EventHub:
+    def __init__(self):
+        self.buffer_size = int(os.getenv("EVENT_BUFFER_SIZE", "100"))
+        self.subscribers: Set[Subscriber] = set()
+        self.published = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, farm_id: str = None, goat_id: str = None, goat_ids: Set[str] = None) -> Subscriber:
+        """Register a new subscriber; must be called from the event loop"""
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(farm_id, goat_id, goat_ids, self.buffer_size)
+
+        with self._lock:
+            self.subscribers.add(subscriber)
+
+        logger.info(f"Event subscriber added (farm={farm_id}, goat={goat_id}), total: {len(self.subscribers)}")
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """Remove a subscriber"""
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+        logger.info(f"Event subscriber removed (dropped {subscriber.dropped} events), total: {len(self.subscribers)}")
+
+    def publish(self, event_type: str, data: Dict[str, Any], goat_id: str = None, farm_id: str = None):
+        """Publish an event to matching subscribers; safe to call from any thread"""
+        self.published += 1
+
+        if not self.subscribers or self._loop is None:
+            return
+
+        event = {
+            "type": event_type,
+            "goat_id": goat_id,
+            "farm_id": farm_id,
+            "data": data,
+            "timestamp": datetime.utcnow().isoformat() + "Z"
+        }
+
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+
+        if on_loop:
+            self._dispatch(event)
+        else:
+            # MQTT callbacks run on the paho network thread
+            self._loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _dispatch(self, event: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self.subscribers)
+
+        for subscriber in subscribers:
+            if subscriber.matches(event):
+                subscriber.offer(event)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hub counters"""
+        with self._lock:
+            subscribers = list(self.subscribers)
+
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "buffer_size": self.buffer_size,
+            "buffered": sum(s.queue.qsize() for s in subscribers),
+            "dropped": sum(s.dropped for s in subscribers)
+        }
+
+
+# Global event hub instance
+event_hub = EventHub()
@@ -0,0 +1,288 @@
+"""
+Feeding Scheduler
+Executes feeding_schedules rows using a min-heap of next fire times
+"""
+import os
+import heapq
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Set
+from zoneinfo import ZoneInfo
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, the single worker leads
+    fcntl = None
+
+from services.mqtt_service import mqtt_service
+from services.supabase_service import supabase_service
+from services.event_hub import event_hub
+
+logger = logging.getLogger(__name__)
+
+
+class FeedingScheduler:
+    def __init__(self):
+        self.timezone = ZoneInfo(os.getenv("SCHEDULER_TIMEZONE", "Asia/Jakarta"))
+        self.duration_ms = int(os.getenv("SCHEDULED_FEED_DURATION_MS", "3000"))
+        # A feed due longer ago than this (loop stalled, host asleep) is skipped instead of dispensed late
+        self.grace_s = float(os.getenv("SCHEDULER_MISSED_GRACE_SECONDS", "300"))
+
+        # Every uvicorn worker runs this module; only the worker holding the lock file fires schedules.
+        # Set SCHEDULER_ENABLED=false on all but one host when workers do not share a filesystem.
+        self.enabled = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.lock_path = os.getenv("SCHEDULER_LOCK_PATH", "feeding_scheduler.lock")
+        self.leader_retry_s = float(os.getenv("SCHEDULER_LEADER_RETRY", "30"))
+        # Schedule changes made through other workers reach the leader on its next sync
+        self.sync_interval = float(os.getenv("SCHEDULER_SYNC_INTERVAL", "60"))
+        self.leader = False
+        self._lock_file = None
+
+        # schedule_id -> (schedule row, version). Heap entries carry the version they
+        # were pushed with; entries whose version is outdated are skipped when popped.
+        self.schedules: Dict[str, tuple] = {}
+        self._heap: List[tuple] = []
+        self._version = 0
+        self._stale = 0
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # The loop only keeps weak references to tasks; hold in-flight feeds until they finish
+        self._firing: Set[asyncio.Task] = set()
+        self.fired = 0
+        self.missed = 0
+
+    async def start(self):
+        """Start the task that waits for leadership, then loads active schedules and fires them"""
+        if not self.enabled:
+            logger.info("Feeding scheduler disabled (SCHEDULER_ENABLED=false)")
+            return
+
+        self._task = asyncio.create_task(self._lead())
+
+    async def stop(self):
+        """Stop the timer task and give up leadership"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._lock_file is not None:
+            # Closing the file releases the lock for the next worker
+            self._lock_file.close()
+            self._lock_file = None
+        self.leader = False
+        logger.info("Feeding scheduler stopped")
+
+    def upsert(self, schedule: Dict[str, Any]):
+        """Add or replace a schedule; inactive schedules are removed"""
+        if not self.leader or not schedule or "id" not in schedule:
+            return
+
+        if not schedule.get("is_active", True):
+            self.remove(schedule["id"])
+            return
+
+        if schedule["id"] in self.schedules:
+            self._stale += 1
+        self._add(schedule)
+        self._notify()
+
+    def remove(self, schedule_id: str):
+        """Remove a schedule; its heap entry is discarded lazily"""
+        if self.leader and self.schedules.pop(schedule_id, None) is not None:
+            self._stale += 1
+            self._notify()
+
+    def get_upcoming(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get the next schedules due to fire"""
+        upcoming = []
+        for fire_at, version, schedule_id in sorted(self._heap):
+            entry = self.schedules.get(schedule_id)
+            if entry is None or entry[1] != version:
+                continue
+            upcoming.append({
+                "schedule_id": schedule_id,
+                "farm_id": entry[0].get("farm_id"),
+                "time": entry[0].get("time"),
+                "fire_at": datetime.fromtimestamp(fire_at, self.timezone).isoformat()
+            })
+            if len(upcoming) >= limit:
+                break
+        return upcoming
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get scheduler counters"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "enabled": self.enabled,
+            "leader": self.leader,
+            "schedules": len(self.schedules),
+            "heap_size": len(self._heap),
+            "fired": self.fired,
+            "missed": self.missed,
+            "timezone": str(self.timezone)
+        }
+
+    # Internals
+    def _acquire(self) -> bool:
+        """Take the leader lock without blocking"""
+        if fcntl is None:
+            return True
+
+        if self._lock_file is None:
+            self._lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    async def _lead(self):
+        if not self._acquire():
+            logger.info(f"Feeding scheduler standing by: another worker holds {self.lock_path}")
+            while not self._acquire():
+                await asyncio.sleep(self.leader_retry_s)
+
+        self.leader = True
+        for schedule in await supabase_service.get_active_feeding_schedules():
+            self._add(schedule)
+
+        self._wakeup = asyncio.Event()
+        logger.info(f"Feeding scheduler leading in worker {os.getpid()} with {len(self.schedules)} active schedules")
+        await asyncio.gather(self._run(), self._sync_loop())
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                self._sync(await supabase_service.get_active_feeding_schedules())
+            except Exception as e:
+                logger.error(f"Error syncing feeding schedules: {e}")
+
+    def _sync(self, schedules: List[Dict[str, Any]]):
+        # An empty result is usually a failed lookup; keep the schedules already loaded
+        if not schedules:
+            return
+
+        fresh = {schedule["id"]: schedule for schedule in schedules if "id" in schedule}
+        for schedule_id in [s for s in self.schedules if s not in fresh]:
+            self.remove(schedule_id)
+        for schedule_id, schedule in fresh.items():
+            entry = self.schedules.get(schedule_id)
+            if entry is None or entry[0] != schedule:
+                self.upsert(schedule)
+
+    def _add(self, schedule: Dict[str, Any]):
+        try:
+            fire_at = self._next_fire(schedule["time"])
+        except (KeyError, ValueError) as e:
+            logger.error(f"Skipping schedule {schedule.get('id')} with invalid time: {e}")
+            return
+
+        self._version += 1
+        self.schedules[schedule["id"]] = (schedule, self._version)
+        heapq.heappush(self._heap, (fire_at, self._version, schedule["id"]))
+
+        # Rebuild once outdated entries dominate the heap
+        if self._stale > len(self.schedules):
+            self._compact()
+
+    def _compact(self):
+        self._heap = [
+            entry for entry in self._heap
+            if entry[2] in self.schedules and self.schedules[entry[2]][1] == entry[1]
+        ]
+        heapq.heapify(self._heap)
+        self._stale = 0
+
+    def _next_fire(self, time_str: str, after: datetime = None) -> float:
+        """Next timestamp strictly after `after` matching a HH:MM[:SS] schedule time"""
+        parts = [int(p) for p in time_str.split(":")]
+        hour, minute, second = (parts + [0, 0])[:3]
+
+        now = after or datetime.now(self.timezone)
+        fire = now.replace(hour=hour, minute=minute, second=second, microsecond=0)
+        if fire <= now:
+            fire += timedelta(days=1)
+        return fire.timestamp()
+
+    def _notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = datetime.now(self.timezone)
+
+            while self._heap and self._heap[0][0] <= now.timestamp():
+                fire_at, version, schedule_id = heapq.heappop(self._heap)
+                entry = self.schedules.get(schedule_id)
+
+                if entry is None or entry[1] != version:
+                    self._stale = max(0, self._stale - 1)
+                    continue
+
+                schedule = entry[0]
+                late_s = now.timestamp() - fire_at
+                if late_s > self.grace_s:
+                    self.missed += 1
+                    logger.warning(f"Skipping schedule {schedule_id} ({schedule.get('time')}): missed by {late_s:.0f}s")
+                else:
+                    task = asyncio.create_task(self._fire(schedule))
+                    self._firing.add(task)
+                    task.add_done_callback(self._firing.discard)
+
+                # Re-arm from now, not from the old fire time, so a long stall cannot fire the same schedule repeatedly
+                next_at = self._next_fire(schedule["time"], max(datetime.fromtimestamp(fire_at, self.timezone), now))
+                heapq.heappush(self._heap, (next_at, version, schedule_id))
+
+            timeout = self._heap[0][0] - now.timestamp() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, schedule: Dict[str, Any]):
+        """Feed every goat in the schedule's farm"""
+        farm_id = schedule.get("farm_id")
+        amount_kg = schedule.get("amount_kg")
+
+        try:
+            goats = await supabase_service.get_farm_goats(farm_id)
+            logger.info(f"⏰ Scheduled feed for farm {farm_id} at {schedule.get('time')}: {len(goats)} goats")
+
+            dispatch = await asyncio.to_thread(
+                mqtt_service.send_feed_commands,
+                [goat["id"] for goat in goats],
+                self.duration_ms
+            )
+            await supabase_service.insert_feeding_logs([
+                {
+                    "goat_id": goat_id,
+                    "amount_kg": amount_kg,
+                    "triggered_by": "schedule",
+                    "notes": f"Scheduled feed {schedule.get('time')} (schedule {schedule['id']}), dispatch: {status}"
+                }
+                for goat_id, status in dispatch.items()
+                if status in ("acked", "timeout")
+            ])
+
+            self.fired += 1
+            event_hub.publish(
+                "feed",
+                {"schedule_id": schedule["id"], "amount_kg": amount_kg, "goats": len(goats), "triggered_by": "schedule"},
+                farm_id=farm_id
+            )
+
+        except Exception as e:
+            logger.error(f"Error executing schedule {schedule.get('id')}: {e}")
+
+
+# Global feeding scheduler instance
+feeding_scheduler = FeedingScheduler()
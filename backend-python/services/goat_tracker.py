@@ -0,0 +1,180 @@
+"""
+Goat Tracker
+SORT/ByteTrack-style multi-object tracker: constant-velocity prediction plus vectorized IoU association
+"""
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Callable, Optional, Dict, Any, List
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def greedy_match(iou: np.ndarray, threshold: float):
+    """Match rows to columns by descending IoU; returns (pairs, unmatched rows, unmatched cols)"""
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols])
+
+    used_rows, used_cols, pairs = set(), set(), []
+    for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        pairs.append((r, c))
+
+    return (
+        pairs,
+        [r for r in range(iou.shape[0]) if r not in used_rows],
+        [c for c in range(iou.shape[1]) if c not in used_cols]
+    )
+
+
+class Track:
+    __slots__ = ("track_id", "box", "velocity", "hits", "misses", "movement")
+
+    def __init__(self, track_id: int, box: np.ndarray, movement):
+        self.track_id = track_id
+        self.box = box
+        self.velocity = np.zeros(4)
+        self.hits = 1
+        self.misses = 0
+        self.movement = movement
+
+    def predict(self) -> np.ndarray:
+        return self.box + self.velocity
+
+    def correct(self, box: np.ndarray, smoothing: float):
+        # Exponentially smoothed per-frame displacement of each box edge
+        self.velocity = smoothing * (box - self.box) + (1 - smoothing) * self.velocity
+        self.box = box
+        self.hits += 1
+        self.misses = 0
+
+
+class MultiGoatTracker:
+    def __init__(self, movement_factory: Callable[[], Any]):
+        self.movement_factory = movement_factory
+        self.high_conf = float(os.getenv("TRACKER_HIGH_CONF", "0.5"))
+        self.match_iou = float(os.getenv("TRACKER_MATCH_IOU", "0.3"))
+        self.max_misses = int(os.getenv("TRACKER_MAX_MISSES", "30"))
+        self.smoothing = float(os.getenv("TRACKER_VELOCITY_SMOOTHING", "0.5"))
+
+        self.tracks: List[Track] = []
+        self.next_id = 1
+        # With INFERENCE_THREADS > 1 the inference server runs frames of one stream concurrently
+        self._lock = threading.Lock()
+
+    def update(self, detections: List[Dict[str, Any]], frame_width: int, frame_height: int) -> Optional[Dict[str, Any]]:
+        """
+        Assign a track_id to each detection and advance that track's movement state.
+        Returns the zone_info of the track that should trigger feeding, else of the oldest visible track.
+        """
+        with self._lock:
+            return self._update(detections, frame_width, frame_height)
+
+    def _update(self, detections: List[Dict[str, Any]], frame_width: int, frame_height: int) -> Optional[Dict[str, Any]]:
+        boxes = np.array([d["bbox"] for d in detections], dtype=float).reshape(-1, 4)
+        confs = np.array([d["confidence"] for d in detections], dtype=float)
+        predicted = np.array([t.predict() for t in self.tracks]).reshape(-1, 4)
+
+        # ByteTrack: confident detections claim tracks first, weak ones may only extend leftovers
+        high = np.nonzero(confs >= self.high_conf)[0]
+        low = np.nonzero(confs < self.high_conf)[0]
+
+        pairs, free_tracks, free_high = greedy_match(iou_matrix(predicted, boxes[high]), self.match_iou)
+        matches = [(t, int(high[d])) for t, d in pairs]
+
+        low_pairs, free_tracks_idx, _ = greedy_match(iou_matrix(predicted[free_tracks], boxes[low]), self.match_iou)
+        matches += [(free_tracks[t], int(low[d])) for t, d in low_pairs]
+        unmatched_tracks = [free_tracks[t] for t in free_tracks_idx]
+
+        assigned = {}
+        for t, d in matches:
+            self.tracks[t].correct(boxes[d], self.smoothing)
+            assigned[d] = self.tracks[t]
+
+        for t in unmatched_tracks:
+            track = self.tracks[t]
+            track.misses += 1
+            # Coast along the motion model while the goat is occluded
+            track.box = track.predict()
+
+        for d in free_high:
+            track = Track(self.next_id, boxes[high[d]], self.movement_factory())
+            self.next_id += 1
+            self.tracks.append(track)
+            assigned[int(high[d])] = track
+
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        primary = None
+        for index, detection in enumerate(detections):
+            track = assigned.get(index)
+            if track is None:
+                # Weak detection that matched nothing: too unreliable to start a track
+                detection["track_id"] = None
+                continue
+
+            info = {**track.movement.update(detection["bbox"], frame_width, frame_height, detection.get("zone")), "track_id": track.track_id}
+            detection["track_id"] = track.track_id
+            detection["zone"] = info["zone"]
+            detection["movement_count"] = info["movement_count"]
+
+            # A feeding trigger wins; otherwise the longest-lived track (lowest id) drives zone_info
+            if primary is None or (info["should_feed"], -info["track_id"]) > (primary["should_feed"], -primary["track_id"]):
+                primary = info
+
+        return primary
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tracks": len(self.tracks),
+                "next_id": self.next_id,
+                "active": [
+                    {"track_id": t.track_id, "hits": t.hits, "misses": t.misses, "bbox": [round(v) for v in t.box.tolist()]}
+                    for t in self.tracks
+                ]
+            }
+
+
+class TrackerRegistry:
+    """One MultiGoatTracker per camera stream, least recently used streams evicted"""
+
+    def __init__(self, movement_factory: Callable[[], Any]):
+        self.movement_factory = movement_factory
+        self.max_streams = int(os.getenv("TRACKER_MAX_STREAMS", "256"))
+        self.trackers: "OrderedDict[str, MultiGoatTracker]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, stream_id: str = None) -> MultiGoatTracker:
+        stream_id = stream_id or "default"
+        with self._lock:
+            tracker = self.trackers.get(stream_id)
+            if tracker is None:
+                tracker = self.trackers[stream_id] = MultiGoatTracker(self.movement_factory)
+                if len(self.trackers) > self.max_streams:
+                    self.trackers.popitem(last=False)
+            else:
+                self.trackers.move_to_end(stream_id)
+            return tracker
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {stream_id: tracker.get_stats() for stream_id, tracker in self.trackers.items()}
@@ -0,0 +1,145 @@
+"""
+HTTP Pool
+Shared keep-alive HTTP client for Supabase (PostgREST) calls, with connection reuse statistics
+"""
+import os
+import logging
+import threading
+from typing import Optional, Dict, Any
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# httpcore trace events that mean the request could not reuse a pooled connection
+NEW_CONNECTION_EVENT = "connection.connect_tcp.complete"
+TLS_HANDSHAKE_EVENT = "connection.start_tls.complete"
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401 - httpx negotiates HTTP/2 only when h2 is installed
+        return True
+    except ImportError:
+        return False
+
+
+class CountingTransport(httpx.HTTPTransport):
+    """httpx transport that counts new vs reused connections via httpcore's trace hook"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "new_connections": 0, "reused": 0, "tls_handshakes": 0, "errors": 0}
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        events = []
+        outer = request.extensions.get("trace")
+
+        def trace(event, info):
+            if event in (NEW_CONNECTION_EVENT, TLS_HANDSHAKE_EVENT):
+                events.append(event)
+            if outer:
+                outer(event, info)
+
+        request.extensions["trace"] = trace
+        try:
+            response = super().handle_request(request)
+        except httpx.TransportError:
+            # A failed request neither opened nor reused a connection that served it
+            with self._lock:
+                self.counts["errors"] += 1
+            raise
+
+        with self._lock:
+            self.counts["requests"] += 1
+            if NEW_CONNECTION_EVENT in events:
+                self.counts["new_connections"] += 1
+            else:
+                self.counts["reused"] += 1
+            if TLS_HANDSHAKE_EVENT in events:
+                self.counts["tls_handshakes"] += 1
+        return response
+
+    def pool_state(self) -> Dict[str, int]:
+        """Connections currently held by the pool, by state"""
+        state = {"open": 0, "idle": 0, "http2": 0}
+        for connection in list(self._pool.connections):
+            if connection.is_closed():
+                continue
+            state["open"] += 1
+            state["idle"] += connection.is_idle()
+            state["http2"] += "HTTP/2" in connection.info()
+        return state
+
+
+class HttpPool:
+    def __init__(self, max_connections: int = None, max_keepalive: int = None, keepalive_expiry: float = None, http2: bool = None, verify=True):
+        self.max_connections = max_connections if max_connections is not None else int(os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS", "20"))
+        self.max_keepalive = max_keepalive if max_keepalive is not None else int(os.getenv("SUPABASE_HTTP_MAX_KEEPALIVE", "10"))
+        # httpx drops idle connections after 5s by default, so writes a few seconds apart each paid TCP + TLS setup
+        self.keepalive_expiry = keepalive_expiry if keepalive_expiry is not None else float(os.getenv("SUPABASE_HTTP_KEEPALIVE_EXPIRY", "60"))
+        self.http2 = http2 if http2 is not None else os.getenv("SUPABASE_HTTP2", "true").lower() in ("1", "true", "yes")
+        self.timeout = httpx.Timeout(
+            float(os.getenv("SUPABASE_HTTP_TIMEOUT", "10")),
+            connect=float(os.getenv("SUPABASE_HTTP_CONNECT_TIMEOUT", "5")),
+            pool=float(os.getenv("SUPABASE_HTTP_POOL_TIMEOUT", "5"))
+        )
+        # True, or an ssl.SSLContext (benchmarks/bench_supabase_http.py trusts its self-signed stand-in this way)
+        self.verify = verify
+
+        self.transport: Optional[CountingTransport] = None
+        self._client: Optional[httpx.Client] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.Client:
+        """The shared client, created on first use"""
+        with self._lock:
+            if self._client is None:
+                http2 = self.http2 and http2_available()
+                if self.http2 and not http2:
+                    logger.info("HTTP/2 requested but h2 is not installed - using HTTP/1.1 keep-alive")
+
+                self.transport = CountingTransport(
+                    http2=http2,
+                    verify=self.verify,
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive,
+                        keepalive_expiry=self.keepalive_expiry
+                    )
+                )
+                self._client = httpx.Client(transport=self.transport, timeout=self.timeout, follow_redirects=True)
+                logger.info(
+                    f"Shared HTTP pool: {self.max_connections} connections, {self.max_keepalive} kept alive "
+                    f"for {self.keepalive_expiry:g}s, HTTP/2 {'on' if http2 else 'off'}"
+                )
+            return self._client
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {
+            "max_connections": self.max_connections,
+            "max_keepalive": self.max_keepalive,
+            "keepalive_expiry_s": self.keepalive_expiry,
+        }
+        transport = self.transport
+        if transport is None:
+            return stats
+
+        with transport._lock:
+            counts = dict(transport.counts)
+        stats.update(counts)
+        stats.update(transport.pool_state())
+        stats["reuse_ratio"] = round(counts["reused"] / counts["requests"], 3) if counts["requests"] else None
+        return stats
+
+
+# Global HTTP pool instance (used by the Supabase client)
+http_pool = HttpPool()
@@ -0,0 +1,114 @@
+"""
+Inference Client
+analyze_image() drop-in that forwards frames to the shared inference server instead of loading the model
+"""
+import os
+import json
+import time
+import socket
+import logging
+import threading
+
+from services.inference_server import HEADER, DEFAULT_SOCKET
+from services.metrics_service import record_stages
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY_S = 0.1
+
+
+class InferenceClient:
+    def __init__(self):
+        self.socket_path = os.getenv("INFERENCE_SOCKET", DEFAULT_SOCKET)
+        self.timeout = float(os.getenv("INFERENCE_TIMEOUT", "30"))
+        # One connection per calling thread; the server handles connections concurrently
+        self._local = threading.local()
+
+    def analyze_image(self, image_bytes, timings=None, stream_id=None):
+        """Same contract as yolo_service.analyze_image, executed in the inference server"""
+        if not image_bytes:
+            return {"error": "Empty image", "detections": []}
+
+        started = time.perf_counter()
+        try:
+            reply = self._request(image_bytes, {"stream_id": stream_id} if stream_id else None)
+        except (OSError, ValueError) as e:
+            logger.error(f"Inference server unavailable at {self.socket_path}: {e}")
+            return {"error": f"Inference server unavailable: {e}", "detections": []}
+
+        # Stage timings measured in the server; "ipc" is everything the round trip added on top
+        server_ms = reply.get("timings", {})
+        round_trip = time.perf_counter() - started
+        stages = {stage: ms / 1000 for stage, ms in server_ms.items()}
+        stages["ipc"] = max(0.0, round_trip - sum(stages.values()))
+        record_stages(stages, timings)
+
+        return reply["result"]
+
+    def get_stats(self):
+        """Ask the server for its counters"""
+        try:
+            return self._request(b"")["stats"]
+        except (OSError, ValueError) as e:
+            return {"error": str(e)}
+
+    def _request(self, payload: bytes, options: dict = None):
+        meta = json.dumps(options).encode() if options else b""
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Server restarting: the socket is briefly missing or not accepting yet
+                if attempt:
+                    raise
+                time.sleep(RECONNECT_DELAY_S)
+                continue
+
+            try:
+                conn.sendall(HEADER.pack(len(meta)) + meta + HEADER.pack(len(payload)) + payload)
+                size, = HEADER.unpack(self._recv_exactly(conn, HEADER.size))
+                return json.loads(self._recv_exactly(conn, size))
+            except socket.timeout:
+                # The server is still working on this frame; resending would only double its load.
+                # The reply may still arrive, so this connection can't be reused.
+                self._close()
+                raise
+            except OSError:
+                # Stale connection (server restarted and closed it): reconnect once
+                self._close()
+                if attempt:
+                    raise
+
+    def _connection(self) -> socket.socket:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            try:
+                conn.connect(self.socket_path)
+            except OSError:
+                conn.close()
+                raise
+            self._local.conn = conn
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @staticmethod
+    def _recv_exactly(conn: socket.socket, size: int) -> bytes:
+        chunks = bytearray()
+        while len(chunks) < size:
+            chunk = conn.recv(min(size - len(chunks), 1 << 20))
+            if not chunk:
+                raise ConnectionError("Inference server closed the connection")
+            chunks += chunk
+        return bytes(chunks)
+
+
+# Global inference client instance
+inference_client = InferenceClient()
+analyze_image = inference_client.analyze_image
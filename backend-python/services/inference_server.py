@@ -0,0 +1,162 @@
+"""
+Inference Server
+Single process that owns the YOLO model and serves analyze_image to web workers over a Unix socket
+"""
+import os
+import json
+import time
+import struct
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Frames are length-prefixed: 4-byte big-endian size, then the payload.
+# A request is two frames, JSON options then image bytes; a zero-length image asks for stats.
+HEADER = struct.Struct("!I")
+MAX_FRAME_BYTES = 32 * 1024 * 1024
+
+DEFAULT_SOCKET = "/tmp/smartngangon-inference.sock"
+
+
+class InferenceServer:
+    def __init__(self):
+        self.socket_path = os.getenv("INFERENCE_SOCKET", DEFAULT_SOCKET)
+        # One inference thread by default: every web worker's frames share one set of cores
+        self.threads = int(os.getenv("INFERENCE_THREADS", "1"))
+        self.torch_threads = int(os.getenv("INFERENCE_TORCH_THREADS", "0"))
+
+        self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="inference")
+        self.analyze_image = None
+        self.stats = {"requests": 0, "errors": 0, "connections": 0, "queued": 0, "busy_s": 0.0}
+        # Updated from the inference threads as well as the event loop
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def load_model(self):
+        """Import yolo_service once; this is the only process that holds the model"""
+        if self.torch_threads:
+            import torch
+            torch.set_num_threads(self.torch_threads)
+
+        from services.yolo_service import analyze_image, loaded_path
+        self.analyze_image = analyze_image
+        logger.info(f"Inference server loaded model {loaded_path}")
+
+    async def serve(self):
+        """Listen on the Unix socket until cancelled"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        logger.info(f"Inference server listening on {self.socket_path} ({self.threads} inference thread(s))")
+
+        async with server:
+            await server.serve_forever()
+
+    def get_stats(self):
+        """Get request counters and inference utilisation"""
+        from services.adaptive_resolution import adaptive_resolution
+        from services.yolo_service import goat_trackers
+        from services.roi_service import roi_registry
+        from services.zone_map import zone_maps
+
+        uptime = time.time() - self.started_at
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "busy_s": round(stats["busy_s"], 2),
+            "utilisation": round(stats["busy_s"] / (uptime * self.threads), 3) if uptime else 0.0,
+            "threads": self.threads,
+            "pid": os.getpid(),
+            "adaptive_resolution": adaptive_resolution.get_stats(),
+            "trackers": goat_trackers.get_stats(),
+            "roi": roi_registry.get_stats(),
+            "zones": zone_maps.get_stats()
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._count("connections", 1)
+        loop = asyncio.get_running_loop()
+
+        try:
+            while True:
+                try:
+                    size, = HEADER.unpack(await reader.readexactly(HEADER.size))
+                except asyncio.IncompleteReadError:
+                    break
+
+                if size > MAX_FRAME_BYTES:
+                    logger.error(f"Rejecting {size}-byte options frame")
+                    break
+
+                options = json.loads(await reader.readexactly(size)) if size else {}
+                size, = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if size > MAX_FRAME_BYTES:
+                    logger.error(f"Rejecting {size}-byte frame (limit {MAX_FRAME_BYTES})")
+                    break
+
+                if size == 0:
+                    reply = {"stats": self.get_stats()}
+                else:
+                    payload = await reader.readexactly(size)
+                    self._count("queued", 1)
+                    try:
+                        reply = await loop.run_in_executor(self.executor, self._analyze, payload, options.get("stream_id"))
+                    finally:
+                        self._count("queued", -1)
+
+                body = json.dumps(reply).encode()
+                writer.write(HEADER.pack(len(body)) + body)
+                await writer.drain()
+
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            self._count("connections", -1)
+            writer.close()
+
+    def _count(self, name: str, delta: float):
+        with self._lock:
+            self.stats[name] += delta
+
+    def _analyze(self, payload: bytes, stream_id: str = None):
+        started = time.perf_counter()
+        timings = {}
+        try:
+            result = self.analyze_image(payload, timings, stream_id)
+        except Exception as e:
+            logger.error(f"Inference failed: {e}")
+            result = {"error": str(e), "detections": []}
+
+        with self._lock:
+            self.stats["requests"] += 1
+            if "error" in result:
+                self.stats["errors"] += 1
+            self.stats["busy_s"] += time.perf_counter() - started
+        return {"result": result, "timings": timings}
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    server = InferenceServer()
+    server.load_model()
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        logger.info("Inference server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Hot-path logging
+Samples per-event log lines and keeps recent detailed records in an in-memory ring buffer
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List
+
+
+class DebugLog:
+    def __init__(self):
+        # Emit 1 in every N records per event to the normal log (0 = never, 1 = always)
+        self.sample_every = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+        self.records = deque(maxlen=int(os.getenv("LOG_RING_SIZE", "2000")))
+        self.seen: Dict[str, int] = {}
+        # log() is called from the event loop, the paho thread and executor threads
+        self._lock = threading.Lock()
+
+    def log(self, log: logging.Logger, event: str, msg: str, *args, level: int = logging.INFO):
+        """Record a hot-path log line; msg % args is only formatted if emitted or dumped"""
+        self.records.append((time.time(), log.name, level, event, msg, args))
+
+        with self._lock:
+            seen = self.seen.get(event, 0)
+            self.seen[event] = seen + 1
+
+        if self.sample_every and seen % self.sample_every == 0:
+            log.log(level, msg, *args)
+
+    def dump(self, limit: int = 200, event: str = None, min_level: int = logging.NOTSET) -> List[Dict[str, Any]]:
+        """Format the most recent records, newest last"""
+        # Snapshot first: other threads keep appending while we filter
+        records = list(self.records)
+        matched = []
+        for record in reversed(records):
+            created, name, level, record_event, msg, args = record
+            if event and record_event != event:
+                continue
+            if level < min_level:
+                continue
+
+            matched.append(record)
+            if len(matched) >= limit:
+                break
+
+        return [self._format(record) for record in reversed(matched)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get buffer usage and per-event counts"""
+        return {
+            "sample_every": self.sample_every,
+            "buffered": len(self.records),
+            "capacity": self.records.maxlen,
+            "events": self._seen_snapshot()
+        }
+
+    def _seen_snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.seen)
+
+    @staticmethod
+    def _format(record: tuple) -> Dict[str, Any]:
+        created, name, level, event, msg, args = record
+        try:
+            message = msg % args if args else msg
+        except (TypeError, ValueError) as e:
+            message = f"{msg} {args} (format error: {e})"
+
+        return {
+            "time": datetime.utcfromtimestamp(created).isoformat() + "Z",
+            "logger": name,
+            "level": logging.getLevelName(level),
+            "event": event,
+            "message": message
+        }
+
+
+# Global debug log instance
+debug_log = DebugLog()
@@ -0,0 +1,163 @@
+"""
+Metrics Service
+Low-overhead in-process counters, histograms and gauges rendered in Prometheus text format
+"""
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "count", "total")
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+
+class Metrics:
+    def __init__(self):
+        self.counters: Dict[str, Dict[Tuple, float]] = {}
+        self.histograms: Dict[str, Dict[Tuple, _Histogram]] = {}
+        self.gauges: Dict[str, Callable[[], Dict[Tuple, float]]] = {}
+        self.help: Dict[str, str] = {}
+        self.buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str, buckets: List[float] = None):
+        """Set the HELP text (and optionally histogram buckets) for a metric"""
+        self.help[name] = help_text
+        if buckets:
+            self.buckets[name] = sorted(buckets)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Increment a counter"""
+        key = tuple(labels.items())
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record a value (seconds for latencies) in a histogram"""
+        key = tuple(labels.items())
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(self.buckets.get(name, DEFAULT_BUCKETS))
+            hist.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, errors: str = None, **labels):
+        """Time a block into a histogram; exceptions also increment the `errors` counter"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            if errors:
+                self.inc(errors, **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def register_gauge(self, name: str, collect: Callable[[], Dict[Tuple, float]], help_text: str = None):
+        """Register a gauge read at scrape time; collect() returns {label tuple: value}"""
+        self.gauges[name] = collect
+        if help_text:
+            self.help[name] = help_text
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format"""
+        lines = []
+
+        with self._lock:
+            counters = {name: dict(series) for name, series in self.counters.items()}
+            histograms = {
+                name: {key: (list(h.counts), h.count, h.total, h.buckets) for key, h in series.items()}
+                for name, series in self.histograms.items()
+            }
+
+        for name, series in sorted(counters.items()):
+            self._header(lines, name, "counter")
+            for key, value in series.items():
+                lines.append(f"{name}{_labels(key)} {_num(value)}")
+
+        for name, series in sorted(histograms.items()):
+            self._header(lines, name, "histogram")
+            for key, (counts, count, total, buckets) in series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_labels(key + (('le', _num(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(key + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_labels(key)} {_num(total)}")
+                lines.append(f"{name}_count{_labels(key)} {count}")
+
+        for name, collect in sorted(self.gauges.items()):
+            try:
+                series = collect()
+            except Exception as e:
+                logger.error(f"Error collecting gauge {name}: {e}")
+                continue
+
+            self._header(lines, name, "gauge")
+            for key, value in series.items():
+                lines.append(f"{name}{_labels(key)} {_num(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, kind: str):
+        if name in self.help:
+            lines.append(f"# HELP {name} {self.help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+def _labels(key: Tuple) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Global metrics registry
+metrics = Metrics()
+
+metrics.describe("http_request_duration_seconds", "HTTP request latency by route")
+metrics.describe("http_requests_total", "HTTP requests by route and status")
+metrics.describe("cv_stage_duration_seconds", "analyze_image stage timings")
+metrics.describe("cv_inference_seconds", "Model inference time by input size (adaptive streams)")
+metrics.describe("mqtt_messages_total", "MQTT messages received by topic pattern")
+metrics.describe("mqtt_ingest_lag_seconds", "Time from device publish (sent_at) to handler completion")
+metrics.describe("mqtt_handler_errors_total", "MQTT messages that failed to parse or whose handler raised")
+metrics.describe("supabase_request_duration_seconds", "Supabase call latency by table and operation")
+metrics.describe("supabase_request_errors_total", "Failed Supabase calls by table and operation")
+
+
+def record_stages(stages: Dict[str, float], timings: Dict[str, float] = None):
+    """Feed stage durations (seconds) into the CV histograms and optionally a per-request trace (ms)"""
+    for stage, seconds in stages.items():
+        metrics.observe("cv_stage_duration_seconds", seconds, stage=stage)
+        if timings is not None:
+            timings[stage] = round(seconds * 1000, 2)
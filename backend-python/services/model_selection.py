@@ -0,0 +1,108 @@
+"""
+Model Selection
+Candidate YOLO model files and the evaluation manifest (select_model.py) that picks one at startup
+"""
+import os
+import json
+import logging
+import platform
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+_script_dir = Path(__file__).resolve().parent  # backend-python/services
+_project_root = _script_dir.parent.parent  # smart-ngangon-main
+
+# Priority when there is no manifest: custom trained model first, then COCO pretrained as fallback
+MODEL_CANDIDATES = [
+    # Custom trained model from SMARTNGON_CV (prioritized!)
+    _project_root / 'SMARTNGON_CV' / 'SMARTNGON' / 'runs' / 'detect' / 'train2' / 'weights' / 'best.pt',
+    _project_root / 'SMARTNGON_CV' / 'runs' / 'detect' / 'train2' / 'weights' / 'best.pt',
+    _project_root / 'SMARTNGON_CV' / 'runs' / 'detect' / 'train_improved' / 'weights' / 'best.pt',
+    Path('best.pt'),
+    Path('backend-python') / 'best.pt',
+    'yolov8n.pt',  # Fallback: Pretrained COCO model (sheep class 19, cow class 18)
+]
+
+MANIFEST_PATH = os.getenv("CV_MODEL_MANIFEST", "model_manifest.json")
+
+# Classes yolo_service accepts as goats (here so select_model.py needn't load the service)
+# COCO class IDs: 18=dog, 19=horse, 20=sheep, 21=cow
+# We ONLY want: 20=sheep, 21=cow (closest to goat)
+ALLOWED_COCO_IDS = [20, 21]  # sheep=20, cow=21 ONLY
+ALLOWED_NAMES = ['sheep', 'cow', 'goat', 'kambing', 'domba']
+
+
+def host_fingerprint() -> Dict[str, Any]:
+    """What the manifest's latencies were measured on"""
+    return {"machine": platform.machine(), "processor": platform.processor(), "cpus": os.cpu_count()}
+
+
+def file_signature(path: Path) -> Optional[List[int]]:
+    """(size, mtime_ns) of a model file, or None for directories (OpenVINO exports) and missing files"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return None if path.is_dir() else [stat.st_size, stat.st_mtime_ns]
+
+
+def choose(manifest: Dict[str, Any], budget_ms: float = 0.0) -> Optional[Dict[str, Any]]:
+    """
+    Most accurate manifest entry whose p50 latency fits the budget (0 = no budget).
+    Entries whose file is gone or changed since evaluation are skipped; if nothing fits, the fastest wins.
+    """
+    usable = []
+    for entry in manifest.get("models", []):
+        path = Path(entry["path"])
+        if entry.get("error") or not path.exists():
+            continue
+        if entry.get("signature") and file_signature(path) != entry["signature"]:
+            logger.warning(f"Model {path} changed since it was evaluated - re-run select_model.py")
+            continue
+        usable.append(entry)
+
+    if not usable:
+        return None
+
+    fits = [e for e in usable if not budget_ms or e["latency_p50_ms"] <= budget_ms]
+    if not fits:
+        fastest = min(usable, key=lambda e: e["latency_p50_ms"])
+        logger.warning(
+            f"No evaluated model fits CV_LATENCY_BUDGET_MS={budget_ms:g}; "
+            f"using the fastest ({fastest['path']}, {fastest['latency_p50_ms']} ms)"
+        )
+        return fastest
+
+    return max(fits, key=lambda e: (e["mAP50-95"], e["mAP50"], -e["latency_p50_ms"]))
+
+
+def load_order() -> List[Any]:
+    """Paths yolo_service tries in order: CV_MODEL_PATH, the manifest's pick, then MODEL_CANDIDATES"""
+    order = []
+
+    override = os.getenv("CV_MODEL_PATH")
+    if override:
+        # Explicit override, e.g. the INT8 ONNX model from SMARTNGON_CV/SMARTNGON/quantize_goat.py
+        order.append(Path(override))
+
+    if os.path.exists(MANIFEST_PATH):
+        try:
+            with open(MANIFEST_PATH) as f:
+                manifest = json.load(f)
+            # The env var only overrides the budget select_model.py stored when it is actually set
+            budget_ms = float(os.getenv("CV_LATENCY_BUDGET_MS") or manifest.get("budget_ms") or 0)
+            if manifest.get("host") != host_fingerprint():
+                logger.warning(f"{MANIFEST_PATH} was measured on {manifest.get('host')}; latencies may not hold here")
+            picked = choose(manifest, budget_ms)
+            if picked:
+                logger.info(
+                    f"Manifest pick: {picked['path']} (mAP50-95 {picked['mAP50-95']}, "
+                    f"p50 {picked['latency_p50_ms']} ms, budget {budget_ms:g} ms)"
+                )
+                order.append(Path(picked["path"]))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Ignoring unreadable model manifest {MANIFEST_PATH}: {e}")
+
+    return order + MODEL_CANDIDATES
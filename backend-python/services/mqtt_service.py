@@ -4,11 +4,17 @@ Handles connection to MQTT broker and message routing
 """
 import os
 import json
+import time
+import asyncio
 import logging
-from typing import Callable, Dict
+from typing import Callable, Dict, List
 import paho.mqtt.client as mqtt
 from datetime import datetime
 
+from services.command_tracker import command_tracker
+from services.metrics_service import metrics
+from services.log_service import debug_log
+
 logger = logging.getLogger(__name__)
 
 class MQTTService:
@@ -24,6 +30,8 @@ class MQTTService:
         self.client.on_connect = self._on_connect
         self.client.on_disconnect = self._on_disconnect
         self.client.on_message = self._on_message
+        # Allow farm-wide fan-outs to keep many QoS1 publishes in flight at once
+        self.client.max_inflight_messages_set(int(os.getenv("MQTT_MAX_INFLIGHT", "100")))
         
         # Message handlers registry
         self.handlers: Dict[str, Callable] = {}
@@ -34,10 +42,18 @@ class MQTTService:
         
         self.connected = False
         self.wifi_networks = [] # Store latest scan results
+        self.device_status: Dict[str, dict] = {}  # Latest status per device
+        self.loop = None  # Event loop that runs async handlers
     
     def connect(self):
         """Connect to MQTT broker"""
         try:
+            # Async handlers are scheduled onto the app's event loop from the paho thread
+            try:
+                self.loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.loop = None
+            
             logger.info(f"Connecting to MQTT broker at {self.broker}:{self.port}")
             self.client.connect(self.broker, self.port, keepalive=60)
             self.client.loop_start()
@@ -62,9 +78,10 @@ class MQTTService:
             self.subscribe("smartngangon/goat/+/temperature")
             self.subscribe("smartngangon/goat/+/location")
             self.subscribe("smartngangon/goat/+/status")
-            self.subscribe("smartngangon/goat/+/status")
             self.subscribe("smartngangon/kandang/+/rfid")
             self.subscribe("smartngangon/device/+/wifi/scan_results")
+            self.subscribe("smartngangon/goat/+/feed/status")
+            self.subscribe("smartngangon/device/+/status")
         else:
             logger.error(f"Failed to connect to MQTT broker. Return code: {rc}")
     
@@ -88,24 +105,57 @@ class MQTTService:
             topic = msg.topic
             payload = msg.payload.decode('utf-8')
             
-            logger.info(f"Received message on topic '{topic}': {payload}")
+            debug_log.log(logger, "mqtt_message", "Received message on topic '%s': %s", topic, payload, level=logging.DEBUG)
             
             # Parse JSON payload
             try:
                 data = json.loads(payload)
             except json.JSONDecodeError:
+                metrics.inc("mqtt_handler_errors_total", pattern="invalid_json")
                 logger.error(f"Invalid JSON payload: {payload}")
                 return
             
             # Route to appropriate handler
             for pattern, handler in self.handlers.items():
                 if self._topic_matches(pattern, topic):
-                    handler(topic, data)
+                    metrics.inc("mqtt_messages_total", pattern=pattern)
+                    # Publishers that stamp sent_at (e.g. the device simulator swarm) get ingest lag measured
+                    sent_at = data.get("sent_at") if isinstance(data, dict) else None
+                    try:
+                        result = handler(topic, data)
+                    except Exception:
+                        metrics.inc("mqtt_handler_errors_total", pattern=pattern)
+                        raise
+                    
+                    if asyncio.iscoroutine(result):
+                        if self.loop is None:
+                            result.close()
+                            logger.error(f"No event loop for async handler on {topic}")
+                        else:
+                            future = asyncio.run_coroutine_threadsafe(result, self.loop)
+                            future.add_done_callback(lambda f, p=pattern, s=sent_at: self._on_handler_done(f, p, s))
+                    else:
+                        self._record_ingest_lag(pattern, sent_at)
                     break
+            else:
+                metrics.inc("mqtt_messages_total", pattern="unmatched")
         
         except Exception as e:
             logger.error(f"Error processing message: {e}")
     
+    def _on_handler_done(self, future, pattern: str, sent_at=None):
+        """Count errors raised by async handlers"""
+        if not future.cancelled() and future.exception() is not None:
+            metrics.inc("mqtt_handler_errors_total", pattern=pattern)
+            logger.error(f"Handler for {pattern} failed: {future.exception()}")
+        else:
+            self._record_ingest_lag(pattern, sent_at)
+    
+    def _record_ingest_lag(self, pattern: str, sent_at):
+        """Record time from device publish to handler completion"""
+        if isinstance(sent_at, (int, float)):
+            metrics.observe("mqtt_ingest_lag_seconds", max(0.0, time.time() - sent_at), pattern=pattern)
+    
     def _topic_matches(self, pattern: str, topic: str) -> bool:
         """Check if topic matches pattern (supports + wildcard)"""
         pattern_parts = pattern.split('/')
@@ -136,7 +186,7 @@ class MQTTService:
             result = self.client.publish(topic, payload_str, qos)
             
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                logger.info(f"✅ Published to {topic}: {payload_str}")
+                debug_log.log(logger, "mqtt_publish", "✅ Published to %s: %s", topic, payload_str)
                 return True
             else:
                 logger.error(f"❌ Failed to publish to {topic}, rc={result.rc}")
@@ -157,6 +207,7 @@ class MQTTService:
         payload = {
             "action": "feed",
             "duration_ms": duration_ms,
+            "command_id": command_tracker.register(goat_id),
             "timestamp": datetime.utcnow().isoformat() + "Z"
         }
         
@@ -172,8 +223,51 @@ class MQTTService:
         if result:
             logger.info(f"✅ MQTT publish SUCCESS - command sent to ESP32")
         else:
+            command_tracker.cancel(payload["command_id"])
             logger.error(f"❌ MQTT publish FAILED - ESP32 did not receive command")
     
+    def send_feed_commands(self, goat_ids: List[str], duration_ms: int = 3000, timeout: float = 5.0) -> Dict[str, str]:
+        """Send feed commands to many ESP32s as one pipeline of QoS1 publishes"""
+        if not self.connected:
+            logger.error(f"Cannot send feed commands to {len(goat_ids)} goats - MQTT not connected")
+            return {goat_id: "not_connected" for goat_id in goat_ids}
+        
+        timestamp = datetime.utcnow().isoformat() + "Z"
+        in_flight = {}
+        status = {}
+        
+        for goat_id in goat_ids:
+            command_id = command_tracker.register(goat_id)
+            payload = json.dumps({
+                "action": "feed",
+                "duration_ms": duration_ms,
+                "command_id": command_id,
+                "timestamp": timestamp
+            })
+            try:
+                info = self.client.publish(f"smartngangon/goat/{goat_id}/command/feed", payload, qos=1)
+                if info.rc in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_AGAIN):
+                    in_flight[goat_id] = info
+                else:
+                    status[goat_id] = "failed"
+            except Exception:
+                status[goat_id] = "failed"
+            if status.get(goat_id) == "failed":
+                command_tracker.cancel(command_id)
+        
+        # Every publish is already in flight; wait for PUBACKs against one shared deadline
+        deadline = time.monotonic() + timeout
+        for goat_id, info in in_flight.items():
+            try:
+                info.wait_for_publish(max(0.0, deadline - time.monotonic()))
+                status[goat_id] = "acked" if info.is_published() else "timeout"
+            except (ValueError, RuntimeError):
+                status[goat_id] = "failed"
+        
+        acked = sum(1 for s in status.values() if s == "acked")
+        logger.info(f"Feed fan-out: {acked}/{len(goat_ids)} commands acknowledged by broker")
+        return status
+    
     def send_config_command(self, goat_id: str, config: dict):
         """Send configuration command to ESP32"""
         topic = f"smartngangon/goat/{goat_id}/command/config"
@@ -220,6 +314,19 @@ class MQTTService:
             self.wifi_networks = data["networks"]
             logger.info(f"Updated WiFi networks list: {len(self.wifi_networks)} networks found")
 
+    def handle_feed_status(self, topic: str, data: dict):
+        """Match ESP32 feeding/completed replies to sent feed commands"""
+        # smartngangon/goat/{goat_id}/feed/status - commands are tracked per goat, the feeder echoes goat_id
+        goat_id = data.get("goat_id") or topic.split('/')[2]
+        ack = command_tracker.acknowledge(goat_id, data.get("status"), data.get("command_id"))
+        if ack:
+            logger.info(f"Feed command {ack['command_id']} {ack['status']} after {ack['latency_ms']}ms")
+
+    def handle_device_status(self, topic: str, data: dict):
+        """Record the latest status reported by a device"""
+        device_id = data.get("device_id") or topic.split('/')[2]
+        self.device_status[device_id] = {**data, "last_seen": datetime.utcnow().isoformat() + "Z"}
+
 
 # Global MQTT service instance
 mqtt_service = MQTTService()
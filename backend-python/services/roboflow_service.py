@@ -11,6 +11,8 @@ from datetime import datetime
 from collections import deque
 from dotenv import load_dotenv
 
+from services.log_service import debug_log
+
 # Load environment variables
 load_dotenv()
 
@@ -151,7 +153,7 @@ def analyze_image(image_bytes: bytes) -> dict:
         
         # Get actual frame dimensions
         frame_height, frame_width = img.shape[:2]
-        logger.info(f"📷 Image decoded: {frame_width}x{frame_height}")
+        debug_log.log(logger, "roboflow_decode", "📷 Image decoded: %dx%d", frame_width, frame_height, level=logging.DEBUG)
         
         # Re-encode to JPEG with good quality
         encode_params = [cv2.IMWRITE_JPEG_QUALITY, 85]
@@ -165,10 +167,8 @@ def analyze_image(image_bytes: bytes) -> dict:
         debug_path = "/tmp/debug_roboflow_input.jpg"
         with open(debug_path, "wb") as f:
             f.write(image_bytes_clean)
-        logger.info(f"DEBUG: Saved clean image to {debug_path}")
-        
-        # Log image size
-        logger.info(f"📷 Sending image to Roboflow ({len(image_bytes_clean)} bytes)")
+        debug_log.log(logger, "roboflow_request", "📷 Sending image to Roboflow (%d bytes), saved copy to %s",
+                      len(image_bytes_clean), debug_path, level=logging.DEBUG)
         
         # Run workflow - with data URI prefix
         result = client.run_workflow(
@@ -191,51 +191,27 @@ def analyze_image(image_bytes: bytes) -> dict:
         if result and len(result) > 0:
             workflow_output = result[0]
             
-            # Log what we received
-            logger.info(f"Roboflow response keys: {list(workflow_output.keys())}")
-            
-            # DEBUG: Log full predictions structure
-            for key in workflow_output.keys():
-                value = workflow_output[key]
-                if isinstance(value, list):
-                    logger.info(f"DEBUG [{key}]: list with {len(value)} items")
-                    if len(value) > 0:
-                        first_item = value[0]
-                        if isinstance(first_item, dict):
-                            logger.info(f"DEBUG [{key}][0] keys: {list(first_item.keys())}")
-                            logger.info(f"DEBUG [{key}][0]: {first_item}")
-                        else:
-                            logger.info(f"DEBUG [{key}][0]: {type(first_item)} = {first_item}")
-                elif isinstance(value, dict):
-                    logger.info(f"DEBUG [{key}]: dict with keys {list(value.keys())}")
-                else:
-                    logger.info(f"DEBUG [{key}]: {type(value)}")
+            # Full response goes to the debug ring buffer; only formatted if dumped or sampled
+            debug_log.log(logger, "roboflow_response", "Roboflow response: %s", workflow_output, level=logging.DEBUG)
             
             # Try to find predictions in various common keys
             predictions = None
             for key in ['predictions', 'model_predictions', 'detections', 'output', 'sam_predictions']:
                 if key in workflow_output:
                     preds = workflow_output[key]
-                    logger.info(f"DEBUG: workflow_output['{key}'] = {type(preds)}")
                     
                     if isinstance(preds, list):
                         predictions = preds
-                        logger.info(f"Using predictions from key: {key}, count: {len(preds)}")
+                        debug_log.log(logger, "roboflow_predictions", "Using predictions from key: %s, count: %d", key, len(preds))
                         break
                     elif isinstance(preds, dict):
-                        logger.info(f"DEBUG: preds is dict with keys: {list(preds.keys())}")
                         if 'predictions' in preds:
-                            nested = preds['predictions']
-                            logger.info(f"DEBUG: preds['predictions'] = {type(nested)}, content: {nested}")
-                            predictions = nested
-                            logger.info(f"Using nested predictions from key: {key}")
+                            predictions = preds['predictions']
+                            debug_log.log(logger, "roboflow_predictions", "Using nested predictions from key: %s", key)
                         break
             
-            # Log final predictions state
-            logger.info(f"DEBUG: Final predictions = {type(predictions)}, content: {predictions}")
-            
             if predictions and len(predictions) > 0:
-                logger.info(f"Found {len(predictions)} raw predictions")
+                debug_log.log(logger, "roboflow_raw_count", "Found %d raw predictions", len(predictions))
                 
                 for pred in predictions:
                     if not isinstance(pred, dict):
@@ -332,7 +308,7 @@ def analyze_image(image_bytes: bytes) -> dict:
                                 frame_height
                             )
                             should_trigger_feeding = zone_info["should_feed"]
-                            logger.info(f"✅ Zone: {zone_info['zone']}, Moves: {zone_info['movement_count']}")
+                            debug_log.log(logger, "roboflow_zone", "✅ Zone: %s, Moves: %d", zone_info['zone'], zone_info['movement_count'])
                         
                         # Add to detections
                         display_class = "Kambing"
@@ -351,7 +327,7 @@ def analyze_image(image_bytes: bytes) -> dict:
                         })
         
         count = len(detections)
-        logger.info(f"✅ Roboflow detected {count} objects")
+        debug_log.log(logger, "roboflow_result", "✅ Roboflow detected %d objects", count)
         
         return {
             "status": "success",
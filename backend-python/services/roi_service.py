@@ -0,0 +1,120 @@
+"""
+ROI Service
+Per-stream regions of interest: crop/mask frames before inference and map boxes back to the full frame
+"""
+import os
+import logging
+import threading
+import numpy as np
+from typing import Optional, Dict, Any, List, Tuple
+
+from services.config_store import ReloadableConfig
+
+logger = logging.getLogger(__name__)
+
+# Fill for masked-out pixels: the grey ultralytics pads letterboxed images with
+MASK_VALUE = 114
+
+
+class RoiRegistry:
+    def __init__(self):
+        # Rectangles are stored as [x1, y1, x2, y2] fractions of the frame so they survive resolution changes
+        self.config = ReloadableConfig(
+            os.getenv("CV_ROI_PATH", "roi_config.json"),
+            lambda rects: [self._validate(rect) for rect in rects],
+            float(os.getenv("CV_ROI_RELOAD_INTERVAL", "1.0"))
+        )
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, stream_id: str = None) -> Optional[List[List[float]]]:
+        """ROI rectangles for a stream, picking up edits made by other processes"""
+        return self.config.get(stream_id) if stream_id else None
+
+    def set(self, stream_id: str, rects: List[List[float]]) -> List[List[float]]:
+        """Replace a stream's ROI and persist it for the other workers"""
+        rects = self.config.set(stream_id, rects)
+        logger.info(f"ROI for stream {stream_id} set to {rects}")
+        return rects
+
+    def remove(self, stream_id: str) -> bool:
+        """Drop a stream's ROI; frames go back to full-frame inference"""
+        return self.config.remove(stream_id)
+
+    def apply(self, img: np.ndarray, rects: List[List[float]]) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Crop to the rectangles' bounding box, masking gaps between them; returns (image, (x_offset, y_offset))"""
+        height, width = img.shape[:2]
+        pixels = [
+            (int(x1 * width), int(y1 * height), int(np.ceil(x2 * width)), int(np.ceil(y2 * height)))
+            for x1, y1, x2, y2 in rects
+        ]
+        left = min(p[0] for p in pixels)
+        top = min(p[1] for p in pixels)
+        right = max(p[2] for p in pixels)
+        bottom = max(p[3] for p in pixels)
+
+        crop = img[top:bottom, left:right]
+        if len(pixels) > 1:
+            masked = np.full_like(crop, MASK_VALUE)
+            for x1, y1, x2, y2 in pixels:
+                masked[y1 - top:y2 - top, x1 - left:x2 - left] = crop[y1 - top:y2 - top, x1 - left:x2 - left]
+            crop = masked
+        else:
+            # Contiguous copy: slicing a view would make the model copy it anyway
+            crop = np.ascontiguousarray(crop)
+
+        return crop, (left, top)
+
+    def record(self, stream_id: str, full_pixels: int, processed_pixels: int, inference_seconds: float):
+        """Accumulate pixels and inference time per stream, split by whether an ROI was active"""
+        if not stream_id:
+            return
+
+        with self._lock:
+            stats = self.stats.setdefault(stream_id, {
+                "frames": 0, "pixels_total": 0, "pixels_processed": 0,
+                "roi_frames": 0, "roi_inference_s": 0.0, "full_frames": 0, "full_inference_s": 0.0
+            })
+            stats["frames"] += 1
+            stats["pixels_total"] += full_pixels
+            stats["pixels_processed"] += processed_pixels
+            if processed_pixels < full_pixels:
+                stats["roi_frames"] += 1
+                stats["roi_inference_s"] += inference_seconds
+            else:
+                stats["full_frames"] += 1
+                stats["full_inference_s"] += inference_seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ROI per stream with the share of pixels skipped and inference time saved against full frames"""
+        rois = self.config.values
+        with self._lock:
+            streams = {}
+            for stream_id in set(rois) | set(self.stats):
+                stats = self.stats.get(stream_id, {})
+                roi_ms = stats["roi_inference_s"] / stats["roi_frames"] * 1000 if stats.get("roi_frames") else None
+                full_ms = stats["full_inference_s"] / stats["full_frames"] * 1000 if stats.get("full_frames") else None
+                streams[stream_id] = {
+                    "roi": rois.get(stream_id),
+                    "frames": stats.get("frames", 0),
+                    "pixels_processed_ratio": round(stats["pixels_processed"] / stats["pixels_total"], 3) if stats.get("pixels_total") else None,
+                    "roi_inference_ms": round(roi_ms, 1) if roi_ms is not None else None,
+                    "full_frame_inference_ms": round(full_ms, 1) if full_ms is not None else None,
+                    "saved_ms_per_frame": round(full_ms - roi_ms, 1) if roi_ms is not None and full_ms is not None else None
+                }
+            return {"path": self.config.path, "streams": streams}
+
+    # Internals
+    @staticmethod
+    def _validate(rect: List[float]) -> List[float]:
+        if len(rect) != 4:
+            raise ValueError(f"ROI rectangle must be [x1, y1, x2, y2], got {rect}")
+
+        x1, y1, x2, y2 = (float(v) for v in rect)
+        if not (0 <= x1 < x2 <= 1 and 0 <= y1 < y2 <= 1):
+            raise ValueError(f"ROI rectangle must be fractions with x1 < x2 and y1 < y2, got {rect}")
+        return [x1, y1, x2, y2]
+
+
+# Global ROI registry instance
+roi_registry = RoiRegistry()
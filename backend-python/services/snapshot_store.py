@@ -0,0 +1,284 @@
+"""
+Snapshot Store
+Content-addressed storage for frames that triggered events: full size plus thumbnail, written off the request path
+"""
+import os
+import re
+import time
+import queue
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# <sha256>.jpg, <sha256>_thumb.jpg, ...
+NAME_PATTERN = re.compile(r"^([0-9a-f]{64})(_thumb)?\.(jpg|png)$")
+
+
+def sniff_extension(data: bytes) -> str:
+    return "png" if data[:8] == b"\x89PNG\r\n\x1a\n" else "jpg"
+
+
+class SnapshotStore:
+    def __init__(self):
+        self.root = Path(os.getenv("SNAPSHOT_DIR", "snapshots"))
+        self.base_url = os.getenv("SNAPSHOT_BASE_URL", "/cv/snapshots").rstrip("/")
+        self.max_bytes = int(os.getenv("SNAPSHOT_MAX_BYTES", str(500 * 1024 * 1024)))
+        self.retention_s = float(os.getenv("SNAPSHOT_RETENTION_DAYS", "30")) * 86400
+        self.thumb_size = int(os.getenv("SNAPSHOT_THUMB_SIZE", "320"))
+        self.sweep_interval = float(os.getenv("SNAPSHOT_SWEEP_INTERVAL", "60"))
+
+        # Frames are handed to the writer thread so save() never touches the disk on the caller's thread
+        self._queue = queue.Queue(maxsize=int(os.getenv("SNAPSHOT_QUEUE_SIZE", "64")))
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        # digest -> (extension, bytes on disk), least recently used first
+        self.index: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._queued: Dict[str, str] = {}
+        self.total_bytes = 0
+        self.stats = {"saved": 0, "deduplicated": 0, "evicted": 0, "expired": 0, "dropped": 0, "errors": 0}
+
+    def start(self):
+        """Load the existing store and start the writer thread"""
+        if self._thread is not None:
+            return
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._scan()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="snapshot-store", daemon=True)
+        self._thread.start()
+        logger.info(f"Snapshot store started at {self.root} ({len(self.index)} snapshots, {self.total_bytes} bytes)")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the writer thread after it has written the queued frames"""
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info("Snapshot store stopped")
+
+    def save(self, image_bytes: bytes) -> Optional[Dict[str, str]]:
+        """Queue a frame for storage; returns its image/thumbnail URLs at once, None if the queue is full"""
+        digest = hashlib.sha256(image_bytes).hexdigest()
+
+        with self._lock:
+            known = self.index.get(digest)
+            extension = known[0] if known else self._queued.get(digest)
+            if extension:
+                # Identical frame (e.g. a static camera): point at the stored copy
+                self.stats["deduplicated"] += 1
+                if known:
+                    self.index.move_to_end(digest)
+                    # Retention and _scan go by mtime; without this the copy could expire under the new event
+                    self._touch(digest, extension)
+                return self.urls(digest, extension)
+
+            extension = sniff_extension(image_bytes)
+            try:
+                self._queue.put_nowait((digest, extension, image_bytes))
+            except queue.Full:
+                self.stats["dropped"] += 1
+                logger.warning("Snapshot queue full - frame not stored")
+                return None
+            self._queued[digest] = extension
+
+        return self.urls(digest, extension)
+
+    def urls(self, digest: str, extension: str) -> Dict[str, str]:
+        return {
+            "image_url": f"{self.base_url}/{digest}.{extension}",
+            "thumbnail_url": f"{self.base_url}/{digest}_thumb.jpg"
+        }
+
+    def path_for(self, name: str) -> Optional[Path]:
+        """File behind a snapshot URL name, marking it recently used; None for unknown or invalid names"""
+        match = NAME_PATTERN.match(name)
+        if not match:
+            return None
+
+        digest = match.group(1)
+        folder = self.root / digest[:2]
+
+        with self._lock:
+            entry = self.index.get(digest)
+            if entry:
+                self.index.move_to_end(digest)
+            # Recency is the full image's mtime (read by _expire and _scan), so thumbnail hits touch it too.
+            # Touched under the lock so _expire cannot remove it between its mtime check and the delete.
+            touched = any(self._touch(digest, extension) for extension in ([entry[0]] if entry else ["jpg", "png"]))
+
+        if not touched:
+            # Unknown, or evicted since the lookup
+            return None
+
+        path = folder / name
+        return path if path.exists() else None
+
+    def _touch(self, digest: str, extension: str) -> bool:
+        """Mark a stored image as used now; False if it is not on disk"""
+        try:
+            os.utime(self.root / digest[:2] / f"{digest}.{extension}")
+            return True
+        except FileNotFoundError:
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "snapshots": len(self.index),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "retention_days": round(self.retention_s / 86400, 1),
+                "queued": self._queue.qsize(),
+                **self.stats
+            }
+
+    # Writer thread
+    def _run(self):
+        last_sweep = 0.0
+        while True:
+            stopping = self._stop.is_set()
+            try:
+                item = self._queue.get_nowait() if stopping else self._queue.get(timeout=0.5)
+            except queue.Empty:
+                item = None
+
+            if item is not None:
+                self._write(*item)
+            elif stopping:
+                break
+
+            if time.monotonic() - last_sweep >= self.sweep_interval:
+                last_sweep = time.monotonic()
+                self._expire()
+
+    def _write(self, digest: str, extension: str, image_bytes: bytes):
+        folder = self.root / digest[:2]
+        try:
+            folder.mkdir(exist_ok=True)
+            size = self._write_file(folder / f"{digest}.{extension}", image_bytes)
+
+            thumbnail = self._thumbnail(image_bytes)
+            if thumbnail is not None:
+                size += self._write_file(folder / f"{digest}_thumb.jpg", thumbnail)
+        except OSError as e:
+            with self._lock:
+                self._queued.pop(digest, None)
+                self.stats["errors"] += 1
+            logger.error(f"Failed to store snapshot {digest}: {e}")
+            return
+
+        with self._lock:
+            self._queued.pop(digest, None)
+            self.index[digest] = (extension, size)
+            self.total_bytes += size
+            self.stats["saved"] += 1
+
+        self._evict()
+
+    @staticmethod
+    def _write_file(path: Path, data: bytes) -> int:
+        # Write-then-rename so a reader never serves a half-written file
+        tmp = path.with_name(f".{path.name}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return len(data)
+
+    def _thumbnail(self, image_bytes: bytes) -> Optional[bytes]:
+        try:
+            import cv2
+            import numpy as np
+
+            img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        except Exception as e:
+            logger.warning(f"Snapshot thumbnail skipped: {e}")
+            return None
+        if img is None:
+            return None
+
+        height, width = img.shape[:2]
+        scale = self.thumb_size / max(height, width)
+        if scale < 1:
+            img = cv2.resize(img, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        return encoded.tobytes() if ok else None
+
+    def _evict(self):
+        """Drop least recently used snapshots until the store fits in max_bytes"""
+        while True:
+            with self._lock:
+                if self.total_bytes <= self.max_bytes or len(self.index) <= 1:
+                    return
+                digest, entry = self.index.popitem(last=False)
+                self.total_bytes -= entry[1]
+                self.stats["evicted"] += 1
+            self._remove_files(digest, entry[0])
+
+    def _expire(self):
+        """Drop snapshots not used within the retention period"""
+        cutoff = time.time() - self.retention_s
+        with self._lock:
+            digests = list(self.index.items())
+
+        for digest, (extension, size) in digests:
+            # mtime is read under the lock: save() and path_for() refresh it under the same lock
+            with self._lock:
+                if digest not in self.index:
+                    continue
+                try:
+                    last_used = (self.root / digest[:2] / f"{digest}.{extension}").stat().st_mtime
+                except OSError:
+                    last_used = 0
+                if last_used >= cutoff:
+                    # Index order follows recency, so the rest are newer
+                    break
+
+                del self.index[digest]
+                self.total_bytes -= size
+                self.stats["expired"] += 1
+            self._remove_files(digest, extension)
+
+    def _remove_files(self, digest: str, extension: str):
+        for name in (f"{digest}.{extension}", f"{digest}_thumb.jpg"):
+            try:
+                (self.root / digest[:2] / name).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Failed to remove snapshot file {name}: {e}")
+
+    def _scan(self):
+        """Rebuild the LRU index from disk, oldest mtime first"""
+        found: Dict[str, list] = {}
+        for path in self.root.glob("*/*"):
+            match = NAME_PATTERN.match(path.name)
+            if not match:
+                continue
+            stat = path.stat()
+            entry = found.setdefault(match.group(1), [None, 0, 0.0])
+            if not match.group(2):
+                entry[0] = match.group(3)
+                entry[2] = stat.st_mtime
+            entry[1] += stat.st_size
+
+        with self._lock:
+            self.index = OrderedDict(
+                (digest, (entry[0], entry[1]))
+                for digest, entry in sorted(found.items(), key=lambda item: item[1][2])
+                if entry[0]
+            )
+            self.total_bytes = sum(size for _, size in self.index.values())
+
+
+# Global snapshot store instance
+snapshot_store = SnapshotStore()
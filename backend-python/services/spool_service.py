@@ -0,0 +1,362 @@
+"""
+Local write-ahead spool for Supabase writes
+Buffers writes in SQLite while Supabase is failing and replays them in batches
+"""
+import os
+import json
+import queue
+import sqlite3
+import logging
+import threading
+import time
+from typing import Callable, Optional, Dict, Any, List
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+# PostgreSQL error classes worth retrying: connection (08), transaction rollback (40),
+# insufficient resources (53) and operator intervention (57)
+TRANSIENT_PG_CLASSES = ("08", "40", "53", "57")
+# PostgREST could not reach or authenticate to the database
+TRANSIENT_PGRST_CODES = ("PGRST000", "PGRST001", "PGRST002", "PGRST003")
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether a failed write may succeed later (network, timeout, 5xx, database unavailable).
+    Constraint violations, bad payloads and other 4xx responses fail the same way on every retry.
+    Unknown errors count as transient so data is kept.
+    """
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status in (408, 429)
+
+    # supabase-py's APIError carries the PostgreSQL SQLSTATE or PostgREST error code
+    code = getattr(error, "code", None)
+    if isinstance(code, str) and code:
+        if code.startswith("PGRST"):
+            return code in TRANSIENT_PGRST_CODES
+        if len(code) == 5:
+            return code[:2] in TRANSIENT_PG_CLASSES
+
+    # A gateway error page that is not JSON still deserves a retry
+    if isinstance(error, (ValueError, TypeError)) and not isinstance(error, json.JSONDecodeError):
+        return False
+    return True
+
+
+class WriteSpool:
+    def __init__(self, path: str = None, max_bytes: int = None, drop_policy: str = None,
+                 batch_size: int = None, retry_interval: float = None, queue_size: int = None):
+        self.path = path or os.getenv("SPOOL_PATH", "supabase_spool.db")
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("SPOOL_MAX_BYTES", str(50 * 1024 * 1024)))
+        self.drop_policy = drop_policy or os.getenv("SPOOL_DROP_POLICY", DROP_OLDEST)
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv("SPOOL_BATCH_SIZE", "500"))
+        self.retry_interval = retry_interval if retry_interval is not None else float(os.getenv("SPOOL_RETRY_INTERVAL", "5"))
+
+        if self.drop_policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"SPOOL_DROP_POLICY must be '{DROP_OLDEST}' or '{DROP_NEWEST}'")
+
+        # Writes are handed to the spool thread through a bounded queue so
+        # append() never touches the disk on the caller's thread
+        self._queue = queue.Queue(maxsize=queue_size if queue_size is not None else int(os.getenv("SPOOL_QUEUE_SIZE", "10000")))
+        self._writer: Optional[Callable] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        # remote_ok is False from the first failed write until the spool is fully drained,
+        # so new writes queue up behind spooled ones and keep their order
+        self.remote_ok = True
+        self.pending = 0
+        self.pending_bytes = 0
+        self.dead_letters = 0
+        self.stats = {"spooled": 0, "replayed": 0, "dropped": 0, "replay_failures": 0, "dead_lettered": 0}
+
+    def start(self, writer: Callable):
+        """Start the spool thread; writer(table, op, data, match) performs one remote write"""
+        if self._thread is not None:
+            return
+
+        self._writer = writer
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="supabase-spool", daemon=True)
+        self._thread.start()
+        logger.info(f"Write spool started at {self.path} (max {self.max_bytes} bytes, {self.drop_policy})")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the spool thread, flushing queued writes to disk"""
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # Still inside a replay against an unresponsive remote: spool what is queued from here
+            conn = sqlite3.connect(self.path, timeout=timeout)
+            try:
+                self._drain(conn)
+            finally:
+                conn.close()
+            logger.warning("Write spool thread did not stop in time - queued writes flushed from the caller")
+        self._thread = None
+        logger.info("Write spool stopped")
+
+    def append(self, table: str, op: str, data: Dict[str, Any] = None, match: Dict[str, Any] = None) -> bool:
+        """Queue a failed write for local spooling; never blocks"""
+        # Under the lock so the spool thread cannot see an empty queue and re-enable the remote in between
+        with self._lock:
+            self.remote_ok = False
+            try:
+                self._queue.put_nowait((table, op, data, match))
+                return True
+            except queue.Full:
+                self.stats["dropped"] += 1
+
+        logger.warning(f"Spool queue full - dropped {op} on {table}")
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get spool counters"""
+        with self._lock:
+            return {
+                "remote_ok": self.remote_ok,
+                "pending": self.pending,
+                "pending_bytes": self.pending_bytes,
+                "queued": self._queue.qsize(),
+                "max_bytes": self.max_bytes,
+                "drop_policy": self.drop_policy,
+                "dead_letters": self.dead_letters,
+                **self.stats
+            }
+
+    # Spool thread
+    def _run(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "tbl TEXT NOT NULL, op TEXT NOT NULL, payload TEXT NOT NULL, size INTEGER NOT NULL)"
+        )
+        # Writes Supabase rejected permanently (constraint violations, bad payloads), kept for inspection
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dead_letter ("
+            "id INTEGER PRIMARY KEY, tbl TEXT NOT NULL, op TEXT NOT NULL, payload TEXT NOT NULL, "
+            "error TEXT NOT NULL, failed_at REAL NOT NULL)"
+        )
+        conn.commit()
+        with self._lock:
+            self.dead_letters = conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+
+        # Pick up anything left over from a previous run
+        count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM spool").fetchone()
+        with self._lock:
+            self.pending, self.pending_bytes = count, size
+            if count:
+                self.remote_ok = False
+        if count:
+            logger.info(f"Recovered {count} spooled writes from {self.path}")
+
+        last_attempt = 0.0
+        try:
+            while True:
+                if self._stop.is_set():
+                    self._drain(conn)
+                    break
+
+                self._flush_queue(conn, timeout=0.5)
+                if self.pending and time.monotonic() - last_attempt >= self.retry_interval:
+                    last_attempt = time.monotonic()
+                    self._replay(conn)
+                else:
+                    with self._lock:
+                        if not self.pending and self._queue.empty():
+                            self.remote_ok = True
+        finally:
+            conn.close()
+
+    def _drain(self, conn: sqlite3.Connection):
+        """Spool everything still queued, batch_size records per transaction"""
+        while not self._queue.empty():
+            self._flush_queue(conn, timeout=0)
+
+    def _flush_queue(self, conn: sqlite3.Connection, timeout: float):
+        """Move queued writes into SQLite in a single transaction"""
+        records = []
+        try:
+            records.append(self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait())
+            while len(records) < self.batch_size:
+                records.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if not records:
+            return
+
+        rows = []
+        for table, op, data, match in records:
+            payload = json.dumps({"data": data, "match": match}, default=str)
+            rows.append((table, op, payload, len(payload)))
+
+        incoming = sum(row[3] for row in rows)
+        if self.pending_bytes + incoming > self.max_bytes:
+            if self.drop_policy == DROP_NEWEST:
+                rows = self._fit(rows, self.max_bytes - self.pending_bytes)
+            else:
+                # A batch larger than the whole cap keeps only its newest rows
+                if incoming > self.max_bytes:
+                    rows = self._fit(rows[::-1], self.max_bytes)[::-1]
+                    incoming = sum(row[3] for row in rows)
+                self._drop_oldest(conn, self.pending_bytes + incoming - self.max_bytes)
+
+        conn.executemany("INSERT INTO spool (tbl, op, payload, size) VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+
+        with self._lock:
+            self.pending += len(rows)
+            self.pending_bytes += sum(row[3] for row in rows)
+            self.stats["spooled"] += len(rows)
+
+    def _fit(self, rows: List[tuple], room: int) -> List[tuple]:
+        """Keep rows in order while they fit in `room` bytes, drop the rest"""
+        kept = []
+        for row in rows:
+            if row[3] > room:
+                break
+            kept.append(row)
+            room -= row[3]
+
+        dropped = len(rows) - len(kept)
+        with self._lock:
+            self.stats["dropped"] += dropped
+        logger.warning(f"Spool full - dropped {dropped} incoming writes")
+        return kept
+
+    def _drop_oldest(self, conn: sqlite3.Connection, excess: int):
+        """Delete the oldest spooled writes until at least `excess` bytes are freed"""
+        freed, ids = 0, []
+        if excess <= 0:
+            return
+
+        for row_id, size in conn.execute("SELECT id, size FROM spool ORDER BY id"):
+            if freed >= excess:
+                break
+            ids.append(row_id)
+            freed += size
+
+        conn.executemany("DELETE FROM spool WHERE id = ?", [(i,) for i in ids])
+        with self._lock:
+            self.pending -= len(ids)
+            self.pending_bytes -= freed
+            self.stats["dropped"] += len(ids)
+        logger.warning(f"Spool full - dropped {len(ids)} oldest writes ({freed} bytes)")
+
+    def _replay(self, conn: sqlite3.Connection):
+        """Replay spooled writes oldest-first; stops at the first transient failure"""
+        while self.pending and not self._stop.is_set():
+            rows = conn.execute(
+                "SELECT id, tbl, op, payload, size FROM spool ORDER BY id LIMIT ?", (self.batch_size,)
+            ).fetchall()
+
+            if not rows:
+                break
+
+            for group in self._group(rows):
+                try:
+                    self._send(group)
+                except Exception as e:
+                    if is_transient(e):
+                        self._replay_failed(e)
+                        return
+                    if len(group) > 1:
+                        # One bad row must not hold back the rest of its bulk insert
+                        if not self._replay_rows(conn, group):
+                            return
+                        continue
+                    self._dead_letter(conn, group[0], e)
+                    continue
+
+                self._remove(conn, group)
+
+        if not self.pending:
+            logger.info(f"Spool drained - {self.stats['replayed']} writes replayed in total")
+
+    def _send(self, group: List[tuple]):
+        _, table, op, _, _ = group[0]
+        payloads = [json.loads(row[3]) for row in group]
+
+        if op == "insert":
+            # Consecutive inserts into one table go out as a single bulk insert
+            rows = []
+            for p in payloads:
+                rows.extend(p["data"] if isinstance(p["data"], list) else [p["data"]])
+            self._writer(table, op, rows, None)
+        else:
+            self._writer(table, op, payloads[0]["data"], payloads[0]["match"])
+
+    def _replay_rows(self, conn: sqlite3.Connection, group: List[tuple]) -> bool:
+        """Replay a rejected group one row at a time; False when a transient failure stops the replay"""
+        for row in group:
+            try:
+                self._send([row])
+            except Exception as e:
+                if is_transient(e):
+                    self._replay_failed(e)
+                    return False
+                self._dead_letter(conn, row, e)
+                continue
+            self._remove(conn, [row])
+        return True
+
+    def _replay_failed(self, error: Exception):
+        with self._lock:
+            self.stats["replay_failures"] += 1
+        logger.warning(f"Spool replay failed, {self.pending} writes pending: {error}")
+
+    def _remove(self, conn: sqlite3.Connection, group: List[tuple]):
+        conn.executemany("DELETE FROM spool WHERE id = ?", [(row[0],) for row in group])
+        conn.commit()
+
+        with self._lock:
+            self.pending -= len(group)
+            self.pending_bytes -= sum(row[4] for row in group)
+            self.stats["replayed"] += len(group)
+
+    def _dead_letter(self, conn: sqlite3.Connection, row: tuple, error: Exception):
+        """Move a permanently rejected write out of the spool so replay can continue past it"""
+        row_id, table, op, payload, size = row
+        conn.execute(
+            "INSERT INTO dead_letter (id, tbl, op, payload, error, failed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (row_id, table, op, payload, str(error), time.time())
+        )
+        conn.execute("DELETE FROM spool WHERE id = ?", (row_id,))
+        conn.commit()
+
+        with self._lock:
+            self.pending -= 1
+            self.pending_bytes -= size
+            self.dead_letters += 1
+            self.stats["dead_lettered"] += 1
+        logger.error(f"Spooled {op} on {table} rejected permanently, moved to dead_letter: {error}")
+
+    @staticmethod
+    def _group(rows: List[tuple]) -> List[List[tuple]]:
+        """Group consecutive inserts into the same table; updates and deletes stay single"""
+        groups = []
+        for row in rows:
+            last = groups[-1][-1] if groups else None
+            if last and row[2] == "insert" and last[2] == "insert" and row[1] == last[1]:
+                groups[-1].append(row)
+            else:
+                groups.append([row])
+        return groups
+
+
+# Global write spool instance
+write_spool = WriteSpool()
@@ -0,0 +1,245 @@
+"""
+In-memory Supabase backend
+Drop-in stand-in for the supabase-py client with injectable latency, jitter and failures
+"""
+import os
+import copy
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from types import SimpleNamespace
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+# Tables SupabaseService touches; any other table name is created on first use
+TABLES = ["sensor_logs", "goats", "feeding_logs", "ai_events", "weight_logs", "feeding_schedules"]
+
+
+class MemoryBackendError(Exception):
+    """Injected failure, raised from execute() like a supabase-py APIError"""
+
+
+class MemoryQuery:
+    """Fake query builder: records the chain and runs it against the store on execute()"""
+
+    def __init__(self, client: "MemoryClient", table: str):
+        self.client = client
+        self.table = table
+        self.op = "select"
+        self.payload = None
+        self.columns = "*"
+        self.filters = []
+        self.ordering = []
+        self.row_limit = None
+        self.single_row = False
+
+    # Operations
+    def select(self, columns: str = "*", **kwargs):
+        self.op, self.columns = "select", columns
+        return self
+
+    def insert(self, data, **kwargs):
+        self.op, self.payload = "insert", data
+        return self
+
+    def upsert(self, data, **kwargs):
+        self.op, self.payload = "upsert", data
+        return self
+
+    def update(self, data, **kwargs):
+        self.op, self.payload = "update", data
+        return self
+
+    def delete(self, **kwargs):
+        self.op = "delete"
+        return self
+
+    # Filters and modifiers
+    def eq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def in_(self, column: str, values):
+        values = list(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def gt(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        return self
+
+    def gte(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) >= value)
+        return self
+
+    def lt(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) < value)
+        return self
+
+    def lte(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) <= value)
+        return self
+
+    def order(self, column: str, desc: bool = False, **kwargs):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, count: int, **kwargs):
+        self.row_limit = count
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    def execute(self):
+        return self.client._execute(self)
+
+
+class MemoryClient:
+    def __init__(self, latency_ms: float = None, jitter_ms: float = None, failure_rate: float = None, seed: int = None):
+        self.latency_ms = latency_ms if latency_ms is not None else float(os.getenv("SUPABASE_MEMORY_LATENCY_MS", "0"))
+        self.jitter_ms = jitter_ms if jitter_ms is not None else float(os.getenv("SUPABASE_MEMORY_JITTER_MS", "0"))
+        self.failure_rate = failure_rate if failure_rate is not None else float(os.getenv("SUPABASE_MEMORY_FAILURE_RATE", "0"))
+        self.random = random.Random(seed if seed is not None else int(os.getenv("SUPABASE_MEMORY_SEED", "42")))
+
+        self.tables: Dict[str, List[Dict[str, Any]]] = {name: [] for name in TABLES}
+        self.down = False  # simulate a full outage: every call fails until cleared
+        self.stats = {"calls": 0, "failures": 0, "latency_s": 0.0}
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        fixtures = os.getenv("SUPABASE_MEMORY_FIXTURES")
+        if fixtures:
+            self.load_fixtures(fixtures)
+
+    def table(self, name: str) -> MemoryQuery:
+        return MemoryQuery(self, name)
+
+    def configure(self, latency_ms: float = None, jitter_ms: float = None, failure_rate: float = None, down: bool = None):
+        """Change injected latency/failures at runtime (e.g. between benchmark phases)"""
+        if latency_ms is not None:
+            self.latency_ms = latency_ms
+        if jitter_ms is not None:
+            self.jitter_ms = jitter_ms
+        if failure_rate is not None:
+            self.failure_rate = failure_rate
+        if down is not None:
+            self.down = down
+
+    def seed(self, table: str, rows: List[Dict[str, Any]]):
+        """Insert rows directly, without latency or failure injection"""
+        with self._lock:
+            self.tables.setdefault(table, []).extend(self._with_id(row) for row in rows)
+
+    def load_fixtures(self, path: str):
+        """Seed tables from a JSON file shaped like {"goats": [{...}], ...}"""
+        with open(path) as f:
+            for table, rows in json.load(f).items():
+                self.seed(table, rows)
+        logger.info(f"Loaded in-memory Supabase fixtures from {path}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get call counts, injected failures and table sizes"""
+        with self._lock:
+            return {
+                **self.stats,
+                "latency_ms": self.latency_ms,
+                "jitter_ms": self.jitter_ms,
+                "failure_rate": self.failure_rate,
+                "down": self.down,
+                "by_call": dict(self.calls),
+                "rows": {name: len(rows) for name, rows in self.tables.items()}
+            }
+
+    # Internals
+    def _execute(self, query: MemoryQuery):
+        # Same blocking behaviour as the sync supabase-py client
+        delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        if delay:
+            time.sleep(delay)
+
+        with self._lock:
+            key = f"{query.table}.{query.op}"
+            self.calls[key] = self.calls.get(key, 0) + 1
+            self.stats["calls"] += 1
+            self.stats["latency_s"] += delay
+
+            if self.down or (self.failure_rate and self.random.random() < self.failure_rate):
+                self.stats["failures"] += 1
+                raise MemoryBackendError(f"Injected failure on {query.op} {query.table}")
+
+            rows = self.tables.setdefault(query.table, [])
+            # Copy while locked: the results are live rows another thread may be updating
+            data = copy.deepcopy(getattr(self, f"_{query.op}")(rows, query))
+
+        if query.single_row:
+            if len(data) != 1:
+                raise MemoryBackendError(f"Expected a single row from {query.table}, got {len(data)}")
+            data = data[0]
+
+        return SimpleNamespace(data=data, count=None)
+
+    def _matches(self, rows: List[Dict[str, Any]], query: MemoryQuery) -> List[Dict[str, Any]]:
+        return [row for row in rows if all(check(row) for check in query.filters)]
+
+    def _select(self, rows, query):
+        matched = self._matches(rows, query)
+
+        # Apply orderings last-to-first so the first order() call is the primary key
+        for column, desc in reversed(query.ordering):
+            matched.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+
+        if query.row_limit is not None:
+            matched = matched[:query.row_limit]
+
+        if query.columns.strip() != "*":
+            columns = [c.strip() for c in query.columns.split(",")]
+            matched = [{c: row.get(c) for c in columns} for row in matched]
+
+        return matched
+
+    def _insert(self, rows, query):
+        payload = query.payload if isinstance(query.payload, list) else [query.payload]
+        inserted = [self._with_id(row) for row in payload]
+        rows.extend(inserted)
+        return inserted
+
+    def _upsert(self, rows, query):
+        payload = query.payload if isinstance(query.payload, list) else [query.payload]
+        by_id = {row.get("id"): row for row in rows}
+        written = []
+        for row in payload:
+            existing = by_id.get(row.get("id")) if row.get("id") is not None else None
+            if existing is not None:
+                existing.update(row)
+                written.append(existing)
+            else:
+                written.append(self._with_id(row))
+                rows.append(written[-1])
+        return written
+
+    def _update(self, rows, query):
+        matched = self._matches(rows, query)
+        for row in matched:
+            row.update(query.payload)
+        return matched
+
+    def _delete(self, rows, query):
+        matched = self._matches(rows, query)
+        rows[:] = [row for row in rows if not any(row is m for m in matched)]
+        return matched
+
+    @staticmethod
+    def _with_id(row: Dict[str, Any]) -> Dict[str, Any]:
+        row = dict(row)
+        row.setdefault("id", str(uuid.uuid4()))
+        return row
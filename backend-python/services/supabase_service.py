@@ -3,24 +3,82 @@ Supabase Service for database operations
 """
 import os
 import logging
-from supabase import create_client, Client
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
+from services.spool_service import write_spool, is_transient
+from services.snapshot_store import snapshot_store
+from services.http_pool import http_pool
+from services.metrics_service import metrics
+from services.log_service import debug_log
+
 logger = logging.getLogger(__name__)
 
 class SupabaseService:
     def __init__(self):
+        self.backend = os.getenv("SUPABASE_BACKEND", "remote")
+        self.spool = write_spool
+        
+        # In-memory tables for offline development and benchmarking
+        if self.backend == "memory":
+            from services.supabase_memory import MemoryClient
+            self.client = MemoryClient()
+            logger.info("Supabase in-memory backend initialized")
+            return
+        
         url = os.getenv("SUPABASE_URL")
         key = os.getenv("SUPABASE_KEY")
         
         if not url or not key:
-            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables (or SUPABASE_BACKEND=memory)")
         
         # Simple client initialization for supabase 2.25+
-        self.client: Client = create_client(url, key)
+        # Every table call goes through one shared keep-alive pool instead of the library's per-client default
+        from supabase import create_client, ClientOptions
+        self.client = create_client(url, key, options=ClientOptions(httpx_client=http_pool.client))
         logger.info("Supabase client initialized")
     
+    # Write path
+    def write_remote(self, table: str, op: str, data: Any = None, match: Dict[str, Any] = None):
+        """Execute a single insert/update/delete against Supabase, raising on failure"""
+        query = self.client.table(table)
+        
+        if op == "insert":
+            query = query.insert(data)
+        elif op == "update":
+            query = query.update(data)
+        elif op == "delete":
+            query = query.delete()
+        else:
+            raise ValueError(f"Unsupported write operation: {op}")
+        
+        for column, value in (match or {}).items():
+            query = query.eq(column, value)
+        
+        with self._timed(table, op):
+            return query.execute()
+    
+    def _timed(self, table: str, op: str):
+        """Time a Supabase call into the per-table latency histogram"""
+        return metrics.timer("supabase_request_duration_seconds", "supabase_request_errors_total", table=table, op=op)
+    
+    def _write(self, table: str, op: str, data: Any = None, match: Dict[str, Any] = None):
+        """Write to Supabase, falling back to the local spool while the remote is failing"""
+        if not self.spool.remote_ok:
+            self.spool.append(table, op, data, match)
+            return None
+        
+        try:
+            return self.write_remote(table, op, data, match).data
+        except Exception as e:
+            if not is_transient(e):
+                # Retrying a rejected row (bad payload, unknown goat id) only blocks the writes behind it
+                logger.error(f"Supabase {op} on {table} rejected, not spooled: {e}")
+                return None
+            logger.error(f"Supabase {op} on {table} failed, spooling locally: {e}")
+            self.spool.append(table, op, data, match)
+            return None
+    
     # Sensor Logs
     async def insert_sensor_log(self, goat_id: str, sensor_type: str, value: float, unit: str = None):
         """Insert a sensor log entry"""
@@ -33,9 +91,10 @@ class SupabaseService:
                 "recorded_at": datetime.utcnow().isoformat()
             }
             
-            result = self.client.table("sensor_logs").insert(data).execute()
-            logger.info(f"Inserted sensor log for goat {goat_id}: {sensor_type}={value}")
-            return result.data
+            result = self._write("sensor_logs", "insert", data)
+            if result is not None:
+                debug_log.log(logger, "supabase_sensor_log", "Inserted sensor log for goat %s: %s=%s", goat_id, sensor_type, value)
+            return result
         
         except Exception as e:
             logger.error(f"Error inserting sensor log: {e}")
@@ -44,12 +103,13 @@ class SupabaseService:
     async def get_latest_sensor_logs(self, goat_id: str, limit: int = 10):
         """Get latest sensor logs for a goat"""
         try:
-            result = self.client.table("sensor_logs")\
-                .select("*")\
-                .eq("goat_id", goat_id)\
-                .order("recorded_at", desc=True)\
-                .limit(limit)\
-                .execute()
+            with self._timed("sensor_logs", "select"):
+                result = self.client.table("sensor_logs")\
+                    .select("*")\
+                    .eq("goat_id", goat_id)\
+                    .order("recorded_at", desc=True)\
+                    .limit(limit)\
+                    .execute()
             
             return result.data
         
@@ -70,13 +130,10 @@ class SupabaseService:
             if location_name:
                 data["last_location_name"] = location_name
             
-            result = self.client.table("goats")\
-                .update(data)\
-                .eq("id", goat_id)\
-                .execute()
-            
-            logger.info(f"Updated location for goat {goat_id}")
-            return result.data
+            result = self._write("goats", "update", data, {"id": goat_id})
+            if result is not None:
+                debug_log.log(logger, "supabase_location", "Updated location for goat %s", goat_id)
+            return result
         
         except Exception as e:
             logger.error(f"Error updating goat location: {e}")
@@ -93,13 +150,10 @@ class SupabaseService:
             if health_score is not None:
                 data["health_score"] = health_score
             
-            result = self.client.table("goats")\
-                .update(data)\
-                .eq("id", goat_id)\
-                .execute()
-            
-            logger.info(f"Updated status for goat {goat_id}: {status}")
-            return result.data
+            result = self._write("goats", "update", data, {"id": goat_id})
+            if result is not None:
+                logger.info(f"Updated status for goat {goat_id}: {status}")
+            return result
         
         except Exception as e:
             logger.error(f"Error updating goat status: {e}")
@@ -108,11 +162,12 @@ class SupabaseService:
     async def get_goat(self, goat_id: str):
         """Get goat by ID"""
         try:
-            result = self.client.table("goats")\
-                .select("*")\
-                .eq("id", goat_id)\
-                .single()\
-                .execute()
+            with self._timed("goats", "select"):
+                result = self.client.table("goats")\
+                    .select("*")\
+                    .eq("id", goat_id)\
+                    .single()\
+                    .execute()
             
             return result.data
         
@@ -120,6 +175,21 @@ class SupabaseService:
             logger.error(f"Error fetching goat: {e}")
             return None
     
+    async def get_farm_goats(self, farm_id: str):
+        """Get all goats belonging to a farm"""
+        try:
+            with self._timed("goats", "select"):
+                result = self.client.table("goats")\
+                    .select("id, name, rfid_tag")\
+                    .eq("farm_id", farm_id)\
+                    .execute()
+            
+            return result.data
+        
+        except Exception as e:
+            logger.error(f"Error fetching farm goats: {e}")
+            return []
+    
     # Feeding Logs
     async def insert_feeding_log(self, goat_id: str, amount_kg: float = None, triggered_by: str = "manual", notes: str = None):
         """Insert a feeding log entry"""
@@ -132,23 +202,52 @@ class SupabaseService:
                 "notes": notes
             }
             
-            result = self.client.table("feeding_logs").insert(data).execute()
-            logger.info(f"Inserted feeding log for goat {goat_id}: triggered_by={triggered_by}")
-            return result.data
+            result = self._write("feeding_logs", "insert", data)
+            if result is not None:
+                logger.info(f"Inserted feeding log for goat {goat_id}: triggered_by={triggered_by}")
+            return result
         
         except Exception as e:
             logger.error(f"Error inserting feeding log: {e}")
             return None
     
+    async def insert_feeding_logs(self, entries: List[Dict[str, Any]]):
+        """Insert feeding log entries (goat_id, amount_kg, triggered_by, notes) in one request"""
+        if not entries:
+            return []
+        
+        try:
+            fed_at = datetime.utcnow().isoformat()
+            data = [
+                {
+                    "goat_id": entry["goat_id"],
+                    "fed_at": fed_at,
+                    "amount_kg": entry.get("amount_kg"),
+                    "triggered_by": entry.get("triggered_by", "manual"),
+                    "notes": entry.get("notes")
+                }
+                for entry in entries
+            ]
+            
+            result = self._write("feeding_logs", "insert", data)
+            if result is not None:
+                logger.info(f"Inserted {len(data)} feeding logs")
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error inserting feeding logs: {e}")
+            return None
+    
     async def get_feeding_logs(self, goat_id: str, limit: int = 20):
         """Get feeding logs for a goat"""
         try:
-            result = self.client.table("feeding_logs")\
-                .select("*")\
-                .eq("goat_id", goat_id)\
-                .order("fed_at", desc=True)\
-                .limit(limit)\
-                .execute()
+            with self._timed("feeding_logs", "select"):
+                result = self.client.table("feeding_logs")\
+                    .select("*")\
+                    .eq("goat_id", goat_id)\
+                    .order("fed_at", desc=True)\
+                    .limit(limit)\
+                    .execute()
             
             return result.data
         
@@ -157,9 +256,15 @@ class SupabaseService:
             return []
     
     # AI Events
-    async def insert_ai_event(self, goat_id: str, event_type: str, confidence: float = None, metadata: dict = None, image_url: str = None):
-        """Insert an AI event"""
+    async def insert_ai_event(self, goat_id: str, event_type: str, confidence: float = None, metadata: dict = None, image_url: str = None, frame: bytes = None):
+        """Insert an AI event; a triggering frame is stored in the snapshot store and linked as image_url"""
         try:
+            if frame is not None and image_url is None:
+                snapshot = snapshot_store.save(frame)
+                if snapshot:
+                    image_url = snapshot["image_url"]
+                    metadata = {**(metadata or {}), "thumbnail_url": snapshot["thumbnail_url"]}
+            
             data = {
                 "goat_id": goat_id,
                 "event_type": event_type,
@@ -169,9 +274,10 @@ class SupabaseService:
                 "created_at": datetime.utcnow().isoformat()
             }
             
-            result = self.client.table("ai_events").insert(data).execute()
-            logger.info(f"Inserted AI event for goat {goat_id}: {event_type}")
-            return result.data
+            result = self._write("ai_events", "insert", data)
+            if result is not None:
+                logger.info(f"Inserted AI event for goat {goat_id}: {event_type}")
+            return result
         
         except Exception as e:
             logger.error(f"Error inserting AI event: {e}")
@@ -185,7 +291,8 @@ class SupabaseService:
             if goat_id:
                 query = query.eq("goat_id", goat_id)
             
-            result = query.order("created_at", desc=True).limit(limit).execute()
+            with self._timed("ai_events", "select"):
+                result = query.order("created_at", desc=True).limit(limit).execute()
             
             return result.data
         
@@ -205,16 +312,19 @@ class SupabaseService:
                 "notes": notes
             }
             
-            result = self.client.table("weight_logs").insert(data).execute()
-            logger.info(f"Inserted weight log for goat {goat_id}: {weight_kg}kg")
+            result = self._write("weight_logs", "insert", data)
+            if result is not None:
+                logger.info(f"Inserted weight log for goat {goat_id}: {weight_kg}kg")
             
             # Also update goat's current weight
-            await self.client.table("goats")\
-                .update({"weight": weight_kg, "updated_at": datetime.utcnow().isoformat()})\
-                .eq("id", goat_id)\
-                .execute()
+            self._write(
+                "goats",
+                "update",
+                {"weight": weight_kg, "updated_at": datetime.utcnow().isoformat()},
+                {"id": goat_id}
+            )
             
-            return result.data
+            return result
         
         except Exception as e:
             logger.error(f"Error inserting weight log: {e}")
@@ -223,12 +333,13 @@ class SupabaseService:
     async def get_weight_logs(self, goat_id: str, limit: int = 30):
         """Get weight logs for a goat"""
         try:
-            result = self.client.table("weight_logs")\
-                .select("*")\
-                .eq("goat_id", goat_id)\
-                .order("measured_at", desc=True)\
-                .limit(limit)\
-                .execute()
+            with self._timed("weight_logs", "select"):
+                result = self.client.table("weight_logs")\
+                    .select("*")\
+                    .eq("goat_id", goat_id)\
+                    .order("measured_at", desc=True)\
+                    .limit(limit)\
+                    .execute()
             
             return result.data
         
@@ -240,12 +351,13 @@ class SupabaseService:
     async def get_feeding_schedules(self, farm_id: str):
         """Get active feeding schedules for a farm"""
         try:
-            result = self.client.table("feeding_schedules")\
-                .select("*")\
-                .eq("farm_id", farm_id)\
-                .eq("is_active", True)\
-                .order("time")\
-                .execute()
+            with self._timed("feeding_schedules", "select"):
+                result = self.client.table("feeding_schedules")\
+                    .select("*")\
+                    .eq("farm_id", farm_id)\
+                    .eq("is_active", True)\
+                    .order("time")\
+                    .execute()
             
             return result.data
         
@@ -253,6 +365,21 @@ class SupabaseService:
             logger.error(f"Error fetching feeding schedules: {e}")
             return []
     
+    async def get_active_feeding_schedules(self):
+        """Get active feeding schedules across all farms"""
+        try:
+            with self._timed("feeding_schedules", "select"):
+                result = self.client.table("feeding_schedules")\
+                    .select("*")\
+                    .eq("is_active", True)\
+                    .execute()
+            
+            return result.data
+        
+        except Exception as e:
+            logger.error(f"Error fetching active feeding schedules: {e}")
+            return []
+    
     async def insert_feeding_schedule(self, farm_id: str, time: str, amount_kg: float = 0.5):
         """Insert a new feeding schedule"""
         try:
@@ -264,7 +391,8 @@ class SupabaseService:
                 "created_at": datetime.utcnow().isoformat()
             }
             
-            result = self.client.table("feeding_schedules").insert(data).execute()
+            with self._timed("feeding_schedules", "insert"):
+                result = self.client.table("feeding_schedules").insert(data).execute()
             logger.info(f"Inserted feeding schedule for farm {farm_id}: {time}")
             return result.data
         
@@ -286,10 +414,11 @@ class SupabaseService:
             if is_active is not None:
                 data["is_active"] = is_active
             
-            result = self.client.table("feeding_schedules")\
-                .update(data)\
-                .eq("id", schedule_id)\
-                .execute()
+            with self._timed("feeding_schedules", "update"):
+                result = self.client.table("feeding_schedules")\
+                    .update(data)\
+                    .eq("id", schedule_id)\
+                    .execute()
             
             logger.info(f"Updated feeding schedule {schedule_id}")
             return result.data
@@ -301,10 +430,11 @@ class SupabaseService:
     async def delete_feeding_schedule(self, schedule_id: str):
         """Delete a feeding schedule"""
         try:
-            result = self.client.table("feeding_schedules")\
-                .delete()\
-                .eq("id", schedule_id)\
-                .execute()
+            with self._timed("feeding_schedules", "delete"):
+                result = self.client.table("feeding_schedules")\
+                    .delete()\
+                    .eq("id", schedule_id)\
+                    .execute()
             
             logger.info(f"Deleted feeding schedule {schedule_id}")
             return result.data
@@ -2,6 +2,7 @@ import cv2
 import numpy as np
 import logging
 import os
+import time
 from pathlib import Path
 import warnings
 from datetime import datetime
@@ -26,24 +27,19 @@ torch.load = patched_load
 # Import YOLO after patching
 from ultralytics import YOLO
 
-# Load the YOLOv8 model
-# Priority: Custom trained model first, then COCO pretrained as fallback
-_script_dir = Path(__file__).resolve().parent  # backend-python/services
-_project_root = _script_dir.parent.parent  # smart-ngangon-main
-
-MODEL_CANDIDATES = [
-    # Custom trained model from SMARTNGON_CV (prioritized!)
-    _project_root / 'SMARTNGON_CV' / 'SMARTNGON' / 'runs' / 'detect' / 'train2' / 'weights' / 'best.pt',
-    _project_root / 'SMARTNGON_CV' / 'runs' / 'detect' / 'train2' / 'weights' / 'best.pt',
-    _project_root / 'SMARTNGON_CV' / 'runs' / 'detect' / 'train_improved' / 'weights' / 'best.pt',
-    Path('best.pt'),
-    Path('backend-python') / 'best.pt',
-    'yolov8n.pt',  # Fallback: Pretrained COCO model (sheep class 19, cow class 18)
-]
+from services.metrics_service import record_stages
+from services.adaptive_resolution import adaptive_resolution
+from services.goat_tracker import TrackerRegistry
+from services.roi_service import roi_registry
+from services.zone_map import zone_maps
+from services.model_selection import load_order, ALLOWED_COCO_IDS, ALLOWED_NAMES
+from services.log_service import debug_log
 
+# Load the YOLOv8 model
+# Priority: CV_MODEL_PATH, then the best model in the evaluation manifest, then the fixed candidate list
 model = None
 loaded_path = None
-for p in MODEL_CANDIDATES:
+for p in load_order():
     try_path = Path(p) if not str(p).endswith('.pt') or '/' in str(p) else p
     if isinstance(try_path, Path) and not try_path.is_absolute():
         try_path = Path(os.getcwd()) / try_path
@@ -51,7 +47,8 @@ for p in MODEL_CANDIDATES:
     # Check if path exists (skip string paths like 'yolov8n.pt' - ultralytics will download)
     if isinstance(try_path, str) or try_path.exists():
         try:
-            model = YOLO(str(try_path) if isinstance(try_path, Path) else try_path)
+            # Exported models (.onnx) cannot always infer their task; .pt weights carry their own
+            model = YOLO(str(try_path) if isinstance(try_path, Path) else try_path, task="detect")
             loaded_path = try_path
             logger.info(f"Loaded YOLOv8 model from: {try_path}")
             break
@@ -59,11 +56,14 @@ for p in MODEL_CANDIDATES:
             logger.error(f"Attempted to load model at {try_path} but failed: {e}")
 
 if model is None:
-    logger.error("Failed to load YOLOv8 model from candidate paths: %s", MODEL_CANDIDATES)
+    logger.error("Failed to load YOLOv8 model from candidate paths: %s", load_order())
 else:
     # Log the model's class names for debugging
     logger.info(f"Model class names: {model.names}")
 
+# Input size the model runs at when no per-stream size is chosen (ultralytics default)
+DEFAULT_IMGSZ = 640
+
 # Movement tracking state
 class MovementTracker:
     def __init__(self, max_history=30):
@@ -83,13 +83,13 @@ class MovementTracker:
         else:
             return "KANDANG"  # Right zone - resting area
     
-    def update(self, bbox, frame_width, frame_height):
-        """Update movement tracking with new detection"""
+    def update(self, bbox, frame_width, frame_height, zone=None):
+        """Update movement tracking with new detection; `zone` comes from the stream's zone map when known"""
         x1, y1, x2, y2 = bbox
         x_center = (x1 + x2) / 2
         y_center = (y1 + y2) / 2
         
-        current_zone = self.calculate_zone(x_center, frame_width)
+        current_zone = zone or self.calculate_zone(x_center, frame_width)
         
         # Reset counter if goat returns to KANDANG zone
         if current_zone == "KANDANG":
@@ -136,17 +136,132 @@ class MovementTracker:
             "feeding_triggered": self.feeding_triggered
         }
 
-# Global movement tracker instance
-movement_tracker = MovementTracker()
+# Per-stream multi-goat trackers; each track owns a MovementTracker
+goat_trackers = TrackerRegistry(MovementTracker)
+
+# STRICT FILTER: Only accept sheep/cow/goat
+# Boolean table indexed by class id, built once from the model's names instead of per box
+def build_class_lookup(names):
+    lookup = np.zeros(max(list(names) + ALLOWED_COCO_IDS) + 1, dtype=bool)
+    for cls, name in names.items():
+        lookup[cls] = cls in ALLOWED_COCO_IDS or name.lower() in ALLOWED_NAMES
+    return lookup
+
+ALLOWED_CLASSES = build_class_lookup(model.names) if model is not None else np.zeros(0, dtype=bool)
+
+# Indexed by (aspect_ratio > 2.0) + 2 * (aspect_ratio < 0.6)
+BEHAVIOR_LABELS = ("Standing", "Lying Down", "Sitting")
+
+def _to_numpy(values):
+    return values.cpu().numpy() if hasattr(values, "cpu") else np.asarray(values)
+
+def boxes_to_array(result_boxes):
+    """(N, 6) float32 array of (class_id, conf, x1, y1, x2, y2) pulled from an ultralytics Boxes object in one go"""
+    return np.column_stack((
+        _to_numpy(result_boxes.cls),
+        _to_numpy(result_boxes.conf),
+        _to_numpy(result_boxes.xyxy).reshape(-1, 4)
+    )).astype(np.float32, copy=False)
+
+def detect(img, imgsz=None):
+    """Run the model on a decoded BGR frame; returns raw boxes as an (N, 6) array of (class_id, conf, x1, y1, x2, y2)"""
+    # Run inference with balanced confidence threshold
+    # 0.35 = good balance between detection rate and accuracy
+    if imgsz:
+        results = model(img, conf=0.35, imgsz=imgsz, verbose=False)
+    else:
+        results = model(img, conf=0.35, verbose=False)
+    
+    arrays = []
+    for result in results:
+        debug_log.log(logger, "cv_raw_count", "Raw detections before filtering: %d boxes", len(result.boxes))
+        arrays.append(boxes_to_array(result.boxes))
+    return np.concatenate(arrays) if arrays else np.empty((0, 6), dtype=np.float32)
+
+def build_detections(boxes):
+    """
+    Filter raw boxes to goats and label their behaviour with array ops, then build the dicts in one pass.
+    Returns (detections, rounded (N, 4) int bboxes).
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+    classes = boxes[:, 0].astype(np.intp)
+    
+    # Class ID OR class name must be allowed; ids outside the model's table never are
+    keep = np.zeros(len(boxes), dtype=bool)
+    known = (classes >= 0) & (classes < len(ALLOWED_CLASSES))
+    keep[known] = ALLOWED_CLASSES[classes[known]]
+    kept = boxes[keep]
+    
+    debug_log.log(
+        logger, "cv_filter", "Kept %d of %d raw boxes (classes seen: %s)",
+        len(kept), len(boxes), np.unique(classes).tolist(), level=logging.DEBUG
+    )
+    
+    # Simple behavior heuristic based on aspect ratio (Placeholder)
+    # In a real scenario, you'd train a custom model for behaviors like 'eating', 'sleeping'
+    width = kept[:, 4] - kept[:, 2]
+    height = kept[:, 5] - kept[:, 3]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        aspect_ratio = width / height
+    # Only lying down if very wide (> 2.0), sitting if very tall and narrow (< 0.6)
+    behaviors = (aspect_ratio > 2.0).astype(np.intp) + 2 * (aspect_ratio < 0.6)
+    
+    bboxes = np.rint(kept[:, 2:]).astype(int)
+    confidences = np.round(kept[:, 1].astype(np.float64), 2)
+    
+    detections = [
+        {
+            "class": "Kambing",
+            "confidence": conf,
+            "bbox": bbox,
+            "behavior": BEHAVIOR_LABELS[behavior],
+            "zone": "UNKNOWN"
+        }
+        for conf, bbox, behavior in zip(confidences.tolist(), bboxes.tolist(), behaviors.tolist())
+    ]
+    return detections, bboxes
 
-def analyze_image(image_bytes):
+def postprocess_boxes(boxes, frame_width, frame_height, tracker=None, stream_id=None):
+    """
+    Turn raw boxes into goat detections, each with a persistent track id and its own movement state.
+    Returns (detections, zone_info, tracker_seconds); pass a MultiGoatTracker to replay offline footage.
+    Zones come from the stream's polygon zone map, or the legacy left/middle/right bands without one.
+    """
+    tracker = tracker or goat_trackers.get()
+    detections, bboxes = build_detections(boxes)
+    
+    # One grid lookup classifies every detection centre
+    centers = (bboxes[:, :2] + bboxes[:, 2:]) / 2
+    for detection, zone in zip(detections, zone_maps.classify(stream_id, centers, frame_width, frame_height)):
+        detection["zone"] = zone
+    
+    # Associate detections with tracks; every goat counts its own zone crossings and head movements
+    tracker_started = time.perf_counter()
+    zone_info = tracker.update(detections, frame_width, frame_height)
+    tracker_seconds = time.perf_counter() - tracker_started
+    
+    if zone_info:
+        debug_log.log(
+            logger, "cv_zone",
+            "✅ Zone tracking updated: track=%s, zone=%s, moves=%d, trigger=%s",
+            zone_info['track_id'], zone_info['zone'], zone_info['movement_count'], zone_info['should_feed']
+        )
+    
+    return detections, zone_info, tracker_seconds
+
+def analyze_image(image_bytes, timings=None, stream_id=None):
     """
     Analyzes an image byte stream using YOLOv8 to detect objects (goats).
+    Pass a dict as `timings` to receive the per-stage breakdown in milliseconds.
+    Frames tagged with a `stream_id` run at an input size adapted to that camera,
+    cropped to the camera's region of interest when one is configured.
     """
     if model is None:
         return {"error": "Model not loaded", "detections": []}
 
     try:
+        started = time.perf_counter()
+        
         # Convert image bytes to numpy array
         nparr = np.frombuffer(image_bytes, np.uint8)
         
@@ -156,95 +271,56 @@ def analyze_image(image_bytes):
         if img is None:
             return {"error": "Failed to decode image", "detections": []}
         
+        decoded = time.perf_counter()
+        
         # Get frame dimensions for zone calculation
         frame_height, frame_width = img.shape[:2]
         
         # Debug: Log image info
-        logger.info(f"Image decoded: shape={img.shape}, dtype={img.dtype}")
-
-        # Run inference with balanced confidence threshold
-        # 0.35 = good balance between detection rate and accuracy
-        results = model(img, conf=0.35, verbose=False) 
-
-        detections = []
-        zone_info = None
-        should_trigger_feeding = False
-        
-        for result in results:
-            boxes = result.boxes
-            logger.info(f"Raw detections before filtering: {len(boxes)} boxes")
-            for box in boxes:
-                # Get class info
-                cls = int(box.cls[0])
-                class_name = model.names[cls]
-                conf = float(box.conf[0])
-                
-                # Get box coordinates
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                
-                # LOG what we detected
-                logger.info(f"YOLO detected: class_id={cls}, class_name='{class_name}', conf={conf:.2f}, bbox=[{x1:.0f},{y1:.0f},{x2:.0f},{y2:.0f}]")
-                
-                # Update movement tracking FIRST (before filter) for first detection only
-                # This ensures zone tracking works even if class is not sheep/cow
-                if zone_info is None:
-                    zone_info = movement_tracker.update(
-                        [x1, y1, x2, y2], 
-                        frame_width, 
-                        frame_height
-                    )
-                    should_trigger_feeding = zone_info["should_feed"]
-                    logger.info(f"✅ Zone tracking updated: zone={zone_info['zone']}, moves={zone_info['movement_count']}, trigger={should_trigger_feeding}")
-                
-                # STRICT FILTER: Only accept sheep/cow/goat
-                # COCO class IDs: 18=dog, 19=horse, 20=sheep, 21=cow
-                # We ONLY want: 20=sheep, 21=cow (closest to goat)
-                
-                ALLOWED_COCO_IDS = [20, 21]  # sheep=20, cow=21 ONLY
-                ALLOWED_NAMES = ['sheep', 'cow', 'goat', 'kambing', 'domba']
-                
-                class_lower = class_name.lower()
-                
-                # Check: either class ID matches OR class name is in allowed list
-                is_allowed = cls in ALLOWED_COCO_IDS or class_lower in ALLOWED_NAMES
-                
-                if not is_allowed:
-                    # Silently skip - don't log every filtered object
-                    continue
-                
-                logger.info(f"✅ DETECTED: {class_name} (ID: {cls}) conf={conf:.2f}")
-                display_name = "Kambing"
-                
-                # Simple behavior heuristic based on aspect ratio or position (Placeholder)
-                # In a real scenario, you'd train a custom model for behaviors like 'eating', 'sleeping'
-                width = x2 - x1
-                height = y2 - y1
-                aspect_ratio = width / height
-                
-                # More accurate behavior detection - only mark as lying down if very wide
-                behavior = "Standing"
-                if aspect_ratio > 2.0:  # Changed from 1.2 to 2.0 - much wider bbox = lying
-                    behavior = "Lying Down"
-                elif aspect_ratio < 0.6:  # Very tall and narrow
-                    behavior = "Sitting"
-                
-                detections.append({
-                    "class": display_name,
-                    "confidence": round(conf, 2),
-                    "bbox": [round(x1), round(y1), round(x2), round(y2)],
-                    "behavior": behavior,
-                    "zone": zone_info["zone"] if zone_info else "UNKNOWN"
-                })
+        debug_log.log(logger, "cv_decode", "Image decoded: shape=%s, dtype=%s", img.shape, img.dtype, level=logging.DEBUG)
+
+        # Only the region of interest goes to the model; boxes are shifted back to full-frame coordinates
+        roi = roi_registry.get(stream_id)
+        model_input, (x_offset, y_offset) = roi_registry.apply(img, roi) if roi else (img, (0, 0))
+        input_height, input_width = model_input.shape[:2]
+        
+        cropped = time.perf_counter()
+        
+        imgsz = adaptive_resolution.choose(stream_id)
+        boxes = detect(model_input, imgsz)
+        if x_offset or y_offset:
+            boxes[:, 2:] += (x_offset, y_offset, x_offset, y_offset)
+        
+        inferred = time.perf_counter()
+        
+        detections, zone_info, tracker_seconds = postprocess_boxes(
+            boxes, frame_width, frame_height, goat_trackers.get(stream_id), stream_id
+        )
+        should_trigger_feeding = zone_info["should_feed"] if zone_info else False
+        adaptive_resolution.update(stream_id, imgsz, detections, input_width, input_height, inferred - cropped)
+        roi_registry.record(stream_id, frame_width * frame_height, input_width * input_height, inferred - cropped)
 
         count = len(detections)
-        logger.info(f"Detected {count} objects.")
+        debug_log.log(logger, "cv_result", "Detected %d objects.", count)
+        
+        stages = {
+            "decode": decoded - started,
+            "inference": inferred - cropped,
+            "postprocess": time.perf_counter() - inferred - tracker_seconds,
+            "tracker": tracker_seconds
+        }
+        if roi:
+            stages["roi"] = cropped - decoded
+        record_stages(stages, timings)
 
         return {
             "status": "success",
             "count": count,
             "detections": detections,
             "zone_info": zone_info,
-            "should_trigger_feeding": should_trigger_feeding
+            "should_trigger_feeding": should_trigger_feeding,
+            "imgsz": imgsz or DEFAULT_IMGSZ,
+            "roi": roi
         }
 
     except Exception as e:
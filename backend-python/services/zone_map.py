@@ -0,0 +1,160 @@
+"""
+Zone Maps
+Per-stream polygon zones rasterized into a low-resolution label grid for O(1) zone lookups
+"""
+import os
+import logging
+import threading
+import numpy as np
+from typing import Optional, Dict, Any, List, Tuple
+
+from services.config_store import ReloadableConfig
+
+logger = logging.getLogger(__name__)
+
+# Legacy layout used for streams without a zone map: vertical bands by x ratio
+LEGACY_BANDS = [(0.33, "FEEDING"), (0.66, "FENCE"), (float("inf"), "KANDANG")]
+# The only zones MovementTracker acts on; any other name would load and then never trigger feeding
+ZONE_NAMES = tuple(name for _, name in LEGACY_BANDS)
+
+
+def rasterize(polygons: List[Tuple[int, List[List[float]]]], grid_width: int, grid_height: int) -> np.ndarray:
+    """Label every grid cell whose centre lies inside a polygon (even-odd rule); later polygons win"""
+    grid = np.zeros((grid_height, grid_width), dtype=np.uint8)
+    xs = (np.arange(grid_width) + 0.5) / grid_width
+    ys = (np.arange(grid_height) + 0.5) / grid_height
+    px, py = np.meshgrid(xs, ys)
+
+    for label, points in polygons:
+        inside = np.zeros_like(grid, dtype=bool)
+        vertices = np.asarray(points, dtype=float)
+        for (x1, y1), (x2, y2) in zip(vertices, np.roll(vertices, -1, axis=0)):
+            # Edge crosses the horizontal line through the cell centre, to the right of it
+            crosses = (y1 > py) != (y2 > py)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+            inside ^= crosses & (px < x_cross)
+        grid[inside] = label
+
+    return grid
+
+
+class ZoneMaps:
+    def __init__(self):
+        # Cells along the frame's long side; 128 keeps a 1080p grid under 10 px per cell
+        self.grid_size = int(os.getenv("CV_ZONE_GRID", "128"))
+        self.config = ReloadableConfig(
+            os.getenv("CV_ZONES_PATH", "zone_config.json"),
+            self._validate,
+            float(os.getenv("CV_ZONES_RELOAD_INTERVAL", "1.0"))
+        )
+
+        # (stream_id, frame_width, frame_height) -> (config version, label grid, label names)
+        self._cache: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def classify(self, stream_id: Optional[str], centers: np.ndarray, frame_width: int, frame_height: int) -> List[str]:
+        """Zone name for each (x, y) pixel centre in one vectorized lookup"""
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        if len(centers) == 0:
+            return []
+
+        zone_map = self.config.get(stream_id) if stream_id else None
+        if zone_map is None:
+            ratios = centers[:, 0] / frame_width
+            bands = np.searchsorted([bound for bound, _ in LEGACY_BANDS[:-1]], ratios, side="right")
+            return [LEGACY_BANDS[i][1] for i in bands.tolist()]
+
+        grid, names = self._grid(stream_id, zone_map, frame_width, frame_height)
+        grid_height, grid_width = grid.shape
+        cols = np.clip((centers[:, 0] * grid_width / frame_width).astype(int), 0, grid_width - 1)
+        rows = np.clip((centers[:, 1] * grid_height / frame_height).astype(int), 0, grid_height - 1)
+        return [names[label] for label in grid[rows, cols].tolist()]
+
+    def zone_at(self, stream_id: Optional[str], x: float, y: float, frame_width: int, frame_height: int) -> str:
+        return self.classify(stream_id, [[x, y]], frame_width, frame_height)[0]
+
+    def get(self, stream_id: str) -> Optional[Dict[str, Any]]:
+        return self.config.get(stream_id)
+
+    def set(self, stream_id: str, zone_map: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace a stream's zone map; cached grids rebuild on the next frame"""
+        zone_map = self.config.set(stream_id, zone_map)
+        logger.info(f"Zone map for stream {stream_id} set: {[z['name'] for z in zone_map['zones']]}")
+        return zone_map
+
+    def remove(self, stream_id: str) -> bool:
+        return self.config.remove(stream_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached = [
+                {"stream_id": key[0], "frame": f"{key[1]}x{key[2]}", "grid": f"{grid.shape[1]}x{grid.shape[0]}"}
+                for key, (_, grid, _) in self._cache.items()
+            ]
+        return {
+            "path": self.config.path,
+            "grid_size": self.grid_size,
+            "streams": dict(self.config.values),
+            "cached_grids": cached,
+            "rebuilds": self.rebuilds
+        }
+
+    # Internals
+    def _grid(self, stream_id: str, zone_map: Dict[str, Any], frame_width: int, frame_height: int):
+        key = (stream_id, frame_width, frame_height)
+        version = self.config.version
+
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        # Grid keeps the frame's aspect ratio so cells stay square
+        scale = self.grid_size / max(frame_width, frame_height)
+        grid_width = max(1, round(frame_width * scale))
+        grid_height = max(1, round(frame_height * scale))
+
+        names = [zone_map["default"]] + [zone["name"] for zone in zone_map["zones"]]
+        polygons = [(label, zone["polygon"]) for label, zone in enumerate(zone_map["zones"], start=1)]
+        grid = rasterize(polygons, grid_width, grid_height)
+
+        with self._lock:
+            # Drop grids built from an older config for any stream
+            self._cache = {k: v for k, v in self._cache.items() if v[0] == version}
+            self._cache[key] = (version, grid, names)
+            self.rebuilds += 1
+
+        return grid, names
+
+    @staticmethod
+    def _zone_name(name: Any) -> str:
+        normalised = str(name).upper()
+        if normalised not in ZONE_NAMES:
+            raise ValueError(f"Zone name must be one of {', '.join(ZONE_NAMES)}, got {name!r}")
+        return normalised
+
+    @classmethod
+    def _validate(cls, zone_map: Dict[str, Any]) -> Dict[str, Any]:
+        zones = zone_map.get("zones")
+        if not zones:
+            raise ValueError("Zone map needs at least one zone")
+        if len(zones) > 254:
+            raise ValueError("At most 254 zones per stream")
+
+        normalised = []
+        for zone in zones:
+            if not isinstance(zone, dict) or "name" not in zone or "polygon" not in zone:
+                raise ValueError(f"Each zone needs a name and a polygon, got {zone!r}")
+            points = [[float(x), float(y)] for x, y in zone["polygon"]]
+            if len(points) < 3:
+                raise ValueError(f"Zone {zone.get('name')} polygon needs at least 3 points")
+            if any(not (0 <= v <= 1) for point in points for v in point):
+                raise ValueError(f"Zone {zone.get('name')} polygon must use frame fractions between 0 and 1")
+            normalised.append({"name": cls._zone_name(zone["name"]), "polygon": points})
+
+        return {"default": cls._zone_name(zone_map.get("default", "KANDANG")), "zones": normalised}
+
+
+# Global zone maps instance
+zone_maps = ZoneMaps()
@@ -31,14 +31,17 @@ const char* MQTT_PASSWORD = "";
 // Device Configuration
 const char* DEVICE_ID = "esp32_feeder_001";
 const char* KANDANG_ID = "kandang_001";
+// Goat this feeder serves; "+" accepts feed commands for every goat (single feeder per kandang)
+const char* FEEDER_GOAT_ID = "+";
 
 // Pin Definitions
 #define SERVO_PIN 13
 #define LED_PIN 2
 
-// MQTT Topics
-String TOPIC_FEED_CMD = "smartngangon/kandang/" + String(KANDANG_ID) + "/feed/command";
-String TOPIC_FEED_STATUS = "smartngangon/kandang/" + String(KANDANG_ID) + "/feed/status";
+// MQTT Topics - the backend sends feed commands per goat and tracks replies by goat id
+String TOPIC_FEED_CMD = "smartngangon/goat/" + String(FEEDER_GOAT_ID) + "/command/feed";
+const char* TOPIC_GOAT_PREFIX = "smartngangon/goat/";
+const char* TOPIC_FEED_CMD_SUFFIX = "/command/feed";
 String TOPIC_DEVICE_STATUS = "smartngangon/device/" + String(DEVICE_ID) + "/status";
 
 // ==================== OBJECTS ====================
@@ -165,22 +168,27 @@ void mqttCallback(char* topic, byte* payload, unsigned int length) {
     return;
   }
   
-  // Handle feed command
-  if (String(topic) == TOPIC_FEED_CMD) {
+  // Handle feed command: smartngangon/goat/<goat_id>/command/feed
+  String topicStr = String(topic);
+  if (topicStr.startsWith(TOPIC_GOAT_PREFIX) && topicStr.endsWith(TOPIC_FEED_CMD_SUFFIX)) {
+    String goatId = topicStr.substring(strlen(TOPIC_GOAT_PREFIX), topicStr.length() - strlen(TOPIC_FEED_CMD_SUFFIX));
     String action = doc["action"] | "";
-    int duration = doc["duration"] | 3000; // Default 3 seconds
+    int duration = doc["duration_ms"] | (doc["duration"] | 3000); // Default 3 seconds
+    // Echoed back in feed status for backend ack tracking
+    String commandId = doc["command_id"] | "";
     
     if (action == "feed") {
-      Serial.println("Feed command received!");
-      triggerFeeding(duration);
+      Serial.println("Feed command received for goat " + goatId);
+      triggerFeeding(duration, goatId, commandId);
     }
   }
 }
 
 // ==================== FEEDER FUNCTIONS ====================
-void triggerFeeding(int duration) {
+void triggerFeeding(int duration, String goatId, String commandId) {
   if (isFeeding) {
-    Serial.println("Already feeding, ignoring command");
+    // Ignored without a reply, so the backend reports it as unacknowledged
+    Serial.println("Already feeding, ignoring command " + commandId);
     return;
   }
   
@@ -188,7 +196,7 @@ void triggerFeeding(int duration) {
   Serial.println("Starting feeding sequence...");
   
   // Publish feeding started status
-  publishFeedStatus("feeding", duration);
+  publishFeedStatus("feeding", duration, goatId, commandId);
   
   // Open servo (90 degrees)
   feederServo.write(90);
@@ -201,23 +209,27 @@ void triggerFeeding(int duration) {
   feederServo.write(0);
   
   // Publish feeding completed status
-  publishFeedStatus("completed", duration);
+  publishFeedStatus("completed", duration, goatId, commandId);
   
   isFeeding = false;
   Serial.println("Feeding complete!");
 }
 
-void publishFeedStatus(String status, int duration) {
-  StaticJsonDocument<128> doc;
+void publishFeedStatus(String status, int duration, String goatId, String commandId) {
+  StaticJsonDocument<256> doc;
   doc["status"] = status;
   doc["duration"] = duration;
   doc["device_id"] = DEVICE_ID;
+  doc["kandang_id"] = KANDANG_ID;
+  doc["goat_id"] = goatId;
+  doc["command_id"] = commandId;
   doc["timestamp"] = millis();
   
-  char buffer[128];
+  char buffer[256];
   serializeJson(doc, buffer);
   
-  mqtt.publish(TOPIC_FEED_STATUS.c_str(), buffer);
+  String topic = String(TOPIC_GOAT_PREFIX) + goatId + "/feed/status";
+  mqtt.publish(topic.c_str(), buffer);
 }
 
 // ==================== UTILITY FUNCTIONS ====================